@@ -1,5 +1,40 @@
+from django import forms
 from django.contrib import admin
-from .models import Specialization, Doctor, Appointment
+from django.contrib.admin.widgets import AutocompleteSelect
+from .models import Specialization, Doctor, Appointment, WorkingHours, TimeOff
+from .pagination import EstimatedCountPaginator
+from .search import filter_doctors
+
+
+class AutocompleteFilter(admin.RelatedFieldListFilter):
+    """Foreign key filter that picks the object with the admin autocomplete widget
+
+    The stock filter lists every related object in the sidebar on each page
+    load; this one renders only the current choice and looks the rest up
+    through the related admin's search as the user types.
+    """
+    template = 'admin/api/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.admin_site = model_admin.admin_site
+        super().__init__(field, request, params, model, model_admin, field_path)
+
+    def field_choices(self, field, request, model_admin):
+        return []
+
+    def has_output(self):
+        return True
+
+    @property
+    def widget(self):
+        related_admin = self.admin_site.get_model_admin(self.field.related_model)
+        choice = forms.ModelChoiceField(
+            queryset=related_admin.get_queryset(self.request),
+            widget=AutocompleteSelect(self.field, self.admin_site, attrs={'data-filter-param': self.lookup_kwarg}),
+            required=False
+        )
+        return choice.widget.render(self.lookup_kwarg, self.lookup_val[0] if self.lookup_val else None)
+
 
 @admin.register(Specialization)
 class SpecializationAdmin(admin.ModelAdmin):
@@ -10,17 +45,58 @@ class SpecializationAdmin(admin.ModelAdmin):
         return obj.description[:50] + '...' if len(obj.description) > 50 else obj.description
     description_short.short_description = 'Description'
 
+# A doctor's schedule is edited on the doctor's page; saving it evicts the
+# compiled slot templates (see api.signals)
+class WorkingHoursInline(admin.TabularInline):
+    model = WorkingHours
+    extra = 0
+    max_num = 7
+
+class TimeOffInline(admin.TabularInline):
+    model = TimeOff
+    extra = 0
+
 @admin.register(Doctor)
 class DoctorAdmin(admin.ModelAdmin):
     list_display = ['name', 'specialization', 'years_experience', 'consultation_modes', 'is_available', 'is_active']
     list_filter = ['specialization', 'is_available', 'is_active', 'consultation_modes']
     search_fields = ['name', 'bio']
     list_editable = ['is_available', 'is_active']
+    inlines = [WorkingHoursInline, TimeOffInline]
+    
+    def get_queryset(self, request):
+        # __str__ reads the specialization name, including in autocomplete results
+        return super().get_queryset(request).select_related('specialization')
+    
+    def get_search_results(self, request, queryset, search_term):
+        # Look terms up in the search index instead of ILIKE '%term%' scans over bio.
+        # Every match is kept so the changelist count and pages are complete.
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        return filter_doctors(queryset, search_term), False
 
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
     list_display = ['patient_name', 'doctor', 'appointment_date', 'appointment_time', 'consultation_type', 'status']
-    list_filter = ['doctor', 'appointment_date', 'status', 'consultation_type']
+    list_filter = [('doctor', AutocompleteFilter), 'appointment_date', 'status', 'consultation_type']
     search_fields = ['patient_name', 'patient_email', 'patient_phone']
     list_editable = ['status']
-    date_hierarchy = 'appointment_date'
\ No newline at end of file
+    # Drilldowns filter on appointment_date ranges, served by appt_date_time_status_idx
+    date_hierarchy = 'appointment_date'
+    list_select_related = ['doctor__specialization']
+    # The model has no default ordering; keep the changelist newest first
+    ordering = ['-appointment_date', 'appointment_time']
+    autocomplete_fields = ['doctor']
+    # A plain id box rather than a select of every series
+    raw_id_fields = ['series']
+    # Counting millions of rows is the slowest part of a page: estimate large
+    # counts, skip the unfiltered total next to filtered results and never
+    # compute per-choice facet counts
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    
+    @property
+    def media(self):
+        doctor_filter = AutocompleteSelect(Appointment._meta.get_field('doctor'), self.admin_site)
+        return super().media + doctor_filter.media + forms.Media(js=['api/admin/autocomplete_filter.js'])
@@ -0,0 +1,150 @@
+import heapq
+import time
+from datetime import timedelta
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Appointment, ArchivedAppointment
+
+
+# Only finished appointments move; confirmed ones stay bookable and masked
+ARCHIVED_STATUSES = ('completed', 'cancelled')
+
+COPIED_FIELDS = [
+    'id', 'doctor_id', 'patient_name', 'patient_email', 'patient_phone', 'appointment_date',
+    'appointment_time', 'consultation_type', 'status', 'notes', 'series_id', 'created_at', 'updated_at'
+]
+
+# Order both stores are read and merged in
+READ_ORDER = ('appointment_date', 'appointment_time', 'id')
+
+# Yearly partitions known to exist in this process, added once their CREATE commits
+known_partitions = set()
+
+
+def uses_partitions():
+    return connection.vendor == 'postgresql'
+
+
+def archive_cutoff(today=None):
+    """First day that stays in the live table"""
+    return (today or timezone.now().date()) - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+
+
+def archivable(before):
+    return Appointment.objects.filter(status__in=ARCHIVED_STATUSES, appointment_date__lt=before)
+
+
+def ensure_partitions(years):
+    """Create the yearly archive partitions rows are about to land in (Postgres only)
+
+    The CREATE is part of the caller's transaction, so the years are only
+    remembered once it commits; after a rollback the next batch checks again.
+    """
+    table = ArchivedAppointment._meta.db_table
+    quote = connection.ops.quote_name
+    missing = sorted(set(years) - known_partitions)
+    if not missing:
+        return
+    with connection.cursor() as cursor:
+        for year in missing:
+            name = f'{table}_{year}'
+            cursor.execute('SELECT to_regclass(%s)', [name])
+            if cursor.fetchone()[0] is None:
+                cursor.execute(
+                    f'CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF {quote(table)} '
+                    f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+                )
+    transaction.on_commit(lambda: known_partitions.update(missing))
+
+
+def archive_batch(before, batch_size):
+    """Move up to batch_size archivable appointments in one transaction; returns how many moved"""
+    with transaction.atomic():
+        queryset = archivable(before).order_by('appointment_date', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            # Leave rows a booking is touching for the next run
+            queryset = queryset.select_for_update(skip_locked=True)
+        rows = list(queryset.only(*COPIED_FIELDS)[:batch_size])
+        if not rows:
+            return 0
+        if uses_partitions():
+            ensure_partitions({row.appointment_date.year for row in rows})
+
+        archived_at = timezone.now()
+        ArchivedAppointment.objects.bulk_create([
+            ArchivedAppointment(archived_at=archived_at, **{field: getattr(row, field) for field in COPIED_FIELDS})
+            for row in rows
+        ], ignore_conflicts=True)
+        delete_rows([row.id for row in rows])
+        return len(rows)
+
+
+def delete_rows(ids):
+    """DELETE the given appointments by id, skipping the ORM's collector on purpose
+
+    QuerySet.delete() would collect cascades and send pre/post_delete for every
+    row. Nothing references appointments, and the delete signals would refresh
+    slot bitmaps and booking counts that archiving does not change: only
+    finished rows move, and the counts include archived rows.
+    """
+    table = connection.ops.quote_name(Appointment._meta.db_table)
+    # Keep each statement under the backend's bound parameter limit
+    step = connection.ops.bulk_batch_size(['id'], ids) or len(ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(ids), step):
+            chunk = ids[start:start + step]
+            cursor.execute(f'DELETE FROM {table} WHERE id IN ({", ".join(["%s"] * len(chunk))})', chunk)
+
+
+def archive_appointments(before=None, batch_size=None, max_batches=None, pause=0, progress=None):
+    """Move completed and cancelled appointments dated before `before` to the archive
+
+    Works in batches of batch_size rows, each in its own short transaction,
+    sleeping `pause` seconds between them so a large backlog does not hold
+    locks or saturate the database. Safe to stop and rerun. Returns the
+    number of appointments moved.
+    """
+    before = before or archive_cutoff()
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        count = archive_batch(before, batch_size)
+        if not count:
+            break
+        moved += count
+        batches += 1
+        if progress:
+            progress(moved)
+        if pause and count == batch_size:
+            time.sleep(pause)
+    return moved
+
+
+def merge_ordered(*appointments):
+    """Merge iterables of appointments already in READ_ORDER"""
+    return heapq.merge(*appointments, key=attrgetter(*READ_ORDER))
+
+
+async def amerge_ordered(*appointments):
+    """Async version of merge_ordered, over async iterables"""
+    key = attrgetter(*READ_ORDER)
+    iterators = [aiter(rows) for rows in appointments]
+    heap = []
+    for index, iterator in enumerate(iterators):
+        async for obj in iterator:
+            heap.append((key(obj), index, obj))
+            break
+    heapq.heapify(heap)
+    while heap:
+        _, index, obj = heap[0]
+        yield obj
+        try:
+            obj = await anext(iterators[index])
+        except StopAsyncIteration:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (key(obj), index, obj))
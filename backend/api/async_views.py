@@ -0,0 +1,190 @@
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import NotFound
+
+from .archive import READ_ORDER, amerge_ordered
+from .availability import abuild_time_slots, abuild_calendar
+from .models import Doctor, Appointment, ArchivedAppointment
+from .pagination import AppointmentCursorPagination, astream_json_list
+from .renderers import render_json
+from .serializers import appointment_reader
+from .schedule import aget_schedule
+from .slotcache import aget_booked_mask, aget_doctor_summary
+from .views import (
+    filter_appointments, limit_calendar_doctors,
+    parse_calendar_params, parse_check_params
+)
+
+
+# Async twins of the read-heavy views in views.py, built on the async ORM so a
+# slow database round trip parks a coroutine instead of a worker thread. They
+# return the same payloads as their DRF counterparts.
+
+
+def json_response(data, status=200):
+    return HttpResponse(render_json(data), status=status, content_type='application/json')
+
+
+class AsyncAppointmentListView(View):
+    replica_reads = True
+
+    async def get(self, request):
+        # The same include_archived and stream options as AppointmentView.get
+        include_archived = request.GET.get('include_archived', '').lower() == 'true'
+        stores = [Appointment, ArchivedAppointment] if include_archived else [Appointment]
+        querysets = [filter_appointments(appointment_reader.values(model.objects.all()), request.GET) for model in stores]
+
+        if request.GET.get('stream', '').lower() == 'true':
+            querysets = [queryset.order_by(*READ_ORDER) for queryset in querysets]
+            if not include_archived:
+                return astream_json_list(querysets[0], appointment_reader.serialize)
+            chunk_size = settings.APPOINTMENT_STREAM_CHUNK_SIZE
+            rows = amerge_ordered(*(
+                queryset.using(queryset.db).aiterator(chunk_size=chunk_size) for queryset in querysets
+            ))
+            return astream_json_list(rows, appointment_reader.serialize)
+
+        paginator = AppointmentCursorPagination()
+        try:
+            page = await paginator.apaginate_querysets(querysets, request)
+        except NotFound as e:
+            return json_response({'detail': str(e.detail)}, status=404)
+
+        # The rows already hold every column, so serializing does no I/O
+        return json_response({
+            'next': paginator.get_next_link(),
+            'results': appointment_reader.serialize(page)
+        })
+
+
+class AsyncDoctorAvailabilityView(View):
+    replica_reads = True
+
+    async def get(self, request, doctor_id):
+        try:
+            doctor = await Doctor.objects.only(
+                'id', 'name', 'is_available', 'consultation_modes'
+            ).aget(id=doctor_id, is_active=True)
+        except Doctor.DoesNotExist:
+            return json_response({'error': 'Doctor not found'}, status=404)
+
+        # Get date from query params (default: today)
+        date_str = request.GET.get('date')
+        if date_str:
+            try:
+                target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+            except ValueError:
+                return json_response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=400)
+        else:
+            target_date = timezone.now().date()
+
+        # Check if date is in the past
+        if target_date < timezone.now().date():
+            return json_response({
+                'doctor_id': doctor.id,
+                'doctor_name': doctor.name,
+                'date': target_date,
+                'available': False,
+                'message': 'Cannot check availability for past dates'
+            })
+
+        # Check if doctor is generally available
+        if not doctor.is_available:
+            return json_response({
+                'doctor_id': doctor.id,
+                'doctor_name': doctor.name,
+                'date': target_date,
+                'available': False,
+                'message': 'Doctor is not available'
+            })
+
+        return json_response({
+            'doctor_id': doctor.id,
+            'doctor_name': doctor.name,
+            'date': target_date,
+            'is_available': doctor.is_available,
+            'time_slots': await abuild_time_slots(doctor, target_date),
+            'consultation_modes': doctor.consultation_modes
+        })
+
+
+class AsyncAvailabilityCalendarView(View):
+    replica_reads = True
+
+    async def get(self, request):
+        today = timezone.now().date()
+        try:
+            start_date, end_date, doctors = parse_calendar_params(request.GET, today)
+            doctors = limit_calendar_doctors([doctor async for doctor in doctors])
+        except ValueError as e:
+            return json_response({'error': str(e)}, status=400)
+
+        # Bookings for every doctor come back in one round trip. Splitting it
+        # into per-doctor queries gains nothing here: Django runs async ORM calls
+        # one after another on the request's database thread.
+        return json_response(await abuild_calendar(doctors, start_date, end_date, today=today))
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncCheckAvailabilityView(View):
+    async def post(self, request):
+        if request.content_type == 'application/json':
+            try:
+                data = json.loads(request.body or b'{}')
+            except ValueError:
+                return json_response({'error': 'Invalid JSON'}, status=400)
+        else:
+            data = request.POST
+
+        try:
+            doctor_id, appointment_date, appointment_time, time_str = parse_check_params(data)
+        except ValueError as e:
+            return json_response({'error': str(e)}, status=400)
+
+        doctor = await aget_doctor_summary(doctor_id)
+        if doctor is None:
+            return json_response({'error': 'Doctor not found'}, status=404)
+
+        # Check basic availability
+        if not doctor['is_available']:
+            return json_response({
+                'available': False,
+                'reason': 'Doctor is not available for appointments'
+            })
+
+        # Check if date is in the past
+        if appointment_date < timezone.now().date():
+            return json_response({
+                'available': False,
+                'reason': 'Cannot book appointments in the past'
+            })
+
+        # Only the slots of the doctor's compiled schedule for that day can be booked
+        template = (await aget_schedule(doctor_id)).template(appointment_date)
+        if not template.offers(appointment_time):
+            return json_response({
+                'available': False,
+                'reason': 'Outside the doctor\'s working hours' if template else 'Doctor is not working on this date'
+            })
+        
+        # Check for an existing appointment in the slot's occupancy cells
+        if not template.is_free(appointment_time, await aget_booked_mask(doctor_id, appointment_date)):
+            return json_response({
+                'available': False,
+                'reason': 'Time slot is already booked'
+            })
+
+        return json_response({
+            'available': True,
+            'doctor': doctor['name'],
+            'date': appointment_date,
+            'time': time_str,
+            'consultation_modes': doctor['consultation_modes']
+        })
@@ -0,0 +1,177 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+
+from .occupancy import aget_mask, aget_masks, earliest_free_slots, get_mask, get_masks, next_available_days
+from .schedule import aget_schedule, aget_schedules, generate_slots, get_schedule, get_schedules, get_slot_config
+
+
+def format_time_slots(template, booked):
+    """Render a day's slot template as the API's list of {'time', 'available'} dicts"""
+    return [
+        {
+            'time': slot.strftime('%H:%M'),
+            'available': available
+        }
+        for slot, available in template.mark(booked)
+    ]
+
+
+def build_time_slots(doctor, target_date):
+    """Build the slot grid for one doctor and date: the day's template minus its bookings"""
+    template = get_schedule(doctor.id).template(target_date)
+    return format_time_slots(template, get_mask(doctor.id, target_date))
+
+
+async def abuild_time_slots(doctor, target_date):
+    """Async version of build_time_slots"""
+    template = (await aget_schedule(doctor.id)).template(target_date)
+    return format_time_slots(template, await aget_mask(doctor.id, target_date))
+
+
+def encode_bitmap(grid):
+    """Encode a slot grid as a string with '1' for free and '0' for taken"""
+    return ''.join('1' if available else '0' for _, available in grid)
+
+
+def build_calendar(doctors, start_date, end_date, today=None):
+    """Build per-doctor, per-day free-slot bitmaps for a date range with one bookings query"""
+    doctor_ids = [doctor.id for doctor in doctors]
+    booked = get_masks(doctor_ids, start_date, end_date)
+    return render_calendar(doctors, start_date, end_date, booked, get_schedules(doctor_ids), today)
+
+
+async def abuild_calendar(doctors, start_date, end_date, today=None):
+    """Async version of build_calendar"""
+    doctor_ids = [doctor.id for doctor in doctors]
+    booked = await aget_masks(doctor_ids, start_date, end_date)
+    return render_calendar(doctors, start_date, end_date, booked, await aget_schedules(doctor_ids), today)
+
+
+def render_calendar(doctors, start_date, end_date, booked, schedules, today=None):
+    """Lay out the calendar response from booked bitmasks keyed by (doctor_id, date)
+
+    Each doctor's bitmaps run over that doctor's `slots`: every slot start of
+    their week, with '0' where the day's template has no such slot. The
+    top-level `slots` are the default working day from settings.
+    """
+    day_start, day_end, slot_minutes = get_slot_config()
+    today = today or date.today()
+
+    days = []
+    current = start_date
+    while current <= end_date:
+        days.append(current)
+        current += timedelta(days=1)
+
+    calendar = []
+    for doctor in doctors:
+        schedule = schedules[doctor.id]
+        grid = schedule.grid
+        closed = '0' * len(grid)
+        bitmaps = {}
+        for day in days:
+            template = schedule.template(day)
+            if day < today or not doctor.is_available or not template:
+                bitmaps[day.isoformat()] = closed
+            elif len(template.slots) == len(grid):
+                bitmaps[day.isoformat()] = encode_bitmap(template.mark(booked.get((doctor.id, day), 0)))
+            else:
+                free = set(template.free(booked.get((doctor.id, day), 0)))
+                bitmaps[day.isoformat()] = ''.join('1' if slot in free else '0' for slot in grid)
+        calendar.append({
+            'doctor_id': doctor.id,
+            'doctor_name': doctor.name,
+            'is_available': doctor.is_available,
+            'slot_minutes': schedule.slot_minutes,
+            'slots': [slot.strftime('%H:%M') for slot in grid],
+            'days': bitmaps
+        })
+
+    return {
+        'start': start_date,
+        'end': end_date,
+        'slot_minutes': slot_minutes,
+        'slots': [slot.strftime('%H:%M') for slot in generate_slots(day_start, day_end, slot_minutes)],
+        'doctors': calendar
+    }
+
+
+def find_available_days(doctor, start_date, count, within):
+    """The doctor's next `count` days with a free slot, scanning `within` days in one query"""
+    booked = get_masks([doctor.id], start_date, start_date + timedelta(days=within - 1))
+    return [
+        {
+            'date': day,
+            'first_free': free[0].strftime('%H:%M'),
+            'free_slots': [slot.strftime('%H:%M') for slot in free]
+        }
+        for day, free in next_available_days(booked, doctor.id, start_date, count, within, get_schedule(doctor.id))
+    ]
+
+
+def build_shared_availability(doctors, target_date):
+    """Free-doctor counts per slot for a group of doctors on one day, and the slots free for all
+
+    The slots are every slot any of the doctors works that day.
+    """
+    schedules = get_schedules([doctor.id for doctor in doctors])
+    booked = get_masks([doctor.id for doctor in doctors], target_date, target_date)
+    days = [
+        (schedules[doctor.id].template(target_date), booked.get((doctor.id, target_date), 0))
+        for doctor in doctors
+    ]
+    slots = sorted(set().union(*(template.slots for template, _ in days)))
+
+    free_doctors = {slot: sum(1 for template, mask in days if template.is_free(slot, mask)) for slot in slots}
+    earliest = min(
+        (slot for slot in (template.first_free(mask) for template, mask in days) if slot is not None),
+        default=None
+    )
+    return {
+        'date': target_date,
+        'doctor_count': len(doctors),
+        'slots': [
+            {
+                'time': slot.strftime('%H:%M'),
+                'free_doctors': free_doctors[slot]
+            }
+            for slot in slots
+        ],
+        'shared_free_slots': [slot.strftime('%H:%M') for slot in slots if free_doctors[slot] == len(doctors)],
+        'earliest_free': earliest.strftime('%H:%M') if earliest else None,
+    }
+
+
+def find_earliest_slots(doctors, window_start, window_end, limit):
+    """The `limit` earliest free slots across doctors with a start in [window_start, window_end)
+
+    Each step loads every doctor's bitmasks for AVAILABILITY_SEARCH_CHUNK_DAYS
+    days in one range query and heap-merges per-doctor free-slot iterators over
+    them; later chunks are only read if the earlier ones held too few slots.
+    """
+    by_id = {doctor.id: doctor for doctor in doctors}
+    schedules = get_schedules(list(by_id)) if by_id else {}
+    chunk_days = settings.AVAILABILITY_SEARCH_CHUNK_DAYS
+
+    found = []
+    chunk_start, last_date = window_start.date(), window_end.date()
+    while by_id and chunk_start <= last_date and len(found) < limit:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), last_date)
+        booked = get_masks(list(by_id), chunk_start, chunk_end)
+        found += earliest_free_slots(
+            booked, schedules, chunk_start, chunk_end, limit - len(found),
+            not_before=window_start, before=window_end
+        )
+        chunk_start = chunk_end + timedelta(days=1)
+
+    return [
+        {
+            'doctor_id': doctor_id,
+            'doctor_name': by_id[doctor_id].name,
+            'consultation_modes': by_id[doctor_id].consultation_modes,
+            'date': day,
+            'time': slot.strftime('%H:%M')
+        }
+        for day, slot, doctor_id in found
+    ]
@@ -0,0 +1,179 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .booking import book_slot, SlotUnavailable
+from .models import Appointment
+from .occupancy import get_masks, iter_free_slots, refresh_occupancy
+from .schedule import get_schedule
+from .slotcache import evict_booked_slots
+from .stats import refresh_booking_counts
+
+
+def refresh_days(days):
+    """Bring the summaries of the touched days up to date; set-based updates send no signals"""
+    refresh_occupancy(days)
+    refresh_booking_counts(days)
+    transaction.on_commit(lambda: evict_booked_slots(*days))
+
+
+def describe(appointment_id, doctor_id, day, slot):
+    return {
+        'appointment_id': appointment_id,
+        'doctor_id': doctor_id,
+        'date': day,
+        'time': slot.strftime('%H:%M'),
+    }
+
+
+def cancel_appointments(queryset):
+    """Cancel the confirmed appointments in `queryset`
+
+    One locking read, one UPDATE and one summary refresh in a single
+    transaction. Returns one result per cancelled appointment.
+    """
+    def cancel():
+        rows = list(
+            queryset.select_for_update().filter(status='confirmed')
+            .order_by('appointment_date', 'appointment_time', 'id')
+            .values_list('id', 'doctor_id', 'appointment_date', 'appointment_time', 'patient_name', 'patient_email')
+        )
+        if not rows:
+            return []
+        Appointment.objects.filter(id__in=[row[0] for row in rows]).update(
+            status='cancelled', updated_at=timezone.now()
+        )
+        refresh_days({(doctor_id, day) for _, doctor_id, day, _, _, _ in rows})
+        return [
+            dict(
+                describe(appointment_id, doctor_id, day, slot),
+                status='cancelled', patient_name=patient_name, patient_email=patient_email
+            )
+            for appointment_id, doctor_id, day, slot, patient_name, patient_email in rows
+        ]
+
+    return book_slot(cancel)
+
+
+def cancel_range(doctor_id, start_date, end_date):
+    """Cancel a doctor's confirmed appointments from start_date to end_date inclusive"""
+    return cancel_appointments(
+        Appointment.objects.filter(doctor_id=doctor_id, appointment_date__range=(start_date, end_date))
+    )
+
+
+class Rescheduler:
+    """Move a set of appointments onto one doctor's free slots in a single transaction
+
+    Each appointment keeps its date and time when that is one of the new
+    doctor's free slots; otherwise, if find_next is set, it takes that
+    doctor's next free slot within AVAILABILITY_SEARCH_MAX_DAYS. Slots are claimed in an
+    in-memory copy of the doctor's bitmasks, so the batch never collides with
+    itself, and written with one bulk UPDATE. A concurrent booking that takes
+    a planned slot fails the UPDATE on the confirmed-slot constraint; the
+    batch is then planned again from fresh bitmasks.
+    """
+
+    def __init__(self, doctor, find_next=True, now=None, retries=2):
+        self.doctor = doctor
+        self.find_next = find_next
+        self.now = now or timezone.localtime().replace(tzinfo=None, second=0, microsecond=0)
+        self.retries = retries
+        self.schedule = get_schedule(doctor.id)
+
+    def run(self, appointment_ids):
+        for attempt in range(self.retries + 1):
+            try:
+                return book_slot(lambda: self.reschedule(appointment_ids))
+            except SlotUnavailable:
+                if attempt == self.retries:
+                    raise
+
+    def reschedule(self, appointment_ids):
+        appointment_ids = list(dict.fromkeys(appointment_ids))
+        found = {
+            appointment.id: appointment
+            for appointment in Appointment.objects.select_for_update().filter(id__in=appointment_ids).only(
+                'id', 'doctor_id', 'appointment_date', 'appointment_time', 'consultation_type', 'status'
+            )
+        }
+        results, moves = {}, []
+        for appointment_id in appointment_ids:
+            appointment = found.get(appointment_id)
+            error = self.check(appointment)
+            if error:
+                results[appointment_id] = {'appointment_id': appointment_id, 'status': 'failed', 'error': error}
+            else:
+                moves.append(appointment)
+
+        if moves:
+            first_day = min(appointment.appointment_date for appointment in moves)
+            last_day = max(appointment.appointment_date for appointment in moves)
+            booked = get_masks([self.doctor.id], first_day, last_day + self.horizon)
+            updated_at = timezone.now()
+            changed, days = [], set()
+            for appointment in sorted(moves, key=lambda a: (a.appointment_date, a.appointment_time, a.id)):
+                before = describe(appointment.id, appointment.doctor_id, appointment.appointment_date, appointment.appointment_time)
+                slot = self.claim(booked, appointment.appointment_date, appointment.appointment_time)
+                if slot is None:
+                    results[appointment.id] = dict(before, status='failed', error='No free slot for this doctor')
+                    continue
+                days.add((appointment.doctor_id, appointment.appointment_date))
+                appointment.doctor_id = self.doctor.id
+                appointment.appointment_date, appointment.appointment_time = slot
+                appointment.updated_at = updated_at
+                days.add((self.doctor.id, appointment.appointment_date))
+                changed.append(appointment)
+                results[appointment.id] = {
+                    'appointment_id': appointment.id,
+                    'status': 'rescheduled',
+                    'from': before,
+                    'to': describe(appointment.id, self.doctor.id, *slot),
+                }
+
+            if changed:
+                Appointment.objects.bulk_update(
+                    changed, ['doctor', 'appointment_date', 'appointment_time', 'updated_at'],
+                    batch_size=settings.BULK_IMPORT_BATCH_SIZE
+                )
+                refresh_days(days)
+
+        return [results[appointment_id] for appointment_id in appointment_ids]
+
+    @property
+    def horizon(self):
+        return timedelta(days=settings.AVAILABILITY_SEARCH_MAX_DAYS)
+
+    def check(self, appointment):
+        """Why an appointment cannot be moved, or None"""
+        if appointment is None:
+            return 'Appointment not found'
+        if appointment.status != 'confirmed':
+            return f'Only confirmed appointments can be rescheduled, not {appointment.status} ones'
+        if appointment.doctor_id == self.doctor.id:
+            return 'Appointment is already with this doctor'
+        if not self.doctor.supports_consultation_type(appointment.consultation_type):
+            return f'Doctor does not support {appointment.consultation_type} consultations'
+        if datetime.combine(appointment.appointment_date, appointment.appointment_time) < self.now:
+            return 'Cannot reschedule appointments in the past'
+        return None
+
+    def claim(self, booked, day, slot):
+        """Take the (date, time) the appointment moves to in `booked`, or None if there is none"""
+        if self.schedule.template(day).is_free(slot, booked.get((self.doctor.id, day), 0)):
+            chosen = (day, slot)
+        elif self.find_next:
+            free = iter_free_slots(
+                booked, self.doctor.id, day, day + self.horizon, self.schedule,
+                not_before=datetime.combine(day, slot)
+            )
+            chosen = next(((free_day, free_slot) for free_day, free_slot, _ in free), None)
+        else:
+            chosen = None
+
+        if chosen:
+            key = (self.doctor.id, chosen[0])
+            booked[key] = booked.get(key, 0) | self.schedule.template(chosen[0]).mask(chosen[1])
+        return chosen
@@ -0,0 +1,197 @@
+import json
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .micro import SCENARIOS, make_client, post_json
+from .timing import summarize
+
+
+# Default traffic mix: mostly browsing and slot checks, with some bookings and cancellations
+DEFAULT_MIX = {
+    'doctor_list': 2,
+    'appointment_list': 3,
+    'doctor_availability': 3,
+    'check_availability': 4,
+    'book': 1,
+    'cancel': 1,
+}
+
+
+def parse_mix(value):
+    """Parse 'name=weight,name=weight' into a mix dict"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f'Unknown scenario {name!r}; choose from {", ".join(SCENARIOS)}.')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class HttpResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.content = body
+        self.streaming_content = [body]
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class HttpClient:
+    """Just enough of django.test.Client's interface to drive a live server"""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, query=None, body=None, content_type=None):
+        url = self.base_url + path
+        if query:
+            url += '?' + urlencode(query)
+        headers = {'Content-Type': content_type} if content_type else {}
+        data = body.encode() if isinstance(body, str) else body
+        try:
+            with urlopen(Request(url, data=data, headers=headers, method=method), timeout=self.timeout) as response:
+                return HttpResponse(response.status, response.read())
+        except HTTPError as e:
+            return HttpResponse(e.code, e.read())
+
+    def get(self, path, data=None):
+        return self.request('GET', path, query=data)
+
+    def post(self, path, data=None, content_type=None):
+        return self.request('POST', path, body=data, content_type=content_type)
+
+    def put(self, path, data=None, content_type=None):
+        return self.request('PUT', path, body=data, content_type=content_type)
+
+    def delete(self, path):
+        return self.request('DELETE', path)
+
+
+def run_load(ctx, mix=None, workers=8, duration=10.0, base_url=None):
+    """Drive a weighted mix of scenarios from `workers` threads for `duration` seconds
+
+    Runs in-process through the Django test client (one DB connection per
+    thread, so queries per request are counted), or against a live server when
+    `base_url` is given.
+    """
+    mix = mix or DEFAULT_MIX
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    records = []
+    records_lock = threading.Lock()
+    barrier = threading.Barrier(workers + 1)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        client = HttpClient(base_url) if base_url else make_client()
+        local = []
+        barrier.wait()
+        try:
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights)[0]
+                ok = False
+                queries = None
+                started = time.perf_counter()
+                try:
+                    request = SCENARIOS[name](client, ctx)
+                    started = time.perf_counter()
+                    with CaptureQueriesContext(connection) as captured:
+                        response = request()
+                    ok = getattr(response, 'status_code', 200) < 400
+                    queries = None if base_url else len(captured)
+                except Exception:
+                    pass
+                local.append((name, time.perf_counter() - started, queries, ok))
+        finally:
+            connection.close()
+            with records_lock:
+                records.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(workers)]
+    for thread in threads:
+        thread.start()
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return summarize_load(records, workers, elapsed)
+
+
+def summarize_load(records, workers, elapsed):
+    endpoints = {}
+    for name in sorted({record[0] for record in records}):
+        rows = [record for record in records if record[0] == name]
+        queries = [record[2] for record in rows if record[2] is not None]
+        endpoints[name] = dict(
+            summarize([record[1] for record in rows]),
+            errors=sum(1 for record in rows if not record[3]),
+            queries_per_request=round(sum(queries) / len(queries), 2) if queries else None,
+            throughput_rps=round(len(rows) / elapsed, 2),
+        )
+
+    return {
+        'workers': workers,
+        'duration_s': round(elapsed, 3),
+        'requests': len(records),
+        'errors': sum(1 for record in records if not record[3]),
+        'throughput_rps': round(len(records) / elapsed, 2) if elapsed else None,
+        'overall': summarize([record[1] for record in records]) if records else None,
+        'endpoints': endpoints,
+    }
+
+
+def run_contention(payloads, workers=16, base_url=None):
+    """POST one booking per payload from `workers` threads released together
+
+    Measures booking throughput while the writers fight over the same rows:
+    the status codes returned (an exception counts as 'error'), the time from
+    release until the last booking finished, and bookings (201s) and requests
+    per second over that time.
+    """
+    workers = min(workers, len(payloads))
+    released = []
+    barrier = threading.Barrier(workers, action=lambda: released.append(time.perf_counter()))
+
+    def attempt(index):
+        client = HttpClient(base_url) if base_url else make_client()
+        if index < workers:
+            barrier.wait()
+        started = time.perf_counter()
+        try:
+            status = post_json(client, '/api/appointments/', payloads[index]).status_code
+        except Exception:
+            status = 'error'
+        finally:
+            connection.close()
+        return status, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(attempt, range(len(payloads))))
+    elapsed = time.perf_counter() - released[0]
+
+    codes = Counter(status for status, _ in results)
+    return {
+        'workers': workers,
+        'attempts': len(payloads),
+        'status_codes': dict(codes),
+        'duration_s': round(elapsed, 3),
+        'bookings_per_second': round(codes[201] / elapsed, 2),
+        'requests_per_second': round(len(payloads) / elapsed, 2),
+        'latency': summarize([duration for _, duration in results]),
+    }
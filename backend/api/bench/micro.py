@@ -0,0 +1,301 @@
+import itertools
+import json
+import random
+import statistics
+import threading
+import time
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from ..models import Specialization, Doctor, Appointment
+from ..renderers import FastJSONRenderer
+from ..serializers import (
+    SpecializationSerializer, DoctorSerializer, AppointmentSerializer, appointment_reader, doctor_reader
+)
+from ..slotcache import booked_slot_cache, doctor_cache
+from .seed import MODE_TYPES
+from .timing import summarize
+
+
+# Marks rows created by the benchmarks so they can be cleaned up afterwards
+BENCH_PATIENT = 'Load Test'
+
+
+def make_client():
+    # Host must pass ALLOWED_HOSTS outside the test runner
+    return Client(HTTP_HOST='localhost')
+
+
+def clear_caches():
+    """Drop the catalog and availability caches so the next call is cold"""
+    cache.clear()
+    booked_slot_cache.clear()
+    doctor_cache.clear()
+
+
+class BenchContext:
+    """Shared state the scenarios draw ids and free slots from"""
+
+    def __init__(self, rng=None):
+        self.rng = rng or random.Random(11)
+        self.lock = threading.Lock()
+        self.doctors = list(
+            Doctor.objects.filter(is_active=True, is_available=True)
+            .values_list('id', 'consultation_modes')
+            .order_by('id')
+        )
+        self.appointment_ids = list(Appointment.objects.order_by('-id').values_list('id', flat=True)[:5000])
+        self.specialization_ids = list(Specialization.objects.values_list('id', flat=True))
+        if not self.doctors or not self.appointment_ids:
+            raise ValueError('Seed doctors and appointments before benchmarking.')
+
+        # Writes go to days past any seeded data so they never conflict with it
+        last = Appointment.objects.order_by('-appointment_date').values_list('appointment_date', flat=True).first()
+        self.write_start = max(last or date.today(), date.today()) + timedelta(days=30)
+        self.slots = itertools.count()
+        self.today = date.today()
+
+    def choice(self, values):
+        with self.lock:
+            return self.rng.choice(values)
+
+    def doctor_id(self):
+        return self.choice(self.doctors)[0]
+
+    def future_day(self, span=60):
+        with self.lock:
+            return self.today + timedelta(days=self.rng.randint(1, span))
+
+    def next_slot(self):
+        """A (doctor_id, consultation_type, date, time) no other benchmark call has used"""
+        n = next(self.slots)
+        doctor_id, mode = self.doctors[n % len(self.doctors)]
+        day_offset, hour = divmod(n // len(self.doctors), 8)
+        consultation_type = MODE_TYPES[mode][0]
+        return doctor_id, consultation_type, self.write_start + timedelta(days=day_offset), f'{9 + hour:02d}:00'
+
+    def booking_payload(self, slot=None):
+        doctor_id, consultation_type, day, time_str = slot or self.next_slot()
+        return {
+            'doctor': doctor_id,
+            'patient_name': BENCH_PATIENT,
+            'patient_email': 'loadtest@example.com',
+            'patient_phone': '5550000',
+            'appointment_date': day.isoformat(),
+            'appointment_time': time_str,
+            'consultation_type': consultation_type,
+        }
+
+    def contended_slots(self, attempts):
+        """Slots for contention runs: `attempts` copies of one slot, and `attempts` distinct
+        slots of the same doctor, on days before the other benchmark writes"""
+        doctor_id, mode = self.doctors[0]
+        consultation_type = MODE_TYPES[mode][0]
+        day = self.write_start - timedelta(days=1)
+        same = [(doctor_id, consultation_type, day, '09:00')] * attempts
+        distinct = [
+            (doctor_id, consultation_type, day - timedelta(days=1 + index // 8), f'{9 + index % 8:02d}:00')
+            for index in range(attempts)
+        ]
+        return same, distinct
+
+
+def post_json(client, url, payload):
+    return client.post(url, json.dumps(payload), content_type='application/json')
+
+
+def prepare_book(client, ctx):
+    payload = ctx.booking_payload()
+    return lambda: post_json(client, '/api/appointments/', payload)
+
+
+def prepare_reschedule(client, ctx):
+    appointment_id = prepare_book(client, ctx)().json()['appointment_id']
+    payload = json.dumps(ctx.booking_payload())
+    return lambda: client.put(f'/api/appointments/{appointment_id}/', payload, content_type='application/json')
+
+
+def prepare_cancel(client, ctx):
+    appointment_id = prepare_book(client, ctx)().json()['appointment_id']
+    return lambda: client.delete(f'/api/appointments/{appointment_id}/')
+
+
+def prepare_check(url):
+    def prepare(client, ctx):
+        payload = {'doctor_id': ctx.doctor_id(), 'date': ctx.future_day().isoformat(), 'time': '10:00'}
+        return lambda: post_json(client, url, payload)
+    return prepare
+
+
+def prepare_export(client, ctx):
+    params = {'doctor': ctx.doctor_id(), 'file_format': 'jsonl'}
+    return lambda: b''.join(client.get('/api/appointments/export/', params).streaming_content)
+
+
+def prepare_get(url, params=None):
+    """Scenario for a GET whose url/params are drawn from the context per call"""
+    def prepare(client, ctx):
+        path = url(ctx) if callable(url) else url
+        query = params(ctx) if params else None
+        return lambda: client.get(path, query)
+    return prepare
+
+
+# One scenario per view in api/views.py. Each takes (client, ctx), does any setup
+# (e.g. booking the appointment a cancel needs) and returns the request to measure.
+SCENARIOS = {
+    'specialization_list': prepare_get('/api/specializations/'),
+    'doctor_list': prepare_get('/api/doctors/'),
+    'doctor_detail': prepare_get(lambda ctx: f'/api/doctors/{ctx.doctor_id()}/'),
+    'doctor_search': prepare_get('/api/doctors/search/', lambda ctx: {
+        'q': ctx.choice(['psych', 'child psychology', 'benchmark profile', 'family therap', 'addiction'])
+    }),
+    'appointment_list': prepare_get('/api/appointments/', lambda ctx: {'doctor': ctx.doctor_id()}),
+    'appointment_detail': prepare_get(lambda ctx: f'/api/appointments/{ctx.choice(ctx.appointment_ids)}/'),
+    'appointment_export': prepare_export,
+    'doctor_availability': prepare_get(
+        lambda ctx: f'/api/doctors/{ctx.doctor_id()}/availability/',
+        lambda ctx: {'date': ctx.future_day().isoformat()}
+    ),
+    'availability_calendar': prepare_get('/api/availability/', lambda ctx: {
+        'start': ctx.future_day().isoformat(), 'specialization': ctx.choice(ctx.specialization_ids)
+    }),
+    'doctor_available_days': prepare_get(lambda ctx: f'/api/doctors/{ctx.doctor_id()}/available-days/'),
+    'specialization_availability': prepare_get(
+        lambda ctx: f'/api/specializations/{ctx.choice(ctx.specialization_ids)}/availability/',
+        lambda ctx: {'date': ctx.future_day().isoformat()}
+    ),
+    'next_available_slots': prepare_get('/api/availability/next/', lambda ctx: {
+        'specialization': ctx.choice(ctx.specialization_ids),
+        'consultation_type': ctx.choice(['video', 'phone', 'in_person']),
+        'start': ctx.future_day().isoformat(),
+    }),
+    'booking_stats': prepare_get('/api/stats/bookings/', lambda ctx: {
+        'start': (ctx.today - timedelta(days=90)).isoformat(), 'end': ctx.today.isoformat(),
+        'specialization': ctx.choice(ctx.specialization_ids),
+    }),
+    'check_availability': prepare_check('/api/check-availability/'),
+    'book': prepare_book,
+    'reschedule': prepare_reschedule,
+    'cancel': prepare_cancel,
+}
+
+# The async views (api/async_views.py) take the same requests under /api/async/
+ASYNC_TWINS = {
+    'appointment_list': 'async_appointment_list',
+    'doctor_availability': 'async_doctor_availability',
+    'availability_calendar': 'async_availability_calendar',
+    'check_availability': 'async_check_availability',
+}
+SCENARIOS.update({
+    'async_appointment_list': prepare_get('/api/async/appointments/', lambda ctx: {'doctor': ctx.doctor_id()}),
+    'async_doctor_availability': prepare_get(
+        lambda ctx: f'/api/async/doctors/{ctx.doctor_id()}/availability/',
+        lambda ctx: {'date': ctx.future_day().isoformat()}
+    ),
+    'async_availability_calendar': prepare_get('/api/async/availability/', lambda ctx: {
+        'start': ctx.future_day().isoformat(), 'specialization': ctx.choice(ctx.specialization_ids)
+    }),
+    'async_check_availability': prepare_check('/api/async/check-availability/'),
+})
+
+
+def run_view_benchmarks(ctx, names=None, repeat=50, warmup=3, cold=False):
+    """Time each scenario serially, recording latency and queries per request"""
+    client = make_client()
+    results = {}
+    for name in names or SCENARIOS:
+        prepare = SCENARIOS[name]
+        for _ in range(warmup):
+            prepare(client, ctx)()
+
+        samples, queries = [], []
+        for _ in range(repeat):
+            request = prepare(client, ctx)
+            if cold:
+                clear_caches()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                request()
+                samples.append(time.perf_counter() - started)
+            queries.append(len(captured))
+
+        results[name] = dict(summarize(samples), queries_per_request=round(sum(queries) / len(queries), 2))
+    return results
+
+
+def run_serializer_benchmarks(sizes=(1, 100, 1000, 10000), repeat=20):
+    """Time serializing (and validating) batches with each API serializer
+
+    Reads are timed through the ModelSerializers, the value-row fast path
+    (rows fetched beforehand in both cases) and then each JSON renderer.
+    """
+    appointments = Appointment.objects.select_related('doctor__specialization')
+    cases = {
+        'SpecializationSerializer': (SpecializationSerializer, Specialization.objects.all()),
+        'DoctorSerializer': (DoctorSerializer, Doctor.objects.select_related('specialization')),
+        'AppointmentSerializer': (AppointmentSerializer, appointments),
+    }
+    readers = {
+        'doctor_reader': (doctor_reader, Doctor.objects.all()),
+        'appointment_reader': (appointment_reader, Appointment.objects.all()),
+    }
+    renderers = {'JSONRenderer': JSONRenderer(), 'FastJSONRenderer': FastJSONRenderer()}
+
+    def measure(name, size, func):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - started)
+        summary = summarize(samples)
+        summary['rows_per_s'] = round(size / statistics.median(samples))
+        results[f'{name}[{size}]'] = summary
+
+    results = {}
+    for name, (serializer_class, queryset) in cases.items():
+        for size in sizes:
+            rows = list(queryset[:size])
+            if rows:
+                measure(name, len(rows), lambda: serializer_class(rows, many=True).data)
+    for name, (reader, queryset) in readers.items():
+        for size in sizes:
+            rows = list(reader.values(queryset)[:size])
+            if rows:
+                measure(name, len(rows), lambda: reader.serialize(rows))
+    for size in sizes:
+        data = appointment_reader.serialize(appointment_reader.values(Appointment.objects.all())[:size])
+        for name, renderer in renderers.items():
+            if data:
+                measure(f'{name}(appointments)', len(data), lambda: renderer.render(data))
+
+    # Input validation, which also resolves the doctor through the queryset
+    sample = appointments.first()
+    if sample:
+        payload = {
+            'doctor': sample.doctor_id,
+            'patient_name': BENCH_PATIENT,
+            'patient_email': 'loadtest@example.com',
+            'patient_phone': '5550000',
+            'appointment_date': (date.today() + timedelta(days=1)).isoformat(),
+            'appointment_time': '10:00',
+            'consultation_type': sample.consultation_type,
+        }
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            AppointmentSerializer(data=payload).is_valid()
+            samples.append(time.perf_counter() - started)
+        results['AppointmentSerializer.is_valid'] = summarize(samples)
+    return results
+
+
+def cleanup():
+    """Delete rows the benchmarks booked"""
+    deleted, _ = Appointment.objects.filter(patient_name=BENCH_PATIENT).delete()
+    return deleted
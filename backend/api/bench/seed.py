@@ -0,0 +1,107 @@
+import random
+from datetime import date, time, timedelta
+
+from ..models import Specialization, Doctor, Appointment
+from ..occupancy import rebuild_occupancy
+from ..search import rebuild_search_index
+from ..stats import reconcile_booking_counts
+
+
+SPECIALIZATIONS = [
+    'Psychiatry', 'Clinical Psychology', 'Counselling', 'Child Psychology',
+    'Addiction Medicine', 'Neuropsychology', 'Family Therapy', 'Geriatric Psychiatry',
+]
+
+CONSULTATION_MODES = [mode for mode, _ in Doctor.CONSULTATION_MODES]
+
+# Consultation types each mode can actually book, so seeded rows stay valid
+MODE_TYPES = {
+    mode: [
+        consultation_type for consultation_type, _ in Appointment.CONSULTATION_TYPES
+        if Doctor(consultation_modes=mode).supports_consultation_type(consultation_type)
+    ]
+    for mode in CONSULTATION_MODES
+}
+
+STATUS_WEIGHTS = [('confirmed', 70), ('completed', 20), ('cancelled', 10)]
+
+
+def seed_catalog(specializations=len(SPECIALIZATIONS), doctors=200, rng=None):
+    """Create specializations and doctors in bulk, returning the doctors"""
+    rng = rng or random.Random(42)
+
+    names = [SPECIALIZATIONS[i % len(SPECIALIZATIONS)] + ('' if i < len(SPECIALIZATIONS) else f' {i}')
+             for i in range(specializations)]
+    Specialization.objects.bulk_create(
+        [Specialization(name=name, description=f'{name} services') for name in names],
+        ignore_conflicts=True
+    )
+    specs = list(Specialization.objects.filter(name__in=names))
+
+    Doctor.objects.bulk_create(
+        [
+            Doctor(
+                name=f'Bench Doctor {i}',
+                specialization=rng.choice(specs),
+                years_experience=rng.randint(1, 40),
+                bio=f'Benchmark profile {i} focusing on {rng.choice(names).lower()}.',
+                consultation_modes=rng.choice(CONSULTATION_MODES),
+            )
+            for i in range(doctors)
+        ],
+        batch_size=1000
+    )
+    # bulk_create skips the signals that maintain the search index
+    rebuild_search_index()
+    return list(Doctor.objects.filter(name__startswith='Bench Doctor ').order_by('id'))
+
+
+def seed_appointments(doctors, count, start_date=None, days=365, day_start=9, day_end=17,
+                      batch_size=5000, rng=None, progress=None):
+    """Bulk insert `count` appointments spread over doctors, days and hourly slots
+
+    Slots are sampled without replacement so (doctor, date, time) stays unique.
+    """
+    rng = rng or random.Random(42)
+    start_date = start_date or date.today() - timedelta(days=days // 2)
+    hours = list(range(day_start, day_end))
+    capacity = len(doctors) * days * len(hours)
+    if count > capacity:
+        raise ValueError(f'Only {capacity} unique slots available for {count} appointments.')
+
+    statuses = [status for status, _ in STATUS_WEIGHTS]
+    weights = [weight for _, weight in STATUS_WEIGHTS]
+
+    batch = []
+    created = 0
+    for slot in rng.sample(range(capacity), count):
+        doctor_index, remainder = divmod(slot, days * len(hours))
+        day_offset, hour_index = divmod(remainder, len(hours))
+        doctor = doctors[doctor_index]
+        batch.append(Appointment(
+            doctor=doctor,
+            patient_name=f'Patient {slot}',
+            patient_email=f'patient{slot}@example.com',
+            patient_phone=f'555{slot % 10000000:07d}',
+            appointment_date=start_date + timedelta(days=day_offset),
+            appointment_time=time(hours[hour_index], 0),
+            consultation_type=rng.choice(MODE_TYPES[doctor.consultation_modes]),
+            status=rng.choices(statuses, weights)[0],
+        ))
+        if len(batch) >= batch_size:
+            Appointment.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+            if progress:
+                progress(created, count)
+
+    if batch:
+        Appointment.objects.bulk_create(batch)
+        created += len(batch)
+        if progress:
+            progress(created, count)
+
+    # bulk_create skips the signals that maintain the occupancy bitmaps and counts
+    rebuild_occupancy(batch_size=batch_size)
+    reconcile_booking_counts([doctor.id for doctor in doctors])
+    return created
@@ -0,0 +1,41 @@
+import itertools
+import random
+import time
+
+from django.conf import settings
+from django.db import transaction, IntegrityError, OperationalError
+
+
+class SlotUnavailable(Exception):
+    """Raised when another confirmed booking already holds the slot"""
+
+
+def book_slot(save, timeout=None, backoff=None):
+    """Run `save` in its own transaction and let the database arbitrate the slot
+
+    The partial unique constraint on confirmed (doctor, date, time) rows makes
+    the insert itself the availability check, so there is no window between
+    checking and writing. Losing that race raises SlotUnavailable. Transient
+    lock errors (deadlocks, serialization failures, busy SQLite files) are
+    retried with jittered exponential backoff for up to `timeout` seconds.
+
+    The budget is time rather than attempts: under contention the number of
+    tries a booking needs grows with the number of writers, while the wait a
+    client can take does not. Each pause is capped at BOOKING_RETRY_MAX_BACKOFF
+    so late retries do not sleep through the moment the lock frees up.
+    """
+    timeout = settings.BOOKING_RETRY_TIMEOUT if timeout is None else timeout
+    backoff = settings.BOOKING_RETRY_BACKOFF if backoff is None else backoff
+    deadline = time.monotonic() + timeout
+
+    for attempt in itertools.count():
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            raise SlotUnavailable()
+        except OperationalError:
+            delay = min(backoff * 2 ** attempt, settings.BOOKING_RETRY_MAX_BACKOFF) * random.uniform(0.5, 1.5)
+            if time.monotonic() + delay > deadline:
+                raise
+            time.sleep(delay)
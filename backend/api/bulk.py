@@ -0,0 +1,321 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction, IntegrityError
+from django.http import StreamingHttpResponse
+
+from .models import Doctor, Appointment
+from .occupancy import refresh_occupancy
+from .schedule import get_schedules
+from .stats import refresh_booking_counts
+from .slotcache import evict_booked_slots
+
+
+IMPORT_FIELDS = [
+    'doctor', 'patient_name', 'patient_email', 'patient_phone',
+    'appointment_date', 'appointment_time', 'consultation_type', 'status', 'notes'
+]
+
+EXPORT_FIELDS = ['id'] + IMPORT_FIELDS + ['created_at']
+
+FORMATS = ('csv', 'jsonl')
+
+CONSULTATION_TYPES = {value for value, _ in Appointment.CONSULTATION_TYPES}
+STATUSES = {value for value, _ in Appointment.STATUS_CHOICES}
+
+
+def detect_format(filename, default='csv'):
+    """Guess csv/jsonl from a file name"""
+    if filename and filename.lower().endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if filename and filename.lower().endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def read_rows(stream, file_format):
+    """Yield (line_number, row dict or None, error) from a text stream of CSV or JSONL"""
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_number, None, 'Invalid JSON'
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, 'Each line must be a JSON object'
+                continue
+            yield line_number, row, None
+    else:
+        raise ValueError(f'Unsupported format {file_format!r}; use one of {", ".join(FORMATS)}.')
+
+
+def parse_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value).strip())
+
+
+def parse_time(value):
+    value = str(value).strip()
+    for pattern in ('%H:%M:%S', '%H:%M'):
+        try:
+            return datetime.strptime(value, pattern).time()
+        except ValueError:
+            pass
+    raise ValueError(value)
+
+
+def clean_row(row, now):
+    """Validate the field formats of one row; returns (values, errors)"""
+    errors = {}
+    values = {}
+
+    def text(name, max_length, required=True):
+        value = str(row.get(name) or '').strip()
+        if required and not value:
+            errors[name] = 'This field is required.'
+        elif len(value) > max_length:
+            errors[name] = f'Ensure this field has no more than {max_length} characters.'
+        return value
+
+    try:
+        values['doctor_id'] = int(row.get('doctor'))
+    except (TypeError, ValueError):
+        errors['doctor'] = 'A valid doctor id is required.'
+
+    values['patient_name'] = text('patient_name', 200)
+    values['patient_email'] = text('patient_email', 254)
+    if values['patient_email'] and 'patient_email' not in errors:
+        try:
+            validate_email(values['patient_email'])
+        except ValidationError:
+            errors['patient_email'] = 'Enter a valid email address.'
+    values['patient_phone'] = text('patient_phone', 15)
+    values['notes'] = str(row.get('notes') or '')
+
+    try:
+        values['appointment_date'] = parse_date(row.get('appointment_date'))
+    except (TypeError, ValueError):
+        errors['appointment_date'] = 'Use YYYY-MM-DD.'
+    try:
+        values['appointment_time'] = parse_time(row.get('appointment_time'))
+    except ValueError:
+        errors['appointment_time'] = 'Use HH:MM or HH:MM:SS.'
+
+    values['consultation_type'] = str(row.get('consultation_type') or '').strip()
+    if values['consultation_type'] not in CONSULTATION_TYPES:
+        errors['consultation_type'] = f'Must be one of {", ".join(sorted(CONSULTATION_TYPES))}.'
+
+    values['status'] = str(row.get('status') or 'confirmed').strip()
+    if values['status'] not in STATUSES:
+        errors['status'] = f'Must be one of {", ".join(sorted(STATUSES))}.'
+
+    # Historical (completed/cancelled) rows may be in the past; new bookings
+    # may not, down to the time of day as in Appointment.clean
+    if values['status'] == 'confirmed' and values.get('appointment_date'):
+        today = now.date()
+        if values['appointment_date'] < today:
+            errors['appointment_date'] = 'Cannot book appointments in the past.'
+        elif values['appointment_date'] == today and values.get('appointment_time') and values['appointment_time'] < now.time():
+            errors['appointment_time'] = 'Cannot book appointments in the past.'
+
+    return values, errors
+
+
+class AppointmentImporter:
+    """Validate and insert appointment rows in batches
+
+    Doctors are loaded once per batch (and remembered across batches), slot
+    conflicts are detected in memory against the file itself plus one query per
+    batch against existing confirmed bookings, and valid rows are written with
+    bulk_create. Confirmed rows are held to the doctors' compiled schedules
+    like API bookings. Invalid rows are skipped and reported with their line number.
+    """
+
+    def __init__(self, batch_size=None, dry_run=False, max_errors=None, now=None):
+        self.batch_size = batch_size or settings.BULK_IMPORT_BATCH_SIZE
+        self.dry_run = dry_run
+        self.max_errors = max_errors
+        self.now = now or datetime.now()
+        self.doctors = {}
+        self.claimed = set()
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line_number, errors):
+        self.error_count += 1
+        if self.max_errors is None or len(self.errors) < self.max_errors:
+            self.errors.append({'line': line_number, 'errors': errors})
+
+    def run(self, rows, progress=None):
+        batch = []
+        for line_number, row, error in rows:
+            if error:
+                self.add_error(line_number, {'row': error})
+                continue
+            batch.append((line_number, row))
+            if len(batch) >= self.batch_size:
+                self.process_batch(batch)
+                batch = []
+                if progress:
+                    progress(self)
+        if batch:
+            self.process_batch(batch)
+            if progress:
+                progress(self)
+        return self.report()
+
+    def report(self):
+        return {
+            'created': self.created,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'dry_run': self.dry_run,
+        }
+
+    def load_doctors(self, doctor_ids):
+        missing = doctor_ids - self.doctors.keys()
+        if missing:
+            found = Doctor.objects.filter(id__in=missing, is_active=True).only(
+                'id', 'is_available', 'consultation_modes'
+            )
+            self.doctors.update({doctor.id: doctor for doctor in found})
+            # Remember misses too so unknown ids are not looked up again
+            self.doctors.update({doctor_id: None for doctor_id in missing - self.doctors.keys()})
+
+    def existing_slots(self, rows):
+        """Confirmed bookings already in the database for the batch's doctors and days"""
+        keys = {
+            (values['doctor_id'], values['appointment_date'], values['appointment_time'])
+            for _, values in rows if values['status'] == 'confirmed'
+        }
+        if not keys:
+            return set()
+        return set(Appointment.objects.filter(
+            doctor_id__in={doctor_id for doctor_id, _, _ in keys},
+            appointment_date__in={day for _, day, _ in keys},
+            status='confirmed'
+        ).order_by().values_list('doctor_id', 'appointment_date', 'appointment_time')) & keys
+
+    def process_batch(self, batch):
+        cleaned = []
+        for line_number, row in batch:
+            values, errors = clean_row(row, self.now)
+            if errors:
+                self.add_error(line_number, errors)
+            else:
+                cleaned.append((line_number, values))
+
+        self.load_doctors({values['doctor_id'] for _, values in cleaned})
+        taken = self.existing_slots(cleaned)
+        # Confirmed rows must fall on the doctor's slots, as for bookings through the API
+        schedules = get_schedules([
+            doctor_id for doctor_id in {values['doctor_id'] for _, values in cleaned if values['status'] == 'confirmed'}
+            if self.doctors.get(doctor_id) is not None
+        ])
+
+        valid = []
+        for line_number, values in cleaned:
+            doctor = self.doctors.get(values['doctor_id'])
+            if doctor is None:
+                self.add_error(line_number, {'doctor': 'Doctor not found.'})
+                continue
+            if not doctor.supports_consultation_type(values['consultation_type']):
+                mode_display = dict(Doctor.CONSULTATION_MODES).get(doctor.consultation_modes, doctor.consultation_modes)
+                self.add_error(line_number, {'consultation_type': f'Doctor only offers {mode_display} consultations.'})
+                continue
+            if values['status'] == 'confirmed':
+                if not doctor.is_available:
+                    self.add_error(line_number, {'doctor': 'Doctor is not available for appointments.'})
+                    continue
+                template = schedules[doctor.id].template(values['appointment_date'])
+                if not template:
+                    self.add_error(line_number, {'appointment_date': 'Doctor is not working on this date.'})
+                    continue
+                if not template.offers(values['appointment_time']):
+                    self.add_error(line_number, {'appointment_time': "This time is not one of the doctor's slots on this date."})
+                    continue
+                slot = (values['doctor_id'], values['appointment_date'], values['appointment_time'])
+                if slot in taken or slot in self.claimed:
+                    self.add_error(line_number, {'appointment_time': 'This time slot is already booked.'})
+                    continue
+                self.claimed.add(slot)
+            valid.append((line_number, Appointment(**values)))
+
+        if valid and not self.dry_run:
+            self.write(valid)
+
+    def write(self, valid):
+        # bulk_create sends no post_save, so refresh the occupancy bitmaps and
+        # booking counts and evict the availability cache by hand
+        days = {(appointment.doctor_id, appointment.appointment_date) for _, appointment in valid}
+        try:
+            with transaction.atomic():
+                Appointment.objects.bulk_create([appointment for _, appointment in valid])
+                refresh_occupancy(days)
+                refresh_booking_counts(days)
+            self.created += len(valid)
+        except IntegrityError:
+            # A live booking took one of the slots since we checked; insert row by
+            # row so only the conflicting rows are rejected
+            for line_number, appointment in valid:
+                try:
+                    with transaction.atomic():
+                        Appointment.objects.bulk_create([appointment])
+                    self.created += 1
+                except IntegrityError:
+                    self.add_error(line_number, {'appointment_time': 'This time slot is already booked.'})
+            with transaction.atomic():
+                refresh_occupancy(days)
+                refresh_booking_counts(days)
+
+        evict_booked_slots(*days)
+
+
+def export_rows(queryset, file_format, chunk_size=None):
+    """Yield a queryset of appointments as CSV or JSONL text, a chunk at a time"""
+    if file_format not in FORMATS:
+        raise ValueError(f'Unsupported format {file_format!r}; use one of {", ".join(FORMATS)}.')
+    chunk_size = chunk_size or settings.APPOINTMENT_STREAM_CHUNK_SIZE
+    columns = ['id', 'doctor_id'] + IMPORT_FIELDS[1:] + ['created_at']
+    rows = queryset.order_by('appointment_date', 'appointment_time', 'id').values_list(*columns)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if file_format == 'csv':
+        writer.writerow(EXPORT_FIELDS)
+
+    for count, row in enumerate(rows.iterator(chunk_size=chunk_size), start=1):
+        row = [value.isoformat() if hasattr(value, 'isoformat') else value for value in row]
+        if file_format == 'csv':
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False))
+            buffer.write('\n')
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_export(queryset, file_format):
+    """Streaming download of appointments as CSV or JSONL"""
+    content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+    # Rows are read after the view returns, outside the request's routing, so
+    # pin the database (a replica for replica_reads views) now
+    queryset = queryset.using(queryset.db)
+    response = StreamingHttpResponse(export_rows(queryset, file_format), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="appointments.{file_format}"'
+    return response
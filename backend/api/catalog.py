@@ -0,0 +1,60 @@
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+VERSION_KEY = 'catalog:version'
+
+
+def get_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def get_catalog_version():
+    """Return the current (token, last_modified) pair of the doctor catalog"""
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # add() so concurrent first requests agree on one version
+        cache.add(VERSION_KEY, (uuid.uuid4().hex, int(time.time())), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Start a new catalog version; entries cached under the old one are never read again"""
+    get_cache().set(VERSION_KEY, (uuid.uuid4().hex, int(time.time())), None)
+
+
+def catalog_response(request, name, build):
+    """Serve catalog data through the cache with ETag/Last-Modified revalidation
+
+    `build` produces the serialized data on a miss. The cache key and ETag are
+    derived from the catalog version, so a bump invalidates every entry at once.
+    """
+    token, last_modified = get_catalog_version()
+    params = '&'.join(f'{key}={value}' for key, value in sorted(request.query_params.items()))
+    digest = hashlib.md5(f'{token}:{name}:{params}'.encode(), usedforsecurity=False).hexdigest()
+    etag = quote_etag(digest)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    cache = get_cache()
+    key = f'catalog:{digest}'
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, settings.CATALOG_CACHE_TIMEOUT)
+
+    response = Response(data)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
@@ -0,0 +1,45 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.archive import archivable, archive_appointments, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Move completed and cancelled appointments past the retention horizon to the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, help='Archive appointments dated more than this many days ago (default: ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--before', type=date.fromisoformat, help='Archive appointments dated before this YYYY-MM-DD instead')
+        parser.add_argument('--batch-size', type=int, help='Appointments moved per transaction (default: ARCHIVE_BATCH_SIZE)')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches; rerun to continue')
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to pause between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Count what would be archived without moving it')
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        if options['before']:
+            before = options['before']
+        elif options['older_than_days'] is not None:
+            before = today - timedelta(days=options['older_than_days'])
+        else:
+            before = archive_cutoff(today)
+        # Booking counts only add archived rows back for past days
+        if before > today:
+            raise CommandError('Only appointments dated before today can be archived.')
+
+        if options['dry_run']:
+            count = archivable(before).count()
+            self.stdout.write(self.style.SUCCESS(f'Would archive {count} appointments dated before {before}'))
+            return
+
+        def progress(moved):
+            self.stdout.write(f'  {moved} appointments', ending='\r')
+
+        moved = archive_appointments(
+            before, batch_size=options['batch_size'] or settings.ARCHIVE_BATCH_SIZE,
+            max_batches=options['max_batches'], pause=options['sleep'], progress=progress
+        )
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} appointments dated before {before}'))
@@ -0,0 +1,144 @@
+import json
+import platform
+import random
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.bench.load import DEFAULT_MIX, parse_mix, run_contention, run_load
+from api.bench.micro import SCENARIOS, BenchContext, cleanup, run_serializer_benchmarks, run_view_benchmarks
+from api.bench.seed import seed_catalog, seed_appointments
+from api.management.commands.benchmark_indexes import LOCAL_HOSTS
+from api.models import Doctor, Appointment
+
+
+class Command(BaseCommand):
+    help = 'Seed a local database and benchmark every API view, the serializers and a concurrent traffic mix'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true', help='Seed doctors and appointments first')
+        parser.add_argument('--doctors', type=int, default=2000)
+        parser.add_argument('--appointments', type=int, default=1000000)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--views', help='Comma separated scenarios to microbenchmark (default: all)')
+        parser.add_argument('--cold', action='store_true', help='Clear the catalog/slot caches before each timed call')
+        parser.add_argument('--skip-micro', action='store_true')
+        parser.add_argument('--skip-load', action='store_true')
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run the load mix')
+        parser.add_argument('--mix', help=f"Load mix as name=weight,... (default: {','.join(f'{k}={v}' for k, v in DEFAULT_MIX.items())})")
+        parser.add_argument(
+            '--contention', type=int, default=0, metavar='ATTEMPTS',
+            help='Also time ATTEMPTS concurrent bookings of one slot, then of one doctor\'s distinct slots (at most 200)'
+        )
+        parser.add_argument('--url', help='Drive the load mix against a running server instead of in-process')
+        parser.add_argument('--keep', action='store_true', help='Keep the appointments the benchmark booked')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--allow-remote', action='store_true', help='Allow running against a non-local database')
+
+    def handle(self, *args, **options):
+        settings_dict = connection.settings_dict
+        if connection.vendor != 'sqlite' and settings_dict.get('HOST') not in LOCAL_HOSTS and not options['allow_remote']:
+            raise CommandError(
+                f"Refusing to benchmark against {settings_dict.get('HOST')}. "
+                'Point DATABASE_URL at a local database or pass --allow-remote.'
+            )
+
+        try:
+            mix = parse_mix(options['mix']) if options['mix'] else DEFAULT_MIX
+            views = options['views'].split(',') if options['views'] else list(SCENARIOS)
+            unknown = set(views) - set(SCENARIOS)
+            if unknown:
+                raise ValueError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+            # Contended days sit in the 30 free days before the other benchmark writes
+            if not 0 <= options['contention'] <= 200:
+                raise ValueError('--contention must be between 0 and 200.')
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['seed']:
+            self.seed(options)
+
+        try:
+            ctx = BenchContext()
+        except ValueError as e:
+            raise CommandError(f'{e} Run with --seed.')
+
+        results = {
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'vendor': connection.vendor,
+            'python': platform.python_version(),
+            'doctors': Doctor.objects.count(),
+            'appointments': Appointment.objects.count(),
+        }
+
+        try:
+            if not options['skip_micro']:
+                self.stdout.write(self.style.MIGRATE_HEADING('\n== views =='))
+                results['views'] = run_view_benchmarks(ctx, views, repeat=options['repeat'], cold=options['cold'])
+                self.report(results['views'])
+
+                self.stdout.write(self.style.MIGRATE_HEADING('\n== serializers =='))
+                results['serializers'] = run_serializer_benchmarks(repeat=options['repeat'])
+                self.report(results['serializers'])
+
+            if not options['skip_load']:
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f"\n== load: {options['workers']} workers for {options['duration']}s =="
+                ))
+                results['load'] = run_load(
+                    ctx, mix, workers=options['workers'], duration=options['duration'], base_url=options['url']
+                )
+                load = results['load']
+                self.stdout.write(
+                    f"{load['requests']} requests, {load['errors']} errors, {load['throughput_rps']} req/s"
+                )
+                self.report(load['endpoints'])
+
+            if options['contention']:
+                results['contention'] = {}
+                same, distinct = ctx.contended_slots(options['contention'])
+                for name, slots in (('same_slot', same), ('distinct_slots', distinct)):
+                    self.stdout.write(self.style.MIGRATE_HEADING(
+                        f"\n== contention: {options['contention']} bookings, {name.replace('_', ' ')} =="
+                    ))
+                    run = run_contention(
+                        [ctx.booking_payload(slot) for slot in slots], workers=options['workers'], base_url=options['url']
+                    )
+                    results['contention'][name] = run
+                    self.stdout.write(
+                        f"{run['status_codes']} in {run['duration_s']}s: {run['bookings_per_second']} bookings/s, "
+                        f"{run['requests_per_second']} req/s, p99 {run['latency']['p99_ms']}ms"
+                    )
+        finally:
+            if not options['keep']:
+                cleanup()
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(results, fh, indent=2, default=str)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def report(self, results):
+        for name, timings in results.items():
+            line = f"  {name:<36} p50 {timings['p50_ms']:>8}ms  p95 {timings['p95_ms']:>8}ms  p99 {timings['p99_ms']:>8}ms"
+            if timings.get('rows_per_s') is not None:
+                line += f"  {timings['rows_per_s']} rows/s"
+            if timings.get('queries_per_request') is not None:
+                line += f"  {timings['queries_per_request']} queries"
+            if timings.get('errors'):
+                line += self.style.ERROR(f"  {timings['errors']} errors")
+            self.stdout.write(line)
+
+    def seed(self, options):
+        self.stdout.write(f"Seeding {options['doctors']} doctors and {options['appointments']} appointments...")
+        rng = random.Random(42)
+        doctors = seed_catalog(doctors=options['doctors'], rng=rng)
+
+        def progress(done, total):
+            self.stdout.write(f'  {done}/{total}', ending='\r')
+
+        seed_appointments(doctors, options['appointments'], days=options['days'], rng=rng, progress=progress)
+        self.stdout.write('')
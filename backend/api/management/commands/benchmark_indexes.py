@@ -0,0 +1,157 @@
+import json
+import random
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Index, Min, Max
+
+from api.bench.seed import seed_catalog, seed_appointments
+from api.bench.timing import time_call
+from api.models import Doctor, Appointment
+
+
+LOCAL_HOSTS = ('', 'localhost', '127.0.0.1', '::1')
+
+
+def hot_queries(doctor_ids, first_date, last_date, rng):
+    """The booking hot paths, each returning a fresh queryset with random parameters"""
+    span = (last_date - first_date).days
+
+    def any_day():
+        return first_date + timedelta(days=rng.randint(0, span))
+
+    return {
+        # DoctorAvailabilityView: one doctor's confirmed bookings for a day
+        'availability_day': lambda: Appointment.objects.filter(
+            doctor_id=rng.choice(doctor_ids),
+            appointment_date=any_day(),
+            status='confirmed'
+        ).order_by().values_list('appointment_time', flat=True),
+        # AppointmentView.post / CheckAvailabilityView: double-booking check
+        'double_booking_check': lambda: Appointment.objects.filter(
+            doctor_id=rng.choice(doctor_ids),
+            appointment_date=any_day(),
+            appointment_time='10:00:00',
+            status='confirmed'
+        ).order_by().values('id')[:1],
+        # AppointmentView.get filtered by doctor, status and date range
+        'doctor_list': lambda: Appointment.objects.filter(
+            doctor_id=rng.choice(doctor_ids),
+            status='confirmed',
+            appointment_date__gte=any_day()
+        ).order_by('appointment_date', 'appointment_time')[:100],
+        # AppointmentView.get across doctors, ordered by date/time
+        'status_list': lambda: Appointment.objects.filter(
+            status='confirmed',
+            appointment_date__gte=any_day()
+        ).order_by('appointment_date', 'appointment_time')[:100],
+        # AvailabilityCalendarView: many doctors over a month
+        'calendar_range': lambda: Appointment.objects.filter(
+            doctor_id__in=rng.sample(doctor_ids, min(50, len(doctor_ids))),
+            appointment_date__range=(first_date, first_date + timedelta(days=29)),
+            status='confirmed'
+        ).order_by().values_list('doctor_id', 'appointment_date', 'appointment_time'),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a local database with appointments and compare hot query plans/timings with and without '
+        "the booking indexes: Appointment's Meta.indexes and the index behind its confirmed-slot "
+        'unique constraint. Only the doctor foreign key index stays in the "before" phase.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--appointments', type=int, default=300000)
+        parser.add_argument('--doctors', type=int, default=200)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--skip-seed', action='store_true', help='Reuse appointments already in the database')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--allow-remote', action='store_true', help='Allow running against a non-local database')
+
+    def handle(self, *args, **options):
+        settings_dict = connection.settings_dict
+        if connection.vendor != 'sqlite' and settings_dict.get('HOST') not in LOCAL_HOSTS and not options['allow_remote']:
+            raise CommandError(
+                f"Refusing to seed benchmark data into {settings_dict.get('HOST')}. "
+                'Point DATABASE_URL at a local database or pass --allow-remote.'
+            )
+
+        if not options['skip_seed']:
+            self.seed(options)
+
+        doctor_ids = list(Doctor.objects.values_list('id', flat=True))
+        bounds = Appointment.objects.aggregate(first=Min('appointment_date'), last=Max('appointment_date'))
+        if not doctor_ids or bounds['first'] is None:
+            raise CommandError('No appointments to benchmark. Run without --skip-seed first.')
+
+        # The confirmed-slot constraint is a partial unique index on (doctor, date, time)
+        indexes = [*Appointment._meta.indexes, *Appointment._meta.constraints]
+        results = {'vendor': connection.vendor, 'appointments': Appointment.objects.count(), 'phases': {}}
+
+        try:
+            for phase, enabled in (('before', False), ('after', True)):
+                self.set_indexes(indexes, enabled)
+                rng = random.Random(7)
+                queries = hot_queries(doctor_ids, bounds['first'], bounds['last'], rng)
+                results['phases'][phase] = {}
+                self.stdout.write(self.style.MIGRATE_HEADING(f'\n== {phase} indexes =='))
+
+                for name, make_queryset in queries.items():
+                    plan = make_queryset().explain()
+                    timings = time_call(lambda: list(make_queryset()), repeat=options['repeat'])
+                    results['phases'][phase][name] = {'plan': plan, 'timings': timings}
+
+                    self.stdout.write(self.style.SUCCESS(name))
+                    self.stdout.write(f"  p50 {timings['p50_ms']}ms  p95 {timings['p95_ms']}ms  p99 {timings['p99_ms']}ms")
+                    for line in plan.splitlines():
+                        self.stdout.write(f'  | {line}')
+        finally:
+            # Always leave the schema the way the migrations expect it
+            self.set_indexes(indexes, True)
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(results, fh, indent=2, default=str)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def seed(self, options):
+        self.stdout.write(f"Seeding {options['doctors']} doctors and {options['appointments']} appointments...")
+        rng = random.Random(42)
+        doctors = seed_catalog(doctors=options['doctors'], rng=rng)
+
+        def progress(done, total):
+            self.stdout.write(f'  {done}/{total}', ending='\r')
+
+        seed_appointments(doctors, options['appointments'], days=options['days'], rng=rng, progress=progress)
+        self.stdout.write('')
+
+        # Refresh planner statistics so both phases see the same data distribution
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def set_indexes(self, indexes, enabled):
+        """Create or drop the model's Meta.indexes and constraints to compare both states
+
+        Nothing writes while the constraint is dropped, and it is restored
+        (validating the seeded rows) before the command exits.
+        """
+        table = Appointment._meta.db_table
+        with connection.cursor() as cursor:
+            existing = connection.introspection.get_constraints(cursor, table)
+
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                if isinstance(index, Index):
+                    add, remove = editor.add_index, editor.remove_index
+                else:
+                    add, remove = editor.add_constraint, editor.remove_constraint
+                if enabled and index.name not in existing:
+                    add(Appointment, index)
+                elif not enabled and index.name in existing:
+                    remove(Appointment, index)
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
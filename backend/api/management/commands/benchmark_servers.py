@@ -0,0 +1,141 @@
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.bench.load import parse_mix, run_load
+from api.bench.micro import ASYNC_TWINS, BenchContext
+
+
+# Read-heavy mix the async views cover
+READ_MIX = {
+    'appointment_list': 2,
+    'doctor_availability': 3,
+    'availability_calendar': 1,
+    'check_availability': 4,
+}
+
+
+# Environment for each connection-management setup compared by --connections
+CONNECTION_MODES = {
+    'no-persistence': {'DB_POOL': 'False', 'DB_CONN_MAX_AGE': '0'},
+    'persistent': {'DB_POOL': 'False', 'DB_CONN_MAX_AGE': '600', 'DB_CONN_HEALTH_CHECKS': 'True'},
+    'pool': {'DB_POOL': 'True'},
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(base_url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urlopen(f'{base_url}/api/specializations/', timeout=2):
+                return
+        except (URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    raise CommandError(f'Server at {base_url} did not come up within {timeout}s')
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the sync views under gunicorn (WSGI) with the async views under uvicorn (ASGI) at equal '
+        'worker counts, or with --connections the WSGI server with and without persistent and pooled connections'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Server worker processes for both servers')
+        parser.add_argument('--concurrency', type=int, default=32, help='Concurrent client threads')
+        parser.add_argument('--duration', type=float, default=20.0)
+        parser.add_argument('--mix', help='Sync scenario mix as name=weight,...; async twins are used for ASGI')
+        parser.add_argument('--connections', action='store_true', help='Compare connection handling (Postgres only): a new connection per request, persistent connections and the psycopg pool')
+        parser.add_argument('--startup-timeout', type=float, default=30.0)
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and settings.DATABASES['default']['NAME'] == ':memory:':
+            raise CommandError('The servers need a shared database; point DATABASE_URL at a file or local Postgres.')
+        if options['connections'] and connection.vendor != 'postgresql':
+            raise CommandError('--connections compares Postgres connection handling; point DATABASE_URL at a local Postgres.')
+        for module in ('gunicorn',) if options['connections'] else ('gunicorn', 'uvicorn'):
+            if importlib.util.find_spec(module) is None:
+                raise CommandError(f'{module} is not installed (pip install -r requirements.txt).')
+
+        try:
+            mix = parse_mix(options['mix']) if options['mix'] else READ_MIX
+        except ValueError as e:
+            raise CommandError(str(e))
+        missing = set(mix) - set(ASYNC_TWINS)
+        if missing:
+            raise CommandError(f'No async version of: {", ".join(sorted(missing))}')
+
+        try:
+            ctx = BenchContext()
+        except ValueError as e:
+            raise CommandError(f'{e} Run benchmark_api --seed first.')
+
+        workers = str(options['workers'])
+
+        def gunicorn(port):
+            return [
+                sys.executable, '-m', 'gunicorn', 'hospital.wsgi:application',
+                '--workers', workers, '--bind', f'127.0.0.1:{port}', '--log-level', 'warning',
+            ]
+
+        def uvicorn(port):
+            return [
+                sys.executable, '-m', 'uvicorn', 'hospital.asgi:application',
+                '--workers', workers, '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning',
+            ]
+
+        if options['connections']:
+            servers = {
+                f'wsgi-{mode}': (mix, gunicorn, {**os.environ, **env})
+                for mode, env in CONNECTION_MODES.items()
+            }
+        else:
+            servers = {
+                'wsgi': (mix, gunicorn, None),
+                'asgi': ({ASYNC_TWINS[name]: weight for name, weight in mix.items()}, uvicorn, None),
+            }
+
+        results = {'workers': options['workers'], 'concurrency': options['concurrency'], 'servers': {}}
+        for name, (server_mix, command, env) in servers.items():
+            port = free_port()
+            base_url = f'http://127.0.0.1:{port}'
+            process = subprocess.Popen(command(port), cwd=settings.BASE_DIR, env=env)
+            try:
+                wait_until_ready(base_url, options['startup_timeout'])
+                self.stdout.write(self.style.MIGRATE_HEADING(f'\n== {name}: {" ".join(command(port)[2:4])} =='))
+                load = run_load(
+                    ctx, server_mix, workers=options['concurrency'],
+                    duration=options['duration'], base_url=base_url
+                )
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+            results['servers'][name] = load
+            self.stdout.write(f"{load['requests']} requests, {load['errors']} errors, {load['throughput_rps']} req/s")
+            for endpoint, timings in load['endpoints'].items():
+                self.stdout.write(
+                    f"  {endpoint:<30} p50 {timings['p50_ms']:>8}ms  p95 {timings['p95_ms']:>8}ms  p99 {timings['p99_ms']:>8}ms"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(results, fh, indent=2, default=str)
+            self.stdout.write(f"Results written to {options['output']}")
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from api.bulk import FORMATS, export_rows
+from api.models import Appointment
+
+
+class Command(BaseCommand):
+    help = 'Stream appointments out as CSV or JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', help='File to write to (default: stdout)')
+        parser.add_argument('--doctor', type=int)
+        parser.add_argument('--status')
+        parser.add_argument('--start-date')
+        parser.add_argument('--end-date')
+
+    def handle(self, *args, **options):
+        appointments = Appointment.objects.all()
+        if options['doctor']:
+            appointments = appointments.filter(doctor_id=options['doctor'])
+        if options['status']:
+            appointments = appointments.filter(status=options['status'])
+        if options['start_date']:
+            appointments = appointments.filter(appointment_date__gte=options['start_date'])
+        if options['end_date']:
+            appointments = appointments.filter(appointment_date__lte=options['end_date'])
+
+        chunks = export_rows(appointments, options['format'])
+        if options['output']:
+            with open(options['output'], 'w', newline='') as fh:
+                fh.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
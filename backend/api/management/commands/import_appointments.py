@@ -0,0 +1,51 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bulk import AppointmentImporter, FORMATS, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk import appointments from a CSV or JSONL file, validating in batches and reporting bad rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin")
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension, then csv')
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--dry-run', action='store_true', help='Validate without writing')
+        parser.add_argument('--errors', help='Write the per-row error report as JSONL to this file')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or detect_format(options['path'])
+        importer = AppointmentImporter(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        started = time.perf_counter()
+
+        def progress(importer):
+            self.stdout.write(f'  {importer.created} created, {importer.error_count} errors', ending='\r')
+
+        try:
+            if options['path'] == '-':
+                report = importer.run(read_rows(sys.stdin, file_format), progress=progress)
+            else:
+                with open(options['path'], encoding='utf-8-sig', newline='') as fh:
+                    report = importer.run(read_rows(fh, file_format), progress=progress)
+        except OSError as e:
+            raise CommandError(str(e))
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write('')
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {report['created']} appointments in {elapsed:.1f}s; {report['error_count']} rows rejected"
+        ))
+
+        if options['errors']:
+            with open(options['errors'], 'w') as fh:
+                for error in report['errors']:
+                    fh.write(json.dumps(error) + '\n')
+            self.stdout.write(f"Error report written to {options['errors']}")
+        else:
+            for error in report['errors'][:20]:
+                self.stdout.write(self.style.WARNING(f"  line {error['line']}: {error['errors']}"))
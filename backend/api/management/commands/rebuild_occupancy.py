@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.occupancy import rebuild_occupancy
+from api.slotcache import booked_slot_cache
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-doctor, per-day booked-slot bitmaps from the appointments table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Days written per insert (default: BULK_IMPORT_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        def progress(written):
+            self.stdout.write(f'  {written} days', ending='\r')
+
+        written = rebuild_occupancy(batch_size=options['batch_size'], progress=progress)
+        booked_slot_cache.clear()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt occupancy for {written} doctor-days'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.search import rebuild_search_index, uses_postgres
+
+
+class Command(BaseCommand):
+    help = "Recompute every doctor's Postgres search document, e.g. after rows were written with bulk_create"
+
+    def handle(self, *args, **options):
+        if not uses_postgres():
+            self.stdout.write('Not on Postgres: each server process builds its in-memory index on its first search.')
+            return
+        indexed = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Re-indexed {indexed} doctors'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Doctor
+from api.stats import reconcile_booking_counts
+
+
+class Command(BaseCommand):
+    help = 'Recount the per-doctor daily booking counts from the appointments table and fix any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Doctors recounted per transaction (default: BOOKING_COUNT_RECONCILE_BATCH_SIZE)')
+        parser.add_argument('--doctor', type=int, action='append', help='Only this doctor (repeatable)')
+        parser.add_argument('--dry-run', action='store_true', help='Report the drift without fixing it')
+
+    def handle(self, *args, **options):
+        doctor_ids = options['doctor'] or list(Doctor.objects.values_list('id', flat=True))
+
+        def progress(done, created, updated, deleted):
+            self.stdout.write(f'  {done}/{len(doctor_ids)} doctors', ending='\r')
+
+        created, updated, deleted = reconcile_booking_counts(
+            doctor_ids, batch_size=options['batch_size'], dry_run=options['dry_run'], progress=progress
+        )
+        verb = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {created} missing, {updated} wrong and {deleted} stale counts for {len(doctor_ids)} doctors'
+        ))
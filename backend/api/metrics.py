@@ -0,0 +1,206 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class QueryRecorder:
+    """connection.execute_wrapper hook that times queries and spots repeats
+
+    Exact repeats (same SQL and params) are counted as duplicates; the same SQL
+    with different params is counted as similar, which is what an N+1 loop such
+    as one query per slot looks like.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self.templates = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.templates[sql] += 1
+            try:
+                self.statements[(sql, repr(params))] += 1
+            except Exception:
+                pass
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values())
+
+    @property
+    def similar(self):
+        return sum(count - 1 for count in self.templates.values())
+
+    def worst_template(self):
+        if not self.templates:
+            return None, 0
+        return self.templates.most_common(1)[0]
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Per-process request metrics, keyed by (view, method, status)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.durations = {}
+        self.db_durations = {}
+        self.queries = {}
+        self.duplicates = Counter()
+        self.similar = Counter()
+        self.response_bytes = Counter()
+        self.connections_opened = Counter()
+
+    def connection_opened(self, alias):
+        """Without a pool every connection pays a full connect and TLS/auth handshake"""
+        with self.lock:
+            self.connections_opened[alias] += 1
+
+    def observe(self, view, method, status, duration, recorder, size=None):
+        key = (view, method, str(status))
+        with self.lock:
+            self.durations.setdefault(key, Histogram(DURATION_BUCKETS)).observe(duration)
+            self.db_durations.setdefault(key, Histogram(DURATION_BUCKETS)).observe(recorder.duration)
+            self.queries.setdefault(key, Histogram(QUERY_BUCKETS)).observe(recorder.count)
+            self.duplicates[key] += recorder.duplicates
+            self.similar[key] += recorder.similar
+            if size is not None:
+                self.response_bytes[key] += size
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            self.render_histogram(lines, 'mindcare_request_duration_seconds', 'Wall time of sampled requests', self.durations)
+            self.render_histogram(lines, 'mindcare_request_db_duration_seconds', 'Database time of sampled requests', self.db_durations)
+            self.render_histogram(lines, 'mindcare_request_queries', 'Queries per sampled request', self.queries)
+            self.render_counter(lines, 'mindcare_request_duplicate_queries_total', 'Queries repeating an earlier query of the same request exactly', self.duplicates)
+            self.render_counter(lines, 'mindcare_request_similar_queries_total', 'Queries repeating the SQL of an earlier query of the same request (N+1 pattern)', self.similar)
+            self.render_counter(lines, 'mindcare_response_size_bytes_total', 'Response bytes of sampled non-streaming requests', self.response_bytes)
+            self.render_connections(lines)
+        return '\n'.join(lines) + '\n'
+
+    def render_connections(self, lines):
+        lines.append('# HELP mindcare_db_connections_opened_total Connections Django opened, or checked out of the pool')
+        lines.append('# TYPE mindcare_db_connections_opened_total counter')
+        for alias, value in sorted(self.connections_opened.items()):
+            lines.append(f'mindcare_db_connections_opened_total{{alias="{escape(alias)}"}} {value}')
+
+        stats = pool_stats()
+        for name, kind, help_text, value in POOL_METRICS:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for alias, pool in sorted(stats.items()):
+                lines.append(f'{name}{{alias="{escape(alias)}"}} {value(pool)}')
+
+    @staticmethod
+    def labels(key, **extra):
+        view, method, status = key
+        pairs = {'view': view, 'method': method, 'status': status, **extra}
+        return ','.join(f'{name}="{escape(value)}"' for name, value in pairs.items())
+
+    def render_histogram(self, lines, name, help_text, histograms):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for key, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{self.labels(key, le=format_bound(bound))}}} {cumulative}')
+            lines.append(f'{name}_bucket{{{self.labels(key, le="+Inf")}}} {histogram.count}')
+            lines.append(f'{name}_sum{{{self.labels(key)}}} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{{{self.labels(key)}}} {histogram.count}')
+
+    def render_counter(self, lines, name, help_text, counter):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for key, value in sorted(counter.items()):
+            lines.append(f'{name}{{{self.labels(key)}}} {value}')
+
+
+# psycopg_pool statistics exposed per pool: (name, type, help, value from get_stats())
+POOL_METRICS = [
+    ('mindcare_db_pool_size', 'gauge', 'Connections the pool holds', lambda stats: stats['pool_size']),
+    ('mindcare_db_pool_max_size', 'gauge', 'Most connections the pool may hold', lambda stats: stats['pool_max']),
+    ('mindcare_db_pool_in_use', 'gauge', 'Pooled connections handed out', lambda stats: stats['pool_size'] - stats['pool_available']),
+    ('mindcare_db_pool_waiting', 'gauge', 'Requests waiting for a connection', lambda stats: stats['requests_waiting']),
+    ('mindcare_db_pool_requests_total', 'counter', 'Connections requested from the pool', lambda stats: stats.get('requests_num', 0)),
+    ('mindcare_db_pool_waits_total', 'counter', 'Requests that had to wait for a connection', lambda stats: stats.get('requests_queued', 0)),
+    ('mindcare_db_pool_wait_seconds_total', 'counter', 'Time spent waiting for a connection', lambda stats: stats.get('requests_wait_ms', 0) / 1000),
+    ('mindcare_db_pool_timeouts_total', 'counter', 'Requests that gave up waiting after DB_POOL_TIMEOUT', lambda stats: stats.get('requests_errors', 0)),
+    ('mindcare_db_pool_connects_total', 'counter', 'Connections the pool opened', lambda stats: stats.get('connections_num', 0)),
+    ('mindcare_db_pool_connect_seconds_total', 'counter', 'Time spent on connection handshakes', lambda stats: stats.get('connections_ms', 0) / 1000),
+    ('mindcare_db_pool_connects_failed_total', 'counter', 'Failed connection attempts', lambda stats: stats.get('connections_errors', 0)),
+    ('mindcare_db_pool_connections_lost_total', 'counter', 'Connections found broken by the health check', lambda stats: stats.get('connections_lost', 0)),
+]
+
+
+def pool_stats():
+    """alias -> psycopg_pool statistics, for each database using a connection pool"""
+    stats = {}
+    for alias in connections:
+        options = connections.settings[alias].get('OPTIONS', {})
+        if options.get('pool'):
+            pool = connections[alias].pool
+            # Pools open on first use; before that their sizes mean nothing
+            if not pool.closed:
+                stats[alias] = pool.get_stats()
+    return stats
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_bound(bound):
+    return repr(float(bound))
+
+
+registry = MetricsRegistry()
+
+
+def metrics_view(request):
+    """Expose this process's request metrics for Prometheus to scrape
+
+    Requires `Authorization: Bearer <METRICS_TOKEN>`; without a token
+    configured the endpoint is only served when DEBUG is on.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponseForbidden()
+    elif not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
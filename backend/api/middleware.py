@@ -0,0 +1,169 @@
+import cProfile
+import logging
+import os
+import random
+import re
+import time
+import uuid
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from .metrics import QueryRecorder, registry
+from .routers import ReadRouting, routing
+
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """Record wall time, DB time, query counts and response size per view
+
+    A METRICS_SAMPLE_RATE fraction of requests is instrumented so the cost stays
+    low. Requests that repeat the same SQL more than METRICS_SIMILAR_QUERY_WARNING
+    times are logged as likely N+1 loops. When METRICS_PROFILE_DIR is set, a
+    request carrying the X-Profile header is also run under cProfile and the
+    dump's file name is returned in X-Profile-File.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Match the handler so async views are not pushed back onto a thread
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        if not self.should_instrument(request):
+            return self.get_response(request)
+
+        with Instrumentation(request) as instrumentation:
+            response = self.get_response(request)
+        return instrumentation.finish(response)
+
+    async def __acall__(self, request):
+        if not self.should_instrument(request):
+            return await self.get_response(request)
+
+        with Instrumentation(request) as instrumentation:
+            response = await self.get_response(request)
+        return instrumentation.finish(response)
+
+    @staticmethod
+    def should_instrument(request):
+        return wants_profile(request) or random.random() < settings.METRICS_SAMPLE_RATE
+
+
+def wants_profile(request):
+    return bool(settings.METRICS_PROFILE_DIR) and 'X-Profile' in request.headers
+
+
+class Instrumentation:
+    """Times one request and records its queries while the context is open"""
+
+    def __init__(self, request):
+        self.request = request
+        self.recorder = QueryRecorder()
+        self.profiler = cProfile.Profile() if wants_profile(request) else None
+        self.stack = ExitStack()
+
+    def __enter__(self):
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self.recorder))
+        if self.profiler:
+            self.profiler.enable()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.duration = time.perf_counter() - self.started
+        if self.profiler:
+            self.profiler.disable()
+        self.stack.close()
+
+    def finish(self, response):
+        request, recorder = self.request, self.recorder
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        size = None if response.streaming else len(response.content)
+        registry.observe(view, request.method, response.status_code, self.duration, recorder, size)
+
+        if recorder.similar > settings.METRICS_SIMILAR_QUERY_WARNING:
+            sql, count = recorder.worst_template()
+            logger.warning(
+                '%s %s ran %d queries (%d repeated); most repeated %dx: %s',
+                request.method, view, recorder.count, recorder.similar, count, sql
+            )
+
+        if self.profiler:
+            name = re.sub(r'[^\w.-]', '_', view)
+            path = os.path.join(settings.METRICS_PROFILE_DIR, f'{name}-{uuid.uuid4().hex[:12]}.prof')
+            self.profiler.dump_stats(path)
+            response['X-Profile-File'] = os.path.basename(path)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Let GET and HEAD requests to views with `replica_reads = True` read from a replica
+
+    Everything else reads from the primary, as do clients that wrote in the
+    last REPLICA_STICKY_SECONDS: a request that writes sets a short-lived
+    cookie so the client's next reads see its own writes.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        state = ReadRouting()
+        token = routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing.reset(token)
+        return self.pin(state, response)
+
+    async def __acall__(self, request):
+        state = ReadRouting()
+        token = routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routing.reset(token)
+        return self.pin(state, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = routing.get()
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        if (
+            state is not None and not state.wrote and request.method in ('GET', 'HEAD')
+            and getattr(view_class, 'replica_reads', False)
+            and settings.REPLICA_PIN_COOKIE not in request.COOKIES
+        ):
+            state.replica = True
+
+    @staticmethod
+    def pin(state, response):
+        if state.wrote and settings.DATABASE_REPLICAS and settings.REPLICA_STICKY_SECONDS:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax'
+            )
+        return response
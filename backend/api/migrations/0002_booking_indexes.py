@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-17 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appointment',
+            name='consultation_type',
+            field=models.CharField(choices=[('video', 'Video Call'), ('phone', 'Phone Call'), ('in_person', 'In-Person')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='doctor',
+            name='consultation_modes',
+            field=models.CharField(choices=[('all', 'All Modes'), ('online_only', 'Online Only (Video/Phone)'), ('in_person_only', 'In-Person Only'), ('video_only', 'Video Call Only'), ('phone_only', 'Phone Call Only'), ('in_person_video', 'In-Person & Video'), ('in_person_phone', 'In-Person & Phone')], default='all', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status', 'confirmed')), fields=['doctor', 'appointment_date', 'appointment_time'], name='appt_confirmed_slot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['appointment_date', 'appointment_time', 'status'], name='appt_date_time_status_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-17 17:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_booking_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appt_confirmed_slot_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='appointment',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'confirmed')), fields=('doctor', 'appointment_date', 'appointment_time'), name='appt_confirmed_slot_uniq'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 6.0.1 on 2026-10-17 17:29
+
+from itertools import groupby
+from operator import itemgetter
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_occupancy(apps, schema_editor):
+    """Build the bitmasks for the confirmed appointments already stored"""
+    Appointment = apps.get_model('api', 'Appointment')
+    SlotOccupancy = apps.get_model('api', 'SlotOccupancy')
+    step = settings.OCCUPANCY_GRANULARITY_MINUTES
+
+    rows = Appointment.objects.filter(status='confirmed').order_by(
+        'doctor_id', 'appointment_date'
+    ).values_list('doctor_id', 'appointment_date', 'appointment_time').iterator(chunk_size=5000)
+
+    batch = []
+    for (doctor_id, day), group in groupby(rows, key=itemgetter(0, 1)):
+        mask = 0
+        for _, _, booked in group:
+            mask |= 1 << (booked.hour * 60 + booked.minute) // step
+        batch.append(SlotOccupancy(doctor_id=doctor_id, date=day, booked=mask.to_bytes((mask.bit_length() + 7) // 8, 'little')))
+        if len(batch) >= 5000:
+            SlotOccupancy.objects.bulk_create(batch)
+            batch = []
+    SlotOccupancy.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_confirmed_slot_constraint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('booked', models.BinaryField(default=b'')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupancy', to='api.doctor')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('doctor', 'date'), name='occupancy_doctor_date_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_occupancy, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.0.1 on 2026-10-17 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_slot_occupancy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='consultation_flags',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(consultation_modes='all', then=models.Value(7)), models.When(consultation_modes='online_only', then=models.Value(3)), models.When(consultation_modes='in_person_only', then=models.Value(4)), models.When(consultation_modes='video_only', then=models.Value(1)), models.When(consultation_modes='phone_only', then=models.Value(2)), models.When(consultation_modes='in_person_video', then=models.Value(5)), models.When(consultation_modes='in_person_phone', then=models.Value(6)), default=models.Value(0)), output_field=models.PositiveSmallIntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(fields=['consultation_flags'], name='doctor_consult_flags_idx'),
+        ),
+    ]
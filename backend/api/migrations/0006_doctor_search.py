@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-17 17:35
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Postgres only: other databases search through api.search's in-memory index
+BACKFILL_SQL = """
+UPDATE api_doctor AS d SET search_document =
+    setweight(to_tsvector('simple', coalesce(d.name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(s.name, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(d.bio, '')), 'C')
+FROM api_specialization AS s
+WHERE s.id = d.specialization_id
+"""
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(BACKFILL_SQL)
+    schema_editor.execute('CREATE INDEX doctor_search_gin_idx ON api_doctor USING gin (search_document)')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS doctor_search_gin_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_consultation_flags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='search_document',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 6.0.1 on 2026-10-17 17:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_counts(apps, schema_editor):
+    """Count the appointments already stored"""
+    Appointment = apps.get_model('api', 'Appointment')
+    DailyBookingCount = apps.get_model('api', 'DailyBookingCount')
+
+    rows = Appointment.objects.order_by().values_list(
+        'doctor_id', 'appointment_date', 'status', 'consultation_type'
+    ).annotate(count=Count('id')).iterator(chunk_size=5000)
+
+    batch = []
+    for doctor_id, day, status, consultation_type, count in rows:
+        batch.append(DailyBookingCount(
+            doctor_id=doctor_id, date=day, status=status, consultation_type=consultation_type, count=count
+        ))
+        if len(batch) >= 5000:
+            DailyBookingCount.objects.bulk_create(batch)
+            batch = []
+    DailyBookingCount.objects.bulk_create(batch)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_doctor_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBookingCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('confirmed', 'Confirmed'), ('cancelled', 'Cancelled'), ('completed', 'Completed')], max_length=20)),
+                ('consultation_type', models.CharField(choices=[('video', 'Video Call'), ('phone', 'Phone Call'), ('in_person', 'In-Person')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_counts', to='api.doctor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='booking_count_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('doctor', 'date', 'status', 'consultation_type'), name='booking_count_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
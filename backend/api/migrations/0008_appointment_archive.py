@@ -0,0 +1,74 @@
+# Generated by Django 6.0.1 on 2026-10-17 17:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# The plain table CreateModel made, recreated partitioned by year of
+# appointment_date. Partitions are added as rows are archived
+# (api.archive.ensure_partitions). The primary key has to include the
+# partition key; ids are still unique, as they come from api_appointment.
+PARTITIONED_TABLE = """
+    DROP TABLE "api_archivedappointment";
+    CREATE TABLE "api_archivedappointment" (
+        "id" bigint NOT NULL,
+        "patient_name" varchar(200) NOT NULL,
+        "patient_email" varchar(254) NOT NULL,
+        "patient_phone" varchar(15) NOT NULL,
+        "appointment_date" date NOT NULL,
+        "appointment_time" time NOT NULL,
+        "consultation_type" varchar(20) NOT NULL,
+        "status" varchar(20) NOT NULL,
+        "notes" text NOT NULL,
+        "created_at" timestamp with time zone NOT NULL,
+        "updated_at" timestamp with time zone NOT NULL,
+        "archived_at" timestamp with time zone NOT NULL,
+        "doctor_id" bigint NOT NULL REFERENCES "api_doctor" ("id") DEFERRABLE INITIALLY DEFERRED,
+        PRIMARY KEY ("id", "appointment_date")
+    ) PARTITION BY RANGE ("appointment_date");
+    CREATE INDEX "archived_appt_date_time_idx" ON "api_archivedappointment" ("appointment_date", "appointment_time");
+    CREATE INDEX "archived_appt_doctor_date_idx" ON "api_archivedappointment" ("doctor_id", "appointment_date");
+"""
+
+
+def partition_archive(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in PARTITIONED_TABLE.split(';'):
+            if statement.strip():
+                schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_daily_booking_counts'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='appointment',
+            options={},
+        ),
+        migrations.CreateModel(
+            name='ArchivedAppointment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('patient_name', models.CharField(max_length=200)),
+                ('patient_email', models.EmailField(max_length=254)),
+                ('patient_phone', models.CharField(max_length=15)),
+                ('appointment_date', models.DateField()),
+                ('appointment_time', models.TimeField()),
+                ('consultation_type', models.CharField(choices=[('video', 'Video Call'), ('phone', 'Phone Call'), ('in_person', 'In-Person')], max_length=20)),
+                ('status', models.CharField(choices=[('confirmed', 'Confirmed'), ('cancelled', 'Cancelled'), ('completed', 'Completed')], max_length=20)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField()),
+                ('doctor', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_appointments', to='api.doctor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['appointment_date', 'appointment_time'], name='archived_appt_date_time_idx'), models.Index(fields=['doctor', 'appointment_date'], name='archived_appt_doctor_date_idx')],
+            },
+        ),
+        migrations.RunPython(partition_archive, migrations.RunPython.noop),
+    ]
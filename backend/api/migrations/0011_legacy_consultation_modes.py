@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:12
+
+from django.db import migrations
+
+# 0001 stored online/in_person/both; 0002 renamed the choices without
+# rewriting the rows, which consultation_flags maps to 0 (no types)
+LEGACY_MODES = {
+    'both': 'all',
+    'online': 'online_only',
+    'in_person': 'in_person_only',
+}
+
+
+def rewrite_legacy_modes(apps, schema_editor):
+    """Move doctors still on the 0001 modes to the current vocabulary"""
+    Doctor = apps.get_model('api', 'Doctor')
+    for legacy, mode in LEGACY_MODES.items():
+        Doctor.objects.filter(consultation_modes=legacy).update(consultation_modes=mode)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_doctor_schedules'),
+    ]
+
+    operations = [
+        migrations.RunPython(rewrite_legacy_modes, migrations.RunPython.noop),
+    ]
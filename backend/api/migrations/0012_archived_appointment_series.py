@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_legacy_consultation_modes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedappointment',
+            name='series',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_appointments', to='api.appointmentseries'),
+        ),
+    ]
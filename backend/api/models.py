@@ -1,5 +1,8 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
-from django.core.validators import MinValueValidator
+from django.db.models import Q
+from django.core.validators import MaxValueValidator, MinValueValidator
 
 class Specialization(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -23,40 +26,139 @@ class Doctor(models.Model):
         ('in_person_phone', 'In-Person & Phone')
     ]
     
+    # Consultation types as bit flags, and the flags each mode offers
+    TYPE_FLAGS = {'video': 1, 'phone': 2, 'in_person': 4}
+    MODE_FLAGS = {
+        'all': 7,
+        'online_only': 3,
+        'in_person_only': 4,
+        'video_only': 1,
+        'phone_only': 2,
+        'in_person_video': 5,
+        'in_person_phone': 6,
+    }
+    
     name = models.CharField(max_length=200)
     specialization = models.ForeignKey(Specialization, on_delete=models.CASCADE, related_name='doctors')
     years_experience = models.IntegerField(validators=[MinValueValidator(0)])
     bio = models.TextField()
     consultation_modes = models.CharField(max_length=20, choices=CONSULTATION_MODES, default='all')
+    # Computed by the database from consultation_modes, so bulk writes cannot leave it stale
+    consultation_flags = models.GeneratedField(
+        expression=models.Case(
+            *[models.When(consultation_modes=mode, then=models.Value(flags)) for mode, flags in MODE_FLAGS.items()],
+            default=models.Value(0)
+        ),
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True
+    )
     is_available = models.BooleanField(default=True)
     is_active = models.BooleanField(default=True)
+    # Length of this doctor's slots; empty uses APPOINTMENT_SLOT_MINUTES
+    slot_minutes = models.PositiveSmallIntegerField(null=True, blank=True, validators=[MinValueValidator(5)])
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Weighted name/specialization/bio tsvector on Postgres (GIN indexed, see
+    # migration 0006); unused elsewhere. Maintained by api.search.
+    search_document = SearchVectorField(null=True, editable=False)
     
     def __str__(self):
         return f"Dr. {self.name} - {self.specialization.name}"
     
     class Meta:
         ordering = ['name']
+        indexes = [
+            # "Doctors who offer phone" as one IN predicate over flags
+            models.Index(fields=['consultation_flags'], name='doctor_consult_flags_idx'),
+        ]
+    
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        
+        # Slots must cover whole occupancy cells (see api.occupancy)
+        step = settings.OCCUPANCY_GRANULARITY_MINUTES
+        if self.slot_minutes and self.slot_minutes % step:
+            raise ValidationError({'slot_minutes': f'Slot length must be a multiple of {step} minutes.'})
     
     # Helper method to check if doctor supports a specific consultation type
     def supports_consultation_type(self, consultation_type):
         """Check if doctor supports the given consultation type"""
-        if self.consultation_modes == 'all':
-            return True
-        elif self.consultation_modes == 'online_only':
-            return consultation_type in ['video', 'phone']
-        elif self.consultation_modes == 'in_person_only':
-            return consultation_type == 'in_person'
-        elif self.consultation_modes == 'video_only':
-            return consultation_type == 'video'
-        elif self.consultation_modes == 'phone_only':
-            return consultation_type == 'phone'
-        elif self.consultation_modes == 'in_person_video':
-            return consultation_type in ['in_person', 'video']
-        elif self.consultation_modes == 'in_person_phone':
-            return consultation_type in ['in_person', 'phone']
-        return False
+        return bool(self.MODE_FLAGS.get(self.consultation_modes, 0) & self.TYPE_FLAGS.get(consultation_type, 0))
+    
+    @classmethod
+    def flags_supporting(cls, consultation_type):
+        """consultation_flags values that include the type, for an indexed IN filter"""
+        bit = cls.TYPE_FLAGS[consultation_type]
+        return [flags for flags in range(sum(cls.TYPE_FLAGS.values()) + 1) if flags & bit]
+
+class WorkingHours(models.Model):
+    """The hours a doctor sees patients on one day of the week, with an optional break
+
+    A doctor with no rows works APPOINTMENT_DAY_START to APPOINTMENT_DAY_END
+    every day; once any row exists, days without one are days off.
+    api.schedule compiles the rows into slot templates.
+    """
+    WEEKDAYS = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday')
+    ]
+    
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='working_hours')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAYS)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    break_start = models.TimeField(null=True, blank=True)
+    break_end = models.TimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Doctor {self.doctor_id} on {self.get_weekday_display()} {self.start_time}-{self.end_time}"
+    
+    class Meta:
+        ordering = ['weekday']
+        verbose_name_plural = 'working hours'
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'weekday'], name='working_hours_doctor_weekday_uniq'),
+        ]
+    
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        
+        if self.start_time and self.end_time and self.end_time <= self.start_time:
+            raise ValidationError('Working hours must end after they start.')
+        if (self.break_start is None) != (self.break_end is None):
+            raise ValidationError('Give both ends of the break, or neither.')
+        if self.break_start is not None and not self.start_time <= self.break_start < self.break_end <= self.end_time:
+            raise ValidationError('The break must fall within the working hours.')
+        # Slots start at start_time and again at break_end, on whole occupancy cells
+        step = settings.OCCUPANCY_GRANULARITY_MINUTES
+        for value in (self.start_time, self.break_end):
+            if value and (value.hour * 60 + value.minute) % step:
+                raise ValidationError(f'Working hours must start, and breaks end, on {step}-minute boundaries.')
+
+class TimeOff(models.Model):
+    """Days from start_date to end_date inclusive when a doctor takes no bookings (leave, holidays)"""
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='time_off')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    reason = models.CharField(max_length=200, blank=True)
+    
+    def __str__(self):
+        return f"Doctor {self.doctor_id} off {self.start_date} to {self.end_date}"
+    
+    class Meta:
+        ordering = ['start_date']
+        verbose_name_plural = 'time off'
+    
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        
+        if self.start_date and self.end_date and self.end_date < self.start_date:
+            raise ValidationError('Time off must end on or after its first day.')
 
 class Appointment(models.Model):
     STATUS_CHOICES = [
@@ -81,15 +183,42 @@ class Appointment(models.Model):
     consultation_type = models.CharField(max_length=20, choices=CONSULTATION_TYPES)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='confirmed')
     notes = models.TextField(blank=True)
+    # The recurring series this booking is one occurrence of, if any
+    series = models.ForeignKey(
+        'AppointmentSeries', on_delete=models.SET_NULL, null=True, blank=True, related_name='appointments'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.patient_name} with Dr. {self.doctor.name} on {self.appointment_date}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored day so moving a booking can evict the old day's cache too
+        instance._loaded_day = (instance.__dict__.get('doctor_id'), instance.__dict__.get('appointment_date'))
+        return instance
+    
     class Meta:
-        ordering = ['-appointment_date', 'appointment_time']
-        unique_together = ['doctor', 'appointment_date', 'appointment_time']
+        # No default ordering: it made every unordered query sort the whole
+        # table. Lists order explicitly (see AppointmentCursorPagination).
+        constraints = [
+            # Only one confirmed booking per slot; cancelled ones free it up again.
+            # The partial unique index also serves double-booking checks and slot grids.
+            models.UniqueConstraint(
+                fields=['doctor', 'appointment_date', 'appointment_time'],
+                condition=Q(status='confirmed'),
+                name='appt_confirmed_slot_uniq'
+            ),
+        ]
+        indexes = [
+            # Cross-doctor listing ordered by date/time, optionally filtered by status
+            models.Index(
+                fields=['appointment_date', 'appointment_time', 'status'],
+                name='appt_date_time_status_idx'
+            ),
+        ]
     
     def clean(self):
         """Validate appointment before saving"""
@@ -122,5 +251,108 @@ class Appointment(models.Model):
     
     def save(self, *args, **kwargs):
         """Override save to call clean validation"""
-        self.full_clean()
-        super().save(*args, **kwargs)
\ No newline at end of file
+        # The confirmed-slot constraint is enforced by the database on write;
+        # pre-checking it here would only reopen the check-then-insert race
+        self.full_clean(validate_constraints=False)
+        super().save(*args, **kwargs)
+        # The post_save receivers have seen the old day; later saves move from this one
+        self._loaded_day = (self.doctor_id, self.appointment_date)
+
+class AppointmentSeries(models.Model):
+    """A weekly recurring booking, e.g. every Tuesday at 10:00 for 12 weeks
+
+    The occurrences are ordinary appointments pointing back here; api.series
+    books, cancels and reschedules them as a set.
+    """
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='appointment_series')
+    patient_name = models.CharField(max_length=200)
+    patient_email = models.EmailField()
+    patient_phone = models.CharField(max_length=15)
+    consultation_type = models.CharField(max_length=20, choices=Appointment.CONSULTATION_TYPES)
+    appointment_time = models.TimeField()
+    interval_weeks = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1), MaxValueValidator(4)])
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.patient_name} with doctor {self.doctor_id} every {self.interval_weeks} week(s) at {self.appointment_time}"
+
+class ArchivedAppointment(models.Model):
+    """A completed or cancelled appointment moved out of the live table by api.archive
+
+    Rows keep their original id, so ids stay unique across both tables. On
+    Postgres the table is partitioned by appointment_date, one partition per
+    year (see migration 0008).
+    """
+    id = models.BigIntegerField(primary_key=True)
+    # Indexed by the (doctor, appointment_date) index below
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='archived_appointments', db_index=False)
+    patient_name = models.CharField(max_length=200)
+    patient_email = models.EmailField()
+    patient_phone = models.CharField(max_length=15)
+    appointment_date = models.DateField()
+    appointment_time = models.TimeField()
+    consultation_type = models.CharField(max_length=20, choices=Appointment.CONSULTATION_TYPES)
+    status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES)
+    notes = models.TextField(blank=True)
+    series = models.ForeignKey(
+        AppointmentSeries, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_appointments'
+    )
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.patient_name} with doctor {self.doctor_id} on {self.appointment_date} (archived)"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['appointment_date', 'appointment_time'], name='archived_appt_date_time_idx'),
+            models.Index(fields=['doctor', 'appointment_date'], name='archived_appt_doctor_date_idx'),
+        ]
+
+class SlotOccupancy(models.Model):
+    """One doctor's confirmed bookings on one day as a bitmask
+
+    Bit n is set when a confirmed appointment starts in the n-th
+    OCCUPANCY_GRANULARITY_MINUTES cell after midnight. The bytes are the mask in
+    little-endian order; api.occupancy keeps them in step with Appointment writes.
+    """
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='occupancy')
+    date = models.DateField()
+    booked = models.BinaryField(default=b'')
+    
+    def __str__(self):
+        return f"Occupancy of doctor {self.doctor_id} on {self.date}"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'date'], name='occupancy_doctor_date_uniq'),
+        ]
+
+class DailyBookingCount(models.Model):
+    """How many of one doctor's appointments on one day have a given status and type
+
+    A summary of the appointments table for dashboards, kept current by
+    api.stats on every appointment write. Combinations with no appointments
+    have no row.
+    """
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='booking_counts')
+    date = models.DateField()
+    status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES)
+    consultation_type = models.CharField(max_length=20, choices=Appointment.CONSULTATION_TYPES)
+    count = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.count} {self.status} {self.consultation_type} for doctor {self.doctor_id} on {self.date}"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['doctor', 'date', 'status', 'consultation_type'],
+                name='booking_count_uniq'
+            ),
+        ]
+        indexes = [
+            # Dashboards over every doctor for a date range
+            models.Index(fields=['date'], name='booking_count_date_idx'),
+        ]
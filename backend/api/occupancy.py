@@ -0,0 +1,207 @@
+from datetime import datetime, timedelta
+from functools import reduce
+from heapq import merge
+from itertools import groupby, islice
+from operator import itemgetter, or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Appointment, SlotOccupancy
+
+
+# Days refreshed per statement, keeping the OR-ed filters well under SQLite's
+# expression depth limit
+REFRESH_CHUNK_DAYS = 100
+
+
+def cell_of(value):
+    """Index of the occupancy cell a time of day falls in"""
+    return (value.hour * 60 + value.minute) // settings.OCCUPANCY_GRANULARITY_MINUTES
+
+
+def check_alignment(day_start, slot_minutes):
+    """Slots must cover whole cells for a bitmask test to be exact"""
+    step = settings.OCCUPANCY_GRANULARITY_MINUTES
+    if slot_minutes % step or (day_start.hour * 60 + day_start.minute) % step:
+        raise ValueError(f'Slots must start and end on {step}-minute boundaries.')
+
+
+def slot_mask(slot, slot_minutes):
+    """Cells covered by the slot starting at `slot`"""
+    return ((1 << (slot_minutes // settings.OCCUPANCY_GRANULARITY_MINUTES)) - 1) << cell_of(slot)
+
+
+def mask_from_times(times):
+    mask = 0
+    for value in times:
+        mask |= 1 << cell_of(value)
+    return mask
+
+
+def encode_mask(mask):
+    return mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+
+
+def decode_mask(value):
+    # Postgres hands BinaryField values back as memoryview
+    return int.from_bytes(bytes(value or b''), 'little')
+
+
+def next_available_days(booked, doctor_id, start_date, count, within, schedule):
+    """Up to `count` (date, free slots) pairs from `within` days starting at start_date
+
+    `booked` maps (doctor_id, date) to bitmasks as returned by get_masks;
+    `schedule` is the doctor's api.schedule.Schedule.
+    """
+    days = []
+    for offset in range(within):
+        day = start_date + timedelta(days=offset)
+        free = schedule.template(day).free(booked.get((doctor_id, day), 0))
+        if free:
+            days.append((day, free))
+            if len(days) == count:
+                break
+    return days
+
+
+def iter_free_slots(booked, doctor_id, start_date, end_date, schedule, not_before=None, before=None):
+    """Yield (date, slot, doctor_id) for each free slot of one doctor in date and time order
+
+    Slots come from the doctor's schedule day by day. Slots starting before
+    the `not_before` datetime or at/after `before` are skipped.
+    """
+    day = start_date
+    while day <= end_date:
+        for slot in schedule.template(day).free(booked.get((doctor_id, day), 0)):
+            starts = datetime.combine(day, slot)
+            if not_before and starts < not_before:
+                continue
+            if before and starts >= before:
+                return
+            yield day, slot, doctor_id
+        day += timedelta(days=1)
+
+
+def earliest_free_slots(booked, schedules, start_date, end_date, limit, not_before=None, before=None):
+    """The `limit` earliest free (date, slot, doctor_id) across the doctors in `schedules`
+
+    A heap merge over lazy per-doctor iterators, so only about `limit` slots
+    per doctor are ever examined however wide the window is.
+    """
+    iterators = [
+        iter_free_slots(booked, doctor_id, start_date, end_date, schedule, not_before, before)
+        for doctor_id, schedule in schedules.items()
+    ]
+    return list(islice(merge(*iterators), limit))
+
+
+def occupancy_query(doctor_ids, start_date, end_date):
+    return SlotOccupancy.objects.filter(
+        doctor_id__in=doctor_ids,
+        date__range=(start_date, end_date)
+    ).values_list('doctor_id', 'date', 'booked')
+
+
+def get_masks(doctor_ids, start_date, end_date):
+    """Booked bitmasks keyed by (doctor_id, date) in one query; free days are absent or 0"""
+    return {
+        (doctor_id, day): decode_mask(booked)
+        for doctor_id, day, booked in occupancy_query(doctor_ids, start_date, end_date)
+    }
+
+
+async def aget_masks(doctor_ids, start_date, end_date):
+    """Async version of get_masks"""
+    return {
+        (doctor_id, day): decode_mask(booked)
+        async for doctor_id, day, booked in occupancy_query(doctor_ids, start_date, end_date)
+    }
+
+
+def day_mask_query(doctor_id, target_date):
+    return SlotOccupancy.objects.filter(doctor_id=doctor_id, date=target_date).values_list('booked', flat=True)
+
+
+def get_mask(doctor_id, target_date):
+    return decode_mask(day_mask_query(doctor_id, target_date).first())
+
+
+async def aget_mask(doctor_id, target_date):
+    """Async version of get_mask"""
+    return decode_mask(await day_mask_query(doctor_id, target_date).afirst())
+
+
+def match_days(days, date_field):
+    return reduce(or_, (Q(doctor_id=doctor_id, **{date_field: day}) for doctor_id, day in days))
+
+
+def refresh_occupancy(days):
+    """Recompute the bitmasks of the given (doctor_id, date) days from their confirmed appointments
+
+    Meant to run in the transaction that changed the appointments. The rows are
+    created and locked before the appointments are read, so concurrent writers
+    to the same day queue up and each one sees the others' committed bookings.
+    """
+    days = sorted(set(days))
+    with transaction.atomic(savepoint=False):
+        for start in range(0, len(days), REFRESH_CHUNK_DAYS):
+            chunk = days[start:start + REFRESH_CHUNK_DAYS]
+            SlotOccupancy.objects.bulk_create(
+                [SlotOccupancy(doctor_id=doctor_id, date=day) for doctor_id, day in chunk],
+                ignore_conflicts=True
+            )
+            rows = list(
+                SlotOccupancy.objects.select_for_update()
+                .filter(match_days(chunk, 'date'))
+                .order_by('doctor_id', 'date')
+            )
+
+            masks = {}
+            bookings = Appointment.objects.filter(
+                match_days(chunk, 'appointment_date'), status='confirmed'
+            ).order_by().values_list('doctor_id', 'appointment_date', 'appointment_time')
+            for doctor_id, day, booked in bookings:
+                masks[(doctor_id, day)] = masks.get((doctor_id, day), 0) | 1 << cell_of(booked)
+
+            changed = []
+            for row in rows:
+                booked = encode_mask(masks.get((row.doctor_id, row.date), 0))
+                if bytes(row.booked) != booked:
+                    row.booked = booked
+                    changed.append(row)
+            if changed:
+                SlotOccupancy.objects.bulk_update(changed, ['booked'])
+
+
+def rebuild_occupancy(batch_size=None, progress=None):
+    """Rebuild every bitmask from the appointments table, writing a batch of days at a time
+
+    Repairs the table after writes that bypass the ORM or a change of
+    OCCUPANCY_GRANULARITY_MINUTES. Returns the number of days written.
+    """
+    batch_size = batch_size or settings.BULK_IMPORT_BATCH_SIZE
+    rows = Appointment.objects.filter(status='confirmed').order_by(
+        'doctor_id', 'appointment_date'
+    ).values_list('doctor_id', 'appointment_date', 'appointment_time').iterator(chunk_size=batch_size)
+
+    written = 0
+    with transaction.atomic():
+        SlotOccupancy.objects.all().delete()
+        batch = []
+        for (doctor_id, day), group in groupby(rows, key=itemgetter(0, 1)):
+            mask = mask_from_times(booked for _, _, booked in group)
+            batch.append(SlotOccupancy(doctor_id=doctor_id, date=day, booked=encode_mask(mask)))
+            if len(batch) >= batch_size:
+                SlotOccupancy.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+                if progress:
+                    progress(written)
+        if batch:
+            SlotOccupancy.objects.bulk_create(batch)
+            written += len(batch)
+            if progress:
+                progress(written)
+    return written
@@ -0,0 +1,214 @@
+import heapq
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, time
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.http import StreamingHttpResponse
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .renderers import render_json
+
+
+class AppointmentCursorPagination(BasePagination):
+    """Keyset pagination over (appointment_date, appointment_time, id)
+
+    Each page is fetched with a range predicate on the last row seen instead of
+    an OFFSET, so deep pages cost the same as the first one.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = ('appointment_date', 'appointment_time', 'id')
+
+    def __init__(self):
+        self.page_size = settings.APPOINTMENT_PAGE_SIZE
+        self.max_page_size = settings.APPOINTMENT_MAX_PAGE_SIZE
+
+    @staticmethod
+    def query_params(request):
+        # Works with both DRF requests and the plain Django requests of the async views
+        return getattr(request, 'query_params', request.GET)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(self.query_params(request).get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, appointment):
+        position = [appointment.appointment_date.isoformat(), appointment.appointment_time.isoformat(), appointment.id]
+        return urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = self.query_params(request).get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            date_str, time_str, appointment_id = json.loads(urlsafe_b64decode(encoded.encode()))
+            return date.fromisoformat(date_str), time.fromisoformat(time_str), int(appointment_id)
+        except (TypeError, ValueError):
+            raise NotFound('Invalid cursor')
+
+    def page_queryset(self, queryset, request):
+        """Order and seek past the cursor, sliced to one row more than a page"""
+        self.request = request
+        self.page_size_for_request = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        position = self.decode_cursor(request)
+        if position:
+            last_date, last_time, last_id = position
+            queryset = queryset.filter(
+                Q(appointment_date__gt=last_date) |
+                Q(appointment_date=last_date, appointment_time__gt=last_time) |
+                Q(appointment_date=last_date, appointment_time=last_time, id__gt=last_id)
+            )
+
+        # Fetch one extra row to learn whether there is a next page
+        return queryset[:self.page_size_for_request + 1]
+
+    def set_page(self, results):
+        self.has_next = len(results) > self.page_size_for_request
+        self.page = results[:self.page_size_for_request]
+        return self.page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    def paginate_querysets(self, querysets, request):
+        """One page across several tables of appointments, e.g. live and archived
+
+        Each table is read with the same seek and limit, one query apiece, and
+        the rows merged in cursor order.
+        """
+        pages = [self.page_queryset(queryset, request) for queryset in querysets]
+        merged = heapq.merge(*pages, key=attrgetter(*self.ordering))
+        return self.set_page(list(islice(merged, self.page_size_for_request + 1)))
+
+    async def apaginate_queryset(self, queryset, request):
+        """Async version of paginate_queryset"""
+        return self.set_page([obj async for obj in self.page_queryset(queryset, request)])
+
+    async def apaginate_querysets(self, querysets, request):
+        """Async version of paginate_querysets"""
+        pages = []
+        for queryset in querysets:
+            pages.append([obj async for obj in self.page_queryset(queryset, request)])
+        merged = heapq.merge(*pages, key=attrgetter(*self.ordering))
+        return self.set_page(list(islice(merged, self.page_size_for_request + 1)))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data
+        })
+
+
+def stream_json_list(queryset, serialize, chunk_size=None):
+    """Stream a queryset as a JSON array, serializing it chunk by chunk
+
+    `serialize` turns a list of rows into a list of representations. Rows are
+    pulled with iterator() so memory stays flat however large the export is.
+    Any other iterable of rows is streamed as it comes.
+    """
+    chunk_size = chunk_size or settings.APPOINTMENT_STREAM_CHUNK_SIZE
+    if isinstance(queryset, QuerySet):
+        # Pinned now: generate() runs after the request's database routing ends
+        queryset = queryset.using(queryset.db)
+
+    def generate():
+        yield b'['
+        first = True
+        chunk = []
+        rows = queryset.iterator(chunk_size=chunk_size) if isinstance(queryset, QuerySet) else queryset
+        for obj in rows:
+            chunk.append(obj)
+            if len(chunk) >= chunk_size:
+                yield render_items(serialize(chunk), first)
+                first = False
+                chunk = []
+        if chunk:
+            yield render_items(serialize(chunk), first)
+        yield b']'
+
+    return StreamingHttpResponse(generate(), content_type='application/json')
+
+
+def astream_json_list(queryset, serialize, chunk_size=None):
+    """Async version of stream_json_list; other rows come as an async iterable
+
+    Served from an async generator, so ASGI streams it instead of reading the
+    whole export into memory first.
+    """
+    chunk_size = chunk_size or settings.APPOINTMENT_STREAM_CHUNK_SIZE
+    if isinstance(queryset, QuerySet):
+        queryset = queryset.using(queryset.db)
+
+    async def generate():
+        yield b'['
+        first = True
+        chunk = []
+        rows = queryset.aiterator(chunk_size=chunk_size) if isinstance(queryset, QuerySet) else queryset
+        async for obj in rows:
+            chunk.append(obj)
+            if len(chunk) >= chunk_size:
+                yield render_items(serialize(chunk), first)
+                first = False
+                chunk = []
+        if chunk:
+            yield render_items(serialize(chunk), first)
+        yield b']'
+
+    return StreamingHttpResponse(generate(), content_type='application/json')
+
+
+def render_items(items, first):
+    """A chunk of a streamed JSON array: the items without brackets, comma-led after the first chunk"""
+    body = render_json(items)[1:-1]
+    return body if first else b',' + body
+
+
+def estimated_count(queryset):
+    """The Postgres planner's row estimate for a queryset, or None on other databases"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Admin paginator that trusts the planner's estimate for large result sets
+
+    COUNT(*) over millions of rows costs a full scan on every changelist page.
+    Past ADMIN_EXACT_COUNT_LIMIT estimated rows the estimate is shown instead;
+    smaller results, and databases without estimates, are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is not None and estimate > settings.ADMIN_EXACT_COUNT_LIMIT:
+            return estimate
+        return super().count
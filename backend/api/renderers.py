@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+# Characters JSONRenderer escapes so responses stay valid JavaScript
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer on orjson, producing the same bytes as the stock renderer
+
+    Datetimes, decimals, lazy strings and other types orjson does not write
+    the way DRF does go through DRF's encoder. Floats are written in their
+    shortest form, which spells exponents differently (1e-05 becomes 1e-5),
+    and NaN/Infinity become null instead of raising. Indented output (the
+    browsable API), non-compact or ASCII-only settings and a missing orjson
+    fall back to the stock renderer.
+    """
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS if orjson else 0
+    default = encoders.JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or not api_settings.COMPACT_JSON or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        content = orjson.dumps(data, default=self.default, option=self.options)
+        for raw, escaped in LINE_SEPARATORS:
+            if raw in content:
+                content = content.replace(raw, escaped)
+        return content
+
+
+def render_json(data):
+    """Render data with the configured API renderer, for responses built outside DRF"""
+    return import_string(settings.API_JSON_RENDERER)().render(data)
@@ -0,0 +1,73 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class ReadRouting:
+    """Routing state of one request: whether its reads may use a replica, and whether it wrote"""
+
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self, replica=False):
+        self.replica = replica
+        self.wrote = False
+
+
+# Set by ReplicaRoutingMiddleware for the duration of each request. The state
+# is mutated rather than replaced so changes made on a sync_to_async thread
+# are seen by the rest of the request.
+routing = ContextVar('routing', default=None)
+
+
+def choose_replica():
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+class ReplicaRouter:
+    """Send the reads of replica-enabled requests to a read replica, everything else to default
+
+    Reads stay on the primary outside a request, inside a transaction on it,
+    and for the rest of a request once it has written.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = routing.get()
+        if (
+            state is not None and state.replica and settings.DATABASE_REPLICAS
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return choose_replica()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = routing.get()
+        if state is not None:
+            state.replica = False
+            state.wrote = True
+        # Explicit, or an instance read from a replica would be saved back to it
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+
+@contextmanager
+def primary():
+    """Read from the primary inside the block
+
+    For data cached beyond the request, which a lagging replica would
+    otherwise leave stale until it expires.
+    """
+    state = routing.get()
+    if state is None or not state.replica:
+        yield
+        return
+    state.replica = False
+    try:
+        yield
+    finally:
+        state.replica = not state.wrote
@@ -0,0 +1,227 @@
+from datetime import datetime, date, timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Doctor, TimeOff
+from .occupancy import check_alignment, slot_mask
+from .slotcache import TTLCache
+
+
+def parse_clock(value):
+    """Parse an 'HH:MM' string (or pass through a time object)"""
+    if isinstance(value, str):
+        return datetime.strptime(value, '%H:%M').time()
+    return value
+
+
+def get_slot_config(day_start=None, day_end=None, slot_minutes=None):
+    """Resolve working hours and slot length, falling back to settings"""
+    day_start = parse_clock(day_start or settings.APPOINTMENT_DAY_START)
+    day_end = parse_clock(day_end or settings.APPOINTMENT_DAY_END)
+    slot_minutes = int(slot_minutes or settings.APPOINTMENT_SLOT_MINUTES)
+
+    if slot_minutes <= 0:
+        raise ValueError('Slot length must be a positive number of minutes.')
+    if day_end <= day_start:
+        raise ValueError('Working day must end after it starts.')
+    check_alignment(day_start, slot_minutes)
+
+    return day_start, day_end, slot_minutes
+
+
+def generate_slots(day_start=None, day_end=None, slot_minutes=None):
+    """Return the start time of every slot in the working day"""
+    day_start, day_end, slot_minutes = get_slot_config(day_start, day_end, slot_minutes)
+
+    # Anchor to an arbitrary date so we can do time arithmetic
+    current = datetime.combine(date.min, day_start)
+    end = datetime.combine(date.min, day_end)
+    step = timedelta(minutes=slot_minutes)
+
+    slots = []
+    while current + step <= end:
+        slots.append(current.time())
+        current += step
+    return slots
+
+
+class SlotTemplate:
+    """The bookable slots of one kind of working day, each with its occupancy cells
+
+    Availability on a date is the template minus that day's booked bitmask;
+    nothing about working hours is worked out per request.
+    """
+
+    def __init__(self, slots, slot_minutes):
+        self.slot_minutes = slot_minutes
+        self.slots = tuple(slots)
+        self.masks = {slot: slot_mask(slot, slot_minutes) for slot in self.slots}
+
+    def __bool__(self):
+        return bool(self.slots)
+
+    def offers(self, slot):
+        return slot in self.masks
+
+    def mask(self, slot):
+        return self.masks[slot]
+
+    def is_free(self, slot, booked):
+        """Whether `slot` is one of the template's slots and has no booking in it"""
+        mask = self.masks.get(slot)
+        return mask is not None and not booked & mask
+
+    def mark(self, booked):
+        """Pair each slot with its availability given the day's booked bitmask"""
+        return [(slot, not booked & mask) for slot, mask in self.masks.items()]
+
+    def free(self, booked):
+        return [slot for slot, mask in self.masks.items() if not booked & mask]
+
+    def first_free(self, booked):
+        for slot, mask in self.masks.items():
+            if not booked & mask:
+                return slot
+        return None
+
+
+DAY_OFF = SlotTemplate((), 0)
+
+
+@lru_cache(maxsize=16)
+def working_week(day_start, day_end, slot_minutes):
+    """The same working day seven times: the week of a doctor with no WorkingHours"""
+    day_start, day_end, slot_minutes = get_slot_config(day_start, day_end, slot_minutes)
+    return (SlotTemplate(generate_slots(day_start, day_end, slot_minutes), slot_minutes),) * 7
+
+
+def default_week():
+    # Keyed on the raw settings so nothing is parsed per lookup
+    return working_week(settings.APPOINTMENT_DAY_START, settings.APPOINTMENT_DAY_END, settings.APPOINTMENT_SLOT_MINUTES)
+
+
+def compile_day(hours, slot_minutes):
+    """Template for one WorkingHours row, given as (start, end, break_start, break_end)"""
+    start, end, break_start, break_end = hours
+    periods = [(start, break_start), (break_end, end)] if break_start else [(start, end)]
+    return SlotTemplate(
+        [slot for period_start, period_end in periods if period_start < period_end
+         for slot in generate_slots(period_start, period_end, slot_minutes)],
+        slot_minutes
+    )
+
+
+class Schedule:
+    """One doctor's compiled week: a SlotTemplate per weekday, and days off
+
+    `week` is None for doctors on the default working day from settings,
+    which is resolved on use so settings changes apply at once. A compiled
+    week carries its own slot length, since any weekday may be a day off.
+    """
+
+    def __init__(self, week=None, time_off=(), slot_minutes=None):
+        self.week = week
+        self.time_off = tuple(sorted(time_off))
+        self.week_slot_minutes = slot_minutes
+
+    @property
+    def templates(self):
+        return self.week or default_week()
+
+    @property
+    def slot_minutes(self):
+        return self.week_slot_minutes or default_week()[0].slot_minutes
+
+    @property
+    def grid(self):
+        """Every slot start of the week, in time order"""
+        return sorted(set().union(*(template.slots for template in self.templates)))
+
+    def is_off(self, day):
+        return any(start <= day <= end for start, end in self.time_off)
+
+    def template(self, day):
+        """The slots the doctor works on `day`; empty on days off"""
+        if self.time_off and self.is_off(day):
+            return DAY_OFF
+        return self.templates[day.weekday()]
+
+
+def compile_schedule(slot_minutes, hours, time_off):
+    """Build a Schedule from a doctor's slot length, WorkingHours rows by weekday and TimeOff ranges"""
+    if not hours and not slot_minutes:
+        return Schedule(time_off=time_off)
+
+    day_start, day_end, slot_minutes = get_slot_config(slot_minutes=slot_minutes)
+    if not hours:
+        hours = {weekday: (day_start, day_end, None, None) for weekday in range(7)}
+    return Schedule(
+        tuple(compile_day(hours[weekday], slot_minutes) if weekday in hours else DAY_OFF for weekday in range(7)),
+        time_off, slot_minutes
+    )
+
+
+# Compiled schedules by doctor id, evicted by the Doctor, WorkingHours and TimeOff signals
+schedule_cache = TTLCache(settings.SLOT_CACHE_MAX_ENTRIES, settings.SCHEDULE_CACHE_TTL)
+
+
+def schedule_queries(doctor_ids):
+    """Doctors left-joined to their working hours, and their current time off"""
+    hours = Doctor.objects.filter(id__in=doctor_ids).values_list(
+        'id', 'slot_minutes', 'working_hours__weekday', 'working_hours__start_time',
+        'working_hours__end_time', 'working_hours__break_start', 'working_hours__break_end'
+    )
+    time_off = TimeOff.objects.filter(
+        doctor_id__in=doctor_ids, end_date__gte=timezone.now().date()
+    ).values_list('doctor_id', 'start_date', 'end_date')
+    return hours, time_off
+
+
+def compile_schedules(doctor_ids, hours_rows, time_off_rows):
+    slot_minutes, hours, time_off = {}, {doctor_id: {} for doctor_id in doctor_ids}, {}
+    for doctor_id, minutes, weekday, *row in hours_rows:
+        slot_minutes[doctor_id] = minutes
+        if weekday is not None:
+            hours[doctor_id][weekday] = tuple(row)
+    for doctor_id, start_date, end_date in time_off_rows:
+        time_off.setdefault(doctor_id, []).append((start_date, end_date))
+    return {
+        doctor_id: compile_schedule(slot_minutes.get(doctor_id), hours[doctor_id], time_off.get(doctor_id, ()))
+        for doctor_id in doctor_ids
+    }
+
+
+def load_schedules(doctor_ids):
+    hours, time_off = schedule_queries(doctor_ids)
+    return compile_schedules(doctor_ids, list(hours), list(time_off))
+
+
+async def aload_schedules(doctor_ids):
+    """Async version of load_schedules"""
+    hours, time_off = schedule_queries(doctor_ids)
+    return compile_schedules(doctor_ids, [row async for row in hours], [row async for row in time_off])
+
+
+def get_schedules(doctor_ids):
+    """Compiled schedules keyed by doctor id: cached ones, and the rest in two queries"""
+    return schedule_cache.get_many_or_load(doctor_ids, load_schedules)
+
+
+async def aget_schedules(doctor_ids):
+    """Async version of get_schedules"""
+    return await schedule_cache.aget_many_or_load(doctor_ids, aload_schedules)
+
+
+def get_schedule(doctor_id):
+    return get_schedules([doctor_id])[doctor_id]
+
+
+async def aget_schedule(doctor_id):
+    """Async version of get_schedule"""
+    return (await aget_schedules([doctor_id]))[doctor_id]
+
+
+def evict_schedule(doctor_id):
+    schedule_cache.evict(doctor_id)
@@ -0,0 +1,314 @@
+import heapq
+import math
+import random
+import re
+import threading
+from bisect import bisect_left
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Subquery
+
+from .catalog import get_cache
+from .models import Specialization, Doctor
+from .routers import primary
+
+
+# Indexed fields with their Postgres weight class and in-memory weight. The
+# 'simple' text search config skips stemming so both backends match prefixes alike.
+FIELD_WEIGHTS = (('name', 'A', 3.0), ('specialization', 'B', 2.0), ('bio', 'C', 1.0))
+SEARCH_CONFIG = 'simple'
+
+# Shorter query terms only match whole words, so one letter does not expand to half the vocabulary
+MIN_PREFIX = 2
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def uses_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def search_document_expression():
+    """Doctor.search_document's value, written without joins so update() accepts it"""
+    specialization = Subquery(Specialization.objects.filter(pk=OuterRef('specialization_id')).values('name')[:1])
+    name_weight, specialization_weight, bio_weight = (weight for _, weight, _ in FIELD_WEIGHTS)
+    return (
+        SearchVector('name', weight=name_weight, config=SEARCH_CONFIG)
+        + SearchVector(specialization, weight=specialization_weight, config=SEARCH_CONFIG)
+        + SearchVector('bio', weight=bio_weight, config=SEARCH_CONFIG)
+    )
+
+
+VERSION_KEY = 'search:version'
+
+
+def get_search_version():
+    """The in-memory indexes' shared version number, replaced after every doctor write
+
+    An index built or refreshed under an older number is rebuilt before it
+    answers another search, so no worker keeps serving results from before
+    another worker's write.
+    """
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # A random start, so a number lost from the cache does not come back
+        # as one a stale index still holds; add() so workers agree on it
+        cache.add(VERSION_KEY, random.randrange(1 << 62), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_search_version():
+    """Advance the shared version and return the new number"""
+    get_search_version()
+    try:
+        return get_cache().incr(VERSION_KEY)
+    except ValueError:
+        # Evicted in between; the fresh number matches no index
+        return get_search_version()
+
+
+class DoctorSearchIndex:
+    """In-process inverted index over doctors' name, specialization and bio
+
+    Stands in for Postgres full-text search on other databases. Built on the
+    first search; the worker that writes a doctor refreshes its rows, and
+    every other worker rebuilds once it sees the shared version move on.
+    Scores are field weight x idf, summed over query terms; every term must
+    match, and terms of MIN_PREFIX letters or more also match as prefixes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = None  # term -> {doctor_id: weight}
+        self._documents = {}  # doctor_id -> its terms, for removal
+        self._inactive = set()
+        self._terms = []  # sorted vocabulary for prefix lookups
+        self._terms_dirty = False
+        self._version = None  # get_search_version() the index is current for
+
+    @property
+    def built(self):
+        return self._postings is not None
+
+    def __len__(self):
+        return len(self._documents)
+
+    @staticmethod
+    def rows(queryset):
+        return queryset.values_list('id', 'is_active', 'name', 'specialization__name', 'bio').iterator(chunk_size=2000)
+
+    @staticmethod
+    def term_weights(fields):
+        weights = {}
+        for text, (_, _, weight) in zip(fields, FIELD_WEIGHTS):
+            for term in tokenize(text):
+                weights[term] = weights.get(term, 0) + weight
+        return weights
+
+    def build(self, version=None):
+        # Read before the rows, so a write committed meanwhile forces another build
+        if version is None:
+            version = get_search_version()
+        postings, documents, inactive = {}, {}, set()
+        # The index outlives the request, so it must not start from a lagging replica
+        with primary():
+            for doctor_id, is_active, *fields in self.rows(Doctor.objects.all()):
+                weights = self.term_weights(fields)
+                for term, weight in weights.items():
+                    postings.setdefault(term, {})[doctor_id] = weight
+                documents[doctor_id] = tuple(weights)
+                if not is_active:
+                    inactive.add(doctor_id)
+
+        with self._lock:
+            self._postings, self._documents, self._inactive = postings, documents, inactive
+            self._terms = sorted(postings)
+            self._terms_dirty = False
+            self._version = version
+
+    def reset(self):
+        """Drop the index; the next search rebuilds it"""
+        with self._lock:
+            self._postings = None
+            self._documents, self._inactive, self._terms = {}, set(), []
+            self._version = None
+
+    def refresh(self, doctor_ids):
+        """Re-read the given doctors after this worker wrote them, and advance the shared version
+
+        Only when no other worker wrote since the index was current (the
+        version moved by exactly this bump) are the rows patched in place;
+        otherwise the next search rebuilds.
+        """
+        version = bump_search_version()
+        if not self.built or version != self._version + 1:
+            return
+        rows = {row[0]: row for row in self.rows(Doctor.objects.filter(id__in=doctor_ids))}
+        with self._lock:
+            for doctor_id in doctor_ids:
+                self._remove(doctor_id)
+                if doctor_id in rows:
+                    _, is_active, *fields = rows[doctor_id]
+                    self._add(doctor_id, is_active, fields)
+            self._version = version
+
+    def _remove(self, doctor_id):
+        for term in self._documents.pop(doctor_id, ()):
+            posting = self._postings[term]
+            posting.pop(doctor_id, None)
+            if not posting:
+                del self._postings[term]
+                self._terms_dirty = True
+        self._inactive.discard(doctor_id)
+
+    def _add(self, doctor_id, is_active, fields):
+        weights = self.term_weights(fields)
+        for term, weight in weights.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = {}
+                self._terms_dirty = True
+            posting[doctor_id] = weight
+        self._documents[doctor_id] = tuple(weights)
+        if not is_active:
+            self._inactive.add(doctor_id)
+
+    def _expand(self, token):
+        if len(token) < MIN_PREFIX:
+            if token in self._postings:
+                yield token
+            return
+        index = bisect_left(self._terms, token)
+        while index < len(self._terms) and self._terms[index].startswith(token):
+            yield self._terms[index]
+            index += 1
+
+    def scores(self, text, active_only=True):
+        """Every matching doctor's score, as {doctor_id: score}"""
+        version = get_search_version()
+        if not self.built or version != self._version:
+            self.build(version)
+        tokens = tokenize(text)
+        if not tokens:
+            return {}
+
+        with self._lock:
+            if self._terms_dirty:
+                self._terms = sorted(self._postings)
+                self._terms_dirty = False
+            total = len(self._documents)
+
+            scores = None
+            for token in tokens:
+                matches = {}
+                for term in self._expand(token):
+                    posting = self._postings[term]
+                    # Whole-word hits outrank prefix hits
+                    factor = math.log(1 + total / len(posting)) * (1.0 if term == token else 0.5)
+                    for doctor_id, weight in posting.items():
+                        if scores is not None and doctor_id not in scores:
+                            continue
+                        score = weight * factor
+                        if score > matches.get(doctor_id, 0):
+                            matches[doctor_id] = score
+                if scores is not None:
+                    matches = {doctor_id: scores[doctor_id] + score for doctor_id, score in matches.items()}
+                scores = matches
+                if not scores:
+                    return {}
+
+            if active_only:
+                scores = {doctor_id: score for doctor_id, score in scores.items() if doctor_id not in self._inactive}
+            return scores
+
+
+search_index = DoctorSearchIndex()
+
+
+def search_query(text):
+    """The tsquery for a free-text query (every word, longer ones also as prefixes), or None"""
+    tokens = tokenize(text)
+    if not tokens:
+        return None
+    raw = ' & '.join(f'{token}:*' if len(token) >= MIN_PREFIX else token for token in tokens)
+    return SearchQuery(raw, search_type='raw', config=SEARCH_CONFIG)
+
+
+def postgres_search(text, limit, doctors):
+    query = search_query(text)
+    if query is None:
+        return []
+
+    return list(
+        doctors.filter(search_document=query)
+        .annotate(rank=SearchRank(F('search_document'), query))
+        .order_by('-rank', 'id')
+        .values_list('id', 'rank')[:limit]
+    )
+
+
+def index_search(text, limit, queryset, active_only):
+    scores = search_index.scores(text, active_only)
+    if queryset is not None and scores:
+        kept = set(queryset.filter(id__in=list(scores)).values_list('id', flat=True))
+        scores = {doctor_id: score for doctor_id, score in scores.items() if doctor_id in kept}
+    return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+
+
+def search_doctors(text, limit, queryset=None, active_only=True):
+    """Rank doctors for a free-text query: [(doctor_id, score)], best first
+
+    Only doctors in `queryset` are ranked, so its filters apply before the
+    `limit` cutoff rather than thinning out the top results.
+    """
+    if uses_postgres():
+        doctors = Doctor.objects.all() if queryset is None else queryset
+        if active_only:
+            doctors = doctors.filter(is_active=True)
+        return postgres_search(text, limit, doctors)
+    return index_search(text, limit, queryset, active_only)
+
+
+def filter_doctors(queryset, text):
+    """Narrow a Doctor queryset to every match of a free-text query, with no rank cutoff"""
+    if uses_postgres():
+        query = search_query(text)
+        return queryset.filter(search_document=query) if query is not None else queryset.none()
+    return queryset.filter(id__in=list(search_index.scores(text, active_only=False)))
+
+
+def index_doctors(doctor_ids):
+    """Bring the given doctors' search entries up to date after a write
+
+    The Postgres column is updated inside the write's transaction; the
+    in-memory index re-reads the rows once that transaction commits.
+    """
+    if uses_postgres():
+        Doctor.objects.filter(id__in=doctor_ids).update(search_document=search_document_expression())
+    else:
+        transaction.on_commit(lambda: search_index.refresh(doctor_ids))
+
+
+def index_specialization(specialization_id):
+    """Re-index the doctors of a renamed specialization"""
+    if uses_postgres():
+        Doctor.objects.filter(specialization_id=specialization_id).update(search_document=search_document_expression())
+    else:
+        transaction.on_commit(lambda: search_index.refresh(
+            list(Doctor.objects.filter(specialization_id=specialization_id).values_list('id', flat=True))
+        ))
+
+
+def rebuild_search_index():
+    """Re-index every doctor, e.g. after bulk_create, which sends no signals"""
+    if uses_postgres():
+        return Doctor.objects.update(search_document=search_document_expression())
+    search_index.build(bump_search_version())
+    return len(search_index)
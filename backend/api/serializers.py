@@ -1,6 +1,49 @@
-from rest_framework import serializers
-from .models import Specialization, Doctor, Appointment
+from functools import partial
+from operator import methodcaller
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from django.conf import settings
+from .models import Specialization, Doctor, Appointment, AppointmentSeries
+from .schedule import get_schedule
+from .series import WEEKDAYS
+from django.db import DatabaseError
 from django.utils import timezone
+from django.utils.functional import cached_property
+
+# Fields whose representation of a database value is the value itself
+PASSTHROUGH_FIELDS = (
+    serializers.CharField, serializers.IntegerField, serializers.BooleanField,
+    serializers.ChoiceField, serializers.PrimaryKeyRelatedField
+)
+
+
+def iso_datetime(zone, value):
+    """DateTimeField.to_representation for ISO output in a timezone resolved beforehand"""
+    value = timezone.make_aware(value, zone) if timezone.is_naive(value) else value.astimezone(zone)
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def value_converter(field):
+    """How a field represents a database value: None when it is the value itself
+
+    ISO dates, times and datetimes skip the per-value settings and timezone
+    lookups of their to_representation; anything else calls it.
+    """
+    if isinstance(field, PASSTHROUGH_FIELDS):
+        return None
+    if isinstance(field, serializers.DateTimeField):
+        zone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if getattr(field, 'format', api_settings.DATETIME_FORMAT) == ISO_8601 and zone is not None:
+            return partial(iso_datetime, zone)
+    elif isinstance(field, serializers.DateField):
+        if getattr(field, 'format', api_settings.DATE_FORMAT) == ISO_8601:
+            return methodcaller('isoformat')
+    elif isinstance(field, serializers.TimeField):
+        if getattr(field, 'format', api_settings.TIME_FORMAT) == ISO_8601:
+            return methodcaller('isoformat')
+    return field.to_representation
 
 class SpecializationSerializer(serializers.ModelSerializer):
     class Meta:
@@ -18,9 +61,41 @@ class DoctorSerializer(serializers.ModelSerializer):
             'is_available', 'created_at'
         ]
 
+def validate_doctor_booking(doctor, consultation_type):
+    """Refuse bookings with an unavailable doctor or a consultation type they do not offer"""
+    # Check if doctor is available
+    if doctor and not doctor.is_available:
+        raise serializers.ValidationError({
+            'doctor': 'Doctor is not available for appointments.'
+        })
+    
+    # Check if doctor supports the consultation type
+    if doctor and consultation_type:
+        if not doctor.supports_consultation_type(consultation_type):
+            # Get human-readable doctor modes
+            mode_display = dict(Doctor.CONSULTATION_MODES).get(doctor.consultation_modes, doctor.consultation_modes)
+            raise serializers.ValidationError({
+                'consultation_type': f'Doctor only offers {mode_display} consultations.'
+            })
+
+def validate_working_hours(doctor, appointment_date, appointment_time):
+    """Refuse times that are not one of the doctor's slots on that date"""
+    if doctor and appointment_date and appointment_time:
+        template = get_schedule(doctor.id).template(appointment_date)
+        if not template:
+            raise serializers.ValidationError({
+                'appointment_date': 'Doctor is not working on this date.'
+            })
+        if not template.offers(appointment_time):
+            raise serializers.ValidationError({
+                'appointment_time': "This time is not one of the doctor's slots on this date."
+            })
+
 class AppointmentSerializer(serializers.ModelSerializer):
     doctor_name = serializers.CharField(source='doctor.name', read_only=True)
     doctor_specialization = serializers.CharField(source='doctor.specialization.name', read_only=True)
+    # Resolve the doctor together with its specialization so responses need no extra query
+    doctor = serializers.PrimaryKeyRelatedField(queryset=Doctor.objects.select_related('specialization'))
     
     class Meta:
         model = Appointment
@@ -31,27 +106,13 @@ class AppointmentSerializer(serializers.ModelSerializer):
             'status', 'notes', 'created_at'
         ]
         read_only_fields = ['status', 'notes', 'created_at']
+        # Slot uniqueness is decided by the database at write time (see booking.book_slot)
+        validators = []
     
     def validate(self, data):
         """Validate appointment data"""
-        doctor = data.get('doctor')
-        consultation_type = data.get('consultation_type')
-                
-        # Check if doctor is available
-        if doctor and not doctor.is_available:
-            raise serializers.ValidationError({
-                'doctor': 'Doctor is not available for appointments.'
-            })
-        
-        # Check if doctor supports the consultation type
-        if doctor and consultation_type:
-            if not doctor.supports_consultation_type(consultation_type):
-                # Get human-readable doctor modes
-                mode_display = dict(Doctor.CONSULTATION_MODES).get(doctor.consultation_modes, doctor.consultation_modes)
-                raise serializers.ValidationError({
-                    'consultation_type': f'Doctor only offers {mode_display} consultations.'
-                })
-        
+        validate_doctor_booking(data.get('doctor'), data.get('consultation_type'))
+        validate_working_hours(data.get('doctor'), data.get('appointment_date'), data.get('appointment_time'))
         return data
     
     def create(self, validated_data):
@@ -64,5 +125,83 @@ class AppointmentSerializer(serializers.ModelSerializer):
             # Create the appointment
             return Appointment.objects.create(**validated_data)
             
+        except DatabaseError:
+            # Slot conflicts and lock errors are handled by booking.book_slot
+            raise
         except Exception as e:
-            raise serializers.ValidationError(str(e))
\ No newline at end of file
+            raise serializers.ValidationError(str(e))
+
+
+class AppointmentSeriesSerializer(serializers.ModelSerializer):
+    """A recurring series; the write-only fields say which dates to book (see api.series)"""
+    doctor = serializers.PrimaryKeyRelatedField(queryset=Doctor.objects.filter(is_active=True))
+    start_date = serializers.DateField(write_only=True)
+    occurrences = serializers.IntegerField(write_only=True, min_value=1)
+    weekday = serializers.ChoiceField(choices=WEEKDAYS, required=False, write_only=True)
+    skip_conflicts = serializers.BooleanField(default=False, write_only=True)
+    
+    class Meta:
+        model = AppointmentSeries
+        fields = [
+            'id', 'doctor', 'patient_name', 'patient_email', 'patient_phone',
+            'consultation_type', 'appointment_time', 'interval_weeks', 'created_at',
+            'start_date', 'occurrences', 'weekday', 'skip_conflicts'
+        ]
+        read_only_fields = ['created_at']
+    
+    def validate_occurrences(self, value):
+        if value > settings.SERIES_MAX_OCCURRENCES:
+            raise serializers.ValidationError(f'A series may have at most {settings.SERIES_MAX_OCCURRENCES} occurrences.')
+        return value
+    
+    def validate(self, data):
+        validate_doctor_booking(data.get('doctor'), data.get('consultation_type'))
+        return data
+
+
+class ValuesReader:
+    """Read-only fast path reproducing a ModelSerializer's output from value rows
+
+    Serializing model instances costs a model object plus a get_attribute and
+    to_representation call per field and row. This selects the serializer's
+    columns (following dotted sources such as doctor.name) with
+    values_list() and builds the same dicts from the tuples, converting only
+    the values JSON cannot carry as the database returns them (dates, times,
+    datetimes) with the serializer's own fields.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+
+    @cached_property
+    def columns(self):
+        """(output key, values lookup, field) per readable field"""
+        return [
+            (name, '__'.join(field.source_attrs), field)
+            for name, field in self.serializer_class().fields.items() if not field.write_only
+        ]
+
+    def values(self, queryset):
+        """The queryset as named rows of the serialized columns"""
+        return queryset.values_list(*[lookup for _, lookup, _ in self.columns], named=True)
+
+    def serialize(self, rows):
+        keys = [key for key, _, _ in self.columns]
+        # Resolved per call: the current timezone can differ between requests
+        converters = []
+        for index, (_, _, field) in enumerate(self.columns):
+            converter = value_converter(field)
+            if converter:
+                converters.append((index, converter))
+        data = []
+        for row in rows:
+            row = list(row)
+            for index, converter in converters:
+                if row[index] is not None:
+                    row[index] = converter(row[index])
+            data.append(dict(zip(keys, row)))
+        return data
+
+
+doctor_reader = ValuesReader(DoctorSerializer)
+appointment_reader = ValuesReader(AppointmentSerializer)
@@ -0,0 +1,185 @@
+from datetime import datetime, timedelta
+from itertools import takewhile
+
+from django.conf import settings
+from django.utils import timezone
+
+from .batch import cancel_appointments, describe, refresh_days
+from .booking import book_slot, SlotUnavailable
+from .models import Appointment, AppointmentSeries
+from .occupancy import get_masks, iter_free_slots, mask_from_times
+from .schedule import get_schedule
+
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+# Copied from the series onto each occurrence
+OCCURRENCE_FIELDS = ['patient_name', 'patient_email', 'patient_phone', 'consultation_type']
+
+
+def occurrence_dates(start_date, occurrences, interval_weeks=1, weekday=None):
+    """Dates of a weekly series, starting on the first `weekday` (0 is Monday) on or after start_date"""
+    if weekday is not None:
+        start_date += timedelta(days=(weekday - start_date.weekday()) % 7)
+    return [start_date + timedelta(weeks=interval_weeks * index) for index in range(occurrences)]
+
+
+def occurrence(day, slot):
+    return {'date': day, 'time': slot.strftime('%H:%M')}
+
+
+def cancel_series(series, from_date=None):
+    """Cancel the series' confirmed occurrences from from_date (default: all of them) in one UPDATE"""
+    queryset = Appointment.objects.filter(series=series)
+    if from_date:
+        queryset = queryset.filter(appointment_date__gte=from_date)
+    return cancel_appointments(queryset)
+
+
+class SeriesPlanner:
+    """Book and move a recurring series against one doctor's schedule and occupancy bitmaps
+
+    Every occurrence is checked in memory against the doctor's slot
+    templates and bitmasks, read with one range query, and an unavailable
+    one is reported with a suggested alternative: the closest free slot that
+    day, else the first free slot before the next occurrence. Writes are set-based (one
+    bulk_create or bulk_update and one summary refresh) in a single
+    transaction, so a series is booked or moved whole. As with Rescheduler,
+    a concurrent booking that takes a planned slot fails the write on the
+    confirmed-slot constraint and the series is planned again.
+    """
+
+    def __init__(self, doctor, now=None, retries=2):
+        self.doctor = doctor
+        self.now = now or timezone.localtime().replace(tzinfo=None, second=0, microsecond=0)
+        self.retries = retries
+        self.schedule = get_schedule(doctor.id)
+
+    def retry(self, write):
+        for attempt in range(self.retries + 1):
+            try:
+                return book_slot(write)
+            except SlotUnavailable:
+                if attempt == self.retries:
+                    raise
+
+    def book(self, fields, days, skip_conflicts=False):
+        """Create the series and its occurrences on `days`
+
+        `fields` holds the AppointmentSeries fields. Returns (series,
+        appointments, conflicts); with conflicts and not skip_conflicts
+        nothing is written and series is None.
+        """
+        slot = fields['appointment_time']
+        window = timedelta(weeks=fields.get('interval_weeks', 1))
+
+        def insert():
+            free, conflicts = self.check(days, slot, window)
+            if not free or conflicts and not skip_conflicts:
+                return None, [], conflicts
+            series = AppointmentSeries.objects.create(doctor=self.doctor, **fields)
+            appointments = Appointment.objects.bulk_create([
+                Appointment(
+                    doctor=self.doctor, series=series, appointment_date=day, appointment_time=slot,
+                    status='confirmed', **{field: fields[field] for field in OCCURRENCE_FIELDS}
+                )
+                for day in free
+            ])
+            refresh_days({(self.doctor.id, day) for day in free})
+            return series, appointments, conflicts
+
+        return self.retry(insert)
+
+    def reschedule(self, series, slot, shift_days=0, from_date=None):
+        """Move the series' upcoming confirmed occurrences to `slot`, shift_days later
+
+        All or nothing: returns (results, conflicts), and nothing moves when
+        any occurrence conflicts. shift_days must stay within a week so no
+        occurrence lands on another's date.
+        """
+        shift = timedelta(days=shift_days)
+
+        def move():
+            queryset = Appointment.objects.select_for_update().filter(series=series, status='confirmed')
+            if from_date:
+                queryset = queryset.filter(appointment_date__gte=from_date)
+            rows = [
+                row for row in queryset.order_by('appointment_date').only('id', 'doctor_id', 'appointment_date', 'appointment_time')
+                if datetime.combine(row.appointment_date, row.appointment_time) >= self.now
+            ]
+            if not rows:
+                return [], []
+            # The occurrences' own bookings do not block the move
+            release = [(row.appointment_date, row.appointment_time) for row in rows]
+            days = [row.appointment_date + shift for row in rows]
+            free, conflicts = self.check(days, slot, timedelta(weeks=series.interval_weeks), release)
+            if conflicts:
+                return [], conflicts
+
+            updated_at = timezone.now()
+            touched, results = set(), []
+            for row, day in zip(rows, days):
+                before = describe(row.id, row.doctor_id, row.appointment_date, row.appointment_time)
+                touched.add((row.doctor_id, row.appointment_date))
+                row.appointment_date, row.appointment_time, row.updated_at = day, slot, updated_at
+                touched.add((row.doctor_id, day))
+                results.append({
+                    'appointment_id': row.id,
+                    'status': 'rescheduled',
+                    'from': before,
+                    'to': describe(row.id, row.doctor_id, day, slot),
+                })
+            Appointment.objects.bulk_update(
+                rows, ['appointment_date', 'appointment_time', 'updated_at'],
+                batch_size=settings.BULK_IMPORT_BATCH_SIZE
+            )
+            if slot != series.appointment_time:
+                series.appointment_time = slot
+                series.save(update_fields=['appointment_time'])
+            refresh_days(touched)
+            return results, []
+
+        return self.retry(move)
+
+    def check(self, days, slot, window, release=()):
+        """Split occurrence dates into free ones and conflicts, each with a suggested alternative
+
+        `window` bounds how far after an occurrence its suggestion may fall;
+        `release` lists (date, time) bookings to leave out of the bitmasks.
+        """
+        booked = get_masks([self.doctor.id], min(days), max(days) + window)
+        for day, booked_slot in release:
+            key = (self.doctor.id, day)
+            booked[key] = booked.get(key, 0) & ~mask_from_times([booked_slot])
+
+        free, conflicts = [], []
+        for day in days:
+            template = self.schedule.template(day)
+            if datetime.combine(day, slot) < self.now:
+                error = 'Cannot book appointments in the past'
+            elif not template:
+                error = 'Doctor is not working on this date'
+            elif not template.offers(slot):
+                error = 'Outside the doctor\'s slots on this date'
+            elif not template.is_free(slot, booked.get((self.doctor.id, day), 0)):
+                error = 'This time slot is already booked'
+            else:
+                free.append(day)
+                continue
+            conflicts.append(dict(occurrence(day, slot), error=error, suggestion=self.suggest(booked, day, slot, window)))
+        return free, conflicts
+
+    def suggest(self, booked, day, slot, window):
+        """The free slot closest to `slot` on `day`, else the first free one before day + window"""
+        free = iter_free_slots(
+            booked, self.doctor.id, day, day + window - timedelta(days=1), self.schedule,
+            not_before=self.now
+        )
+        first = next(free, None)
+        if first is None:
+            return None
+        if first[0] != day:
+            return occurrence(first[0], first[1])
+        same_day = [first[1]] + [free_slot for _, free_slot, _ in takewhile(lambda item: item[0] == day, free)]
+        wanted = datetime.combine(day, slot)
+        return occurrence(day, min(same_day, key=lambda free_slot: abs(datetime.combine(day, free_slot) - wanted)))
@@ -0,0 +1,104 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .catalog import bump_catalog_version
+from .metrics import registry
+from .models import Specialization, Doctor, Appointment, WorkingHours, TimeOff
+from .occupancy import refresh_occupancy
+from .stats import refresh_booking_counts
+from .schedule import evict_schedule
+from .search import index_doctors, index_specialization
+from .slotcache import doctor_cache, evict_booked_slots
+
+
+# Connected before invalidate_catalog, so their on_commit work moves the
+# search version before the catalog's: a search cached under the new
+# catalog version must come from a current index
+@receiver([post_save, post_delete], sender=Doctor)
+def update_doctor_search(sender, instance, **kwargs):
+    index_doctors([instance.id])
+
+
+@receiver(post_save, sender=Specialization)
+def update_specialization_search(sender, instance, created, **kwargs):
+    # A new specialization has no doctors yet
+    if not created:
+        index_specialization(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Specialization)
+@receiver([post_save, post_delete], sender=Doctor)
+def invalidate_catalog(sender, **kwargs):
+    """Any doctor or specialization change invalidates the cached catalog, now and again once it commits"""
+    bump_catalog_version()
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver([post_save, post_delete], sender=Doctor)
+def invalidate_doctor_summary(sender, instance, **kwargs):
+    doctor_cache.evict(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Doctor)
+@receiver([post_save, post_delete], sender=WorkingHours)
+@receiver([post_save, post_delete], sender=TimeOff)
+def invalidate_schedule(sender, instance, **kwargs):
+    """Drop the doctor's compiled slot templates now, and again once the edit commits"""
+    doctor_id = instance.id if sender is Doctor else instance.doctor_id
+    evict_schedule(doctor_id)
+    transaction.on_commit(lambda: evict_schedule(doctor_id))
+
+
+def booking_days(instance):
+    """The (doctor_id, date) days a saved or deleted appointment touches, old and new"""
+    days = {(instance.doctor_id, instance.appointment_date)}
+    loaded_day = getattr(instance, '_loaded_day', None)
+    if loaded_day:
+        days.add(loaded_day)
+    return days
+
+
+def is_cascade(origin):
+    """Whether an appointment delete comes from deleting its doctor
+
+    The doctor's occupancy and count rows are deleted by the same cascade.
+    """
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is not Appointment
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+def update_occupancy(sender, instance, signal, **kwargs):
+    """Recompute the booked bitmasks in the same transaction as the write"""
+    if signal is post_delete and is_cascade(kwargs.get('origin')):
+        return
+    refresh_occupancy(booking_days(instance))
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+def update_booking_counts(sender, instance, signal, **kwargs):
+    """Recount the booking's days; connected after update_occupancy, whose row locks it relies on"""
+    if signal is post_delete and is_cascade(kwargs.get('origin')):
+        return
+    refresh_booking_counts(booking_days(instance))
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+def invalidate_booked_slots(sender, instance, **kwargs):
+    """Evict the booking's old and new day now, and again once the write commits
+
+    The second eviction drops anything a concurrent reader cached from the
+    pre-commit state.
+    """
+    days = booking_days(instance)
+    evict_booked_slots(*days)
+    transaction.on_commit(lambda: evict_booked_slots(*days))
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    """Count new database connections (checkouts when pooled) for /metrics"""
+    registry.connection_opened(connection.alias)
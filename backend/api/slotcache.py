@@ -0,0 +1,226 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Doctor
+from .occupancy import aget_mask, get_mask
+from .routers import primary
+
+
+class TTLCache:
+    """Thread-safe in-process LRU map whose entries also expire after `ttl` seconds
+
+    Keeps hit/miss/eviction counters so the size and TTL can be tuned.
+    Values are loaded from the primary: one read from a lagging replica just
+    after an eviction would be served until it expires.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every eviction so a load that raced a write is not stored
+        self._generation = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def lookup(self, key, now):
+        """Return (hit, value or generation) for a key"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            self.misses += 1
+            return False, self._generation
+
+    def store(self, key, value, now, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        now = time.monotonic()
+        hit, result = self.lookup(key, now)
+        if hit:
+            return result
+
+        # Load outside the lock so one slow query does not stall every reader
+        with primary():
+            value = loader()
+        self.store(key, value, now, result)
+        return value
+
+    async def aget_or_load(self, key, loader):
+        """Async version of get_or_load; `loader` is a coroutine function"""
+        now = time.monotonic()
+        hit, result = self.lookup(key, now)
+        if hit:
+            return result
+
+        with primary():
+            value = await loader()
+        self.store(key, value, now, result)
+        return value
+
+    def get_many_or_load(self, keys, loader):
+        """Values for several keys; `loader` takes the missed keys and returns a dict of their values"""
+        now = time.monotonic()
+        values, missed = self.lookup_many(keys, now)
+        if missed:
+            with primary():
+                loaded = loader(list(missed))
+            self.store_many(loaded, now, missed)
+            values.update(loaded)
+        return values
+
+    async def aget_many_or_load(self, keys, loader):
+        """Async version of get_many_or_load; `loader` is a coroutine function"""
+        now = time.monotonic()
+        values, missed = self.lookup_many(keys, now)
+        if missed:
+            with primary():
+                loaded = await loader(list(missed))
+            self.store_many(loaded, now, missed)
+            values.update(loaded)
+        return values
+
+    def lookup_many(self, keys, now):
+        """Return (hits as a dict, generation per missed key)"""
+        values, missed = {}, {}
+        for key in keys:
+            hit, result = self.lookup(key, now)
+            if hit:
+                values[key] = result
+            else:
+                missed[key] = result
+        return values, missed
+
+    def store_many(self, values, now, generations):
+        for key, value in values.items():
+            self.store(key, value, now, generations[key])
+
+    def evict(self, key):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+# Booked bitmask per (doctor_id, date, version); see get_slot_version
+booked_slot_cache = TTLCache(settings.SLOT_CACHE_MAX_ENTRIES, settings.SLOT_CACHE_TTL)
+
+# The few doctor columns availability checks need, evicted by the Doctor signals
+doctor_cache = TTLCache(settings.SLOT_CACHE_MAX_ENTRIES, settings.SLOT_CACHE_TTL)
+
+# Version tokens only need to outlive the bookings of a day being checked; one
+# that expires is replaced by a new token, which just forces a reload
+SLOT_VERSION_TIMEOUT = 7 * 24 * 3600
+
+
+def get_version_cache():
+    return caches[settings.SLOT_VERSION_CACHE_ALIAS]
+
+
+def slot_version_key(doctor_id, target_date):
+    return f'slots:{doctor_id}:{target_date.isoformat()}'
+
+
+def get_slot_version(doctor_id, target_date):
+    """The day's version token in the shared cache, read on every cached lookup
+
+    Every write to the day replaces the token (bump_slot_versions), so bitmasks
+    cached in any worker under the old token are never served again.
+    """
+    cache, key = get_version_cache(), slot_version_key(doctor_id, target_date)
+    version = cache.get(key)
+    if version is None:
+        # add() so concurrent first readers agree on one token
+        cache.add(key, uuid.uuid4().hex, SLOT_VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+async def aget_slot_version(doctor_id, target_date):
+    """Async version of get_slot_version"""
+    cache, key = get_version_cache(), slot_version_key(doctor_id, target_date)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, uuid.uuid4().hex, SLOT_VERSION_TIMEOUT)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_slot_versions(*days):
+    """Give each (doctor_id, date) a new version token"""
+    get_version_cache().set_many(
+        {slot_version_key(doctor_id, day): uuid.uuid4().hex for doctor_id, day in days}, SLOT_VERSION_TIMEOUT
+    )
+
+
+def doctor_summary_query(doctor_id):
+    return Doctor.objects.filter(
+        id=doctor_id, is_active=True
+    ).values('id', 'name', 'is_available', 'consultation_modes')
+
+
+def get_booked_mask(doctor_id, target_date):
+    """Occupancy bitmask for one doctor and day, served from the slot cache"""
+    version = get_slot_version(doctor_id, target_date)
+    return booked_slot_cache.get_or_load((doctor_id, target_date, version), lambda: get_mask(doctor_id, target_date))
+
+
+async def aget_booked_mask(doctor_id, target_date):
+    """Async version of get_booked_mask"""
+    version = await aget_slot_version(doctor_id, target_date)
+    return await booked_slot_cache.aget_or_load(
+        (doctor_id, target_date, version), lambda: aget_mask(doctor_id, target_date)
+    )
+
+
+def get_doctor_summary(doctor_id):
+    """Active doctor's availability columns as a dict, or None if there is no such doctor"""
+    return doctor_cache.get_or_load(doctor_id, lambda: doctor_summary_query(doctor_id).first())
+
+
+async def aget_doctor_summary(doctor_id):
+    """Async version of get_doctor_summary"""
+    return await doctor_cache.aget_or_load(doctor_id, doctor_summary_query(doctor_id).afirst)
+
+
+def evict_booked_slots(*days):
+    """Invalidate the cached bookings for each (doctor_id, date) given, in every worker
+
+    A load that raced the write was stored under the old token, so it is
+    never read either.
+    """
+    if days:
+        bump_slot_versions(*days)
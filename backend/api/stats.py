@@ -0,0 +1,146 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Appointment, ArchivedAppointment, DailyBookingCount
+from .occupancy import REFRESH_CHUNK_DAYS, match_days
+
+
+STATUSES = [value for value, _ in Appointment.STATUS_CHOICES]
+CONSULTATION_TYPES = [value for value, _ in Appointment.CONSULTATION_TYPES]
+
+# Columns each stats grouping reports per row
+GROUPINGS = {
+    'doctor': ('doctor_id', 'doctor__name'),
+    'date': ('date',),
+    'doctor_date': ('doctor_id', 'doctor__name', 'date'),
+}
+
+
+def count_appointments(*querysets):
+    """(doctor_id, date, status, consultation_type) -> appointment count, summed over the querysets"""
+    counts = {}
+    for appointments in querysets:
+        rows = appointments.order_by().values_list(
+            'doctor_id', 'appointment_date', 'status', 'consultation_type'
+        ).annotate(count=Count('id'))
+        for *key, count in rows:
+            key = tuple(key)
+            counts[key] = counts.get(key, 0) + count
+    return counts
+
+
+def stored_counts(counts):
+    return {(row.doctor_id, row.date, row.status, row.consultation_type): row for row in counts}
+
+
+def apply_counts(actual, stored):
+    """Write the difference between fresh counts and the stored rows
+
+    Returns (created, updated, deleted) row counts.
+    """
+    created, updated = [], []
+    for key, count in actual.items():
+        row = stored.pop(key, None)
+        if row is None:
+            doctor_id, day, status, consultation_type = key
+            created.append(DailyBookingCount(
+                doctor_id=doctor_id, date=day, status=status, consultation_type=consultation_type, count=count
+            ))
+        elif row.count != count:
+            row.count = count
+            updated.append(row)
+
+    if stored:
+        DailyBookingCount.objects.filter(id__in=[row.id for row in stored.values()]).delete()
+    if created:
+        DailyBookingCount.objects.bulk_create(created)
+    if updated:
+        DailyBookingCount.objects.bulk_update(updated, ['count'])
+    return len(created), len(updated), len(stored)
+
+
+def refresh_booking_counts(days):
+    """Recount the given (doctor_id, date) days from their appointments
+
+    Meant to run in the write's transaction after refresh_occupancy, whose row
+    locks on the same days keep concurrent writers from interleaving recounts.
+    Past days also count their archived appointments.
+    """
+    days = sorted(set(days))
+    today = timezone.now().date()
+    with transaction.atomic(savepoint=False):
+        for start in range(0, len(days), REFRESH_CHUNK_DAYS):
+            chunk = days[start:start + REFRESH_CHUNK_DAYS]
+            appointments = [Appointment.objects.filter(match_days(chunk, 'appointment_date'))]
+            past = [day for day in chunk if day[1] < today]
+            if past:
+                appointments.append(ArchivedAppointment.objects.filter(match_days(past, 'appointment_date')))
+            apply_counts(
+                count_appointments(*appointments),
+                stored_counts(DailyBookingCount.objects.filter(match_days(chunk, 'date')))
+            )
+
+
+def reconcile_booking_counts(doctor_ids, batch_size=None, dry_run=False, progress=None):
+    """Recount every day of the given doctors, live and archived, a batch of doctors per transaction
+
+    Repairs the summary after writes that bypass the ORM. Returns the number of
+    rows (created, updated, deleted), or that would be with dry_run.
+    """
+    batch_size = batch_size or settings.BOOKING_COUNT_RECONCILE_BATCH_SIZE
+    doctor_ids = sorted(doctor_ids)
+    totals = [0, 0, 0]
+    for start in range(0, len(doctor_ids), batch_size):
+        batch = doctor_ids[start:start + batch_size]
+        with transaction.atomic():
+            actual = count_appointments(
+                Appointment.objects.filter(doctor_id__in=batch),
+                ArchivedAppointment.objects.filter(doctor_id__in=batch)
+            )
+            stored = stored_counts(DailyBookingCount.objects.filter(doctor_id__in=batch))
+            if dry_run:
+                changes = (
+                    len(actual.keys() - stored.keys()),
+                    sum(1 for key in actual.keys() & stored.keys() if stored[key].count != actual[key]),
+                    len(stored.keys() - actual.keys()),
+                )
+            else:
+                changes = apply_counts(actual, stored)
+        totals = [total + change for total, change in zip(totals, changes)]
+        if progress:
+            progress(start + len(batch), *totals)
+    return tuple(totals)
+
+
+def booking_stats(counts, group_by):
+    """Sum a DailyBookingCount queryset into rows of totals by status and type
+
+    One aggregate query over the summary table, however many appointments
+    the rows stand for.
+    """
+    aggregates = {'total': Sum('count')}
+    for value in STATUSES:
+        aggregates[f'status_{value}'] = Sum('count', filter=Q(status=value), default=0)
+    for value in CONSULTATION_TYPES:
+        aggregates[f'type_{value}'] = Sum('count', filter=Q(consultation_type=value), default=0)
+
+    fields = GROUPINGS[group_by]
+    rows = []
+    for row in counts.values(*fields).annotate(**aggregates).order_by(*fields):
+        result = {'doctor_name' if field == 'doctor__name' else field: row[field] for field in fields}
+        result['total'] = row['total']
+        result['by_status'] = {value: row[f'status_{value}'] for value in STATUSES}
+        result['by_type'] = {value: row[f'type_{value}'] for value in CONSULTATION_TYPES}
+        rows.append(result)
+    return rows
+
+
+def summarize_rows(rows):
+    """Grand totals over booking_stats rows"""
+    return {
+        'total': sum(row['total'] for row in rows),
+        'by_status': {value: sum(row['by_status'][value] for row in rows) for value in STATUSES},
+        'by_type': {value: sum(row['by_type'][value] for row in rows) for value in CONSULTATION_TYPES},
+    }
@@ -1,3 +1,2073 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import date, datetime, time, timedelta
+from importlib import import_module
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from .models import (
+    Specialization, Doctor, Appointment, AppointmentSeries, ArchivedAppointment, SlotOccupancy, DailyBookingCount,
+    TimeOff, WorkingHours
+)
+from .archive import archive_appointments
+from .availability import generate_slots
+from .bench.load import run_contention
+from .bench.micro import SCENARIOS
+from .bulk import AppointmentImporter
+from .catalog import catalog_response
+from .metrics import registry
+from .occupancy import decode_mask, mask_from_times, rebuild_occupancy
+from .middleware import RequestMetricsMiddleware
+from .schedule import compile_day, schedule_cache
+from .search import search_index
+from .serializers import AppointmentSerializer, DoctorSerializer
+from .stats import reconcile_booking_counts
+from .slotcache import TTLCache, booked_slot_cache, doctor_cache
+
+
+def make_doctor(name='Smith', specialization=None, **kwargs):
+    if specialization is None:
+        specialization, _ = Specialization.objects.get_or_create(name='Psychiatry')
+    defaults = {
+        'years_experience': 10,
+        'bio': 'Experienced clinician',
+        'consultation_modes': 'all',
+    }
+    defaults.update(kwargs)
+    return Doctor.objects.create(name=name, specialization=specialization, **defaults)
+
+
+def make_appointment(doctor, appointment_date, appointment_time, **kwargs):
+    defaults = {
+        'patient_name': 'Jane Doe',
+        'patient_email': 'jane@example.com',
+        'patient_phone': '5551234',
+        'consultation_type': 'video',
+    }
+    defaults.update(kwargs)
+    return Appointment.objects.create(
+        doctor=doctor,
+        appointment_date=appointment_date,
+        appointment_time=appointment_time,
+        **defaults
+    )
+
+
+class SlotEngineTests(TestCase):
+    def test_default_grid_is_hourly_nine_to_five(self):
+        slots = generate_slots('09:00', '17:00', 60)
+        self.assertEqual(slots[0], time(9, 0))
+        self.assertEqual(slots[-1], time(16, 0))
+        self.assertEqual(len(slots), 8)
+
+    def test_custom_slot_length(self):
+        slots = generate_slots('08:30', '12:00', 45)
+        self.assertEqual(slots, [time(8, 30), time(9, 15), time(10, 0), time(10, 45)])
+
+    def test_booking_inside_slot_marks_it_taken(self):
+        template = compile_day((time(9, 0), time(12, 0), None, None), 60)
+        grid = template.mark(mask_from_times([time(10, 30)]))
+        self.assertEqual(grid, [(time(9, 0), True), (time(10, 0), False), (time(11, 0), True)])
+
+    def test_break_is_left_out_of_the_day(self):
+        template = compile_day((time(9, 0), time(13, 0), time(10, 0), time(11, 30)), 30)
+        self.assertEqual(template.slots, (time(9, 0), time(9, 30), time(11, 30), time(12, 0), time(12, 30)))
+        self.assertEqual(template.free(mask_from_times([time(12, 0)])), [time(9, 0), time(9, 30), time(11, 30), time(12, 30)])
+
+
+class ConsultationFlagTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        self.doctors = {mode: make_doctor(name=mode, consultation_modes=mode) for mode, _ in Doctor.CONSULTATION_MODES}
+
+    def test_database_flags_agree_with_supports_consultation_type(self):
+        for doctor in Doctor.objects.all():
+            for consultation_type, _ in Appointment.CONSULTATION_TYPES:
+                in_sql = Doctor.objects.filter(
+                    id=doctor.id, consultation_flags__in=Doctor.flags_supporting(consultation_type)
+                ).exists()
+                self.assertEqual(in_sql, doctor.supports_consultation_type(consultation_type), (doctor.name, consultation_type))
+
+    def test_flags_follow_mode_changes(self):
+        doctor = self.doctors['video_only']
+        doctor.consultation_modes = 'phone_only'
+        doctor.save()
+        Doctor.objects.filter(id=self.doctors['all'].id).update(consultation_modes='in_person_only')
+        flags = dict(Doctor.objects.values_list('name', 'consultation_flags'))
+        self.assertEqual(flags['video_only'], Doctor.TYPE_FLAGS['phone'])
+        self.assertEqual(flags['all'], Doctor.TYPE_FLAGS['in_person'])
+
+    def test_doctor_list_filters_by_consultation_type(self):
+        response = self.client.get('/api/doctors/', {'consultation_type': 'phone'})
+        self.assertEqual(
+            sorted(doctor['name'] for doctor in response.data),
+            ['all', 'in_person_phone', 'online_only', 'phone_only']
+        )
+        # consultation_mode takes a type or an exact mode
+        response = self.client.get('/api/doctors/', {'consultation_mode': 'video'})
+        self.assertEqual(len(response.data), 4)
+        response = self.client.get('/api/doctors/', {'consultation_mode': 'video_only'})
+        self.assertEqual([doctor['name'] for doctor in response.data], ['video_only'])
+
+    def test_legacy_modes_are_rewritten_by_the_migration(self):
+        migration = import_module('api.migrations.0011_legacy_consultation_modes')
+        legacy = {'both': self.doctors['all'], 'online': self.doctors['online_only'], 'in_person': self.doctors['in_person_only']}
+        for mode, doctor in legacy.items():
+            Doctor.objects.filter(id=doctor.id).update(consultation_modes=mode)
+        self.assertFalse(Doctor.objects.filter(id=legacy['both'].id, consultation_flags__in=Doctor.flags_supporting('phone')).exists())
+
+        migration.rewrite_legacy_modes(django_apps, None)
+        cache.clear()
+        response = self.client.get('/api/doctors/', {'consultation_type': 'phone'})
+        self.assertEqual(
+            sorted(doctor['name'] for doctor in response.data),
+            ['all', 'in_person_phone', 'online_only', 'phone_only']
+        )
+        response = self.client.get('/api/doctors/', {'consultation_type': 'in_person'})
+        self.assertIn('in_person_only', [doctor['name'] for doctor in response.data])
+
+
+class DoctorSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        search_index.reset()
+        self.child = Specialization.objects.create(name='Child Psychology')
+        self.addiction = Specialization.objects.create(name='Addiction Medicine')
+        self.anxious = make_doctor(name='Anna Hale', specialization=self.child, bio='Treats anxiety in teenagers.')
+        self.harper = make_doctor(name='Harper Anxiety', specialization=self.addiction, bio='Recovery programs.')
+        self.mills = make_doctor(name='Sam Mills', specialization=self.addiction, bio='Anxiety and alcohol use.')
+
+    def search(self, q, **params):
+        return self.client.get('/api/doctors/search/', {'q': q, **params}).data
+
+    def test_name_matches_outrank_bio_matches(self):
+        results = self.search('anxiety')
+        self.assertEqual([doctor['name'] for doctor in results], ['Harper Anxiety', 'Anna Hale', 'Sam Mills'])
+        self.assertGreater(results[0]['score'], results[1]['score'])
+
+    def test_every_word_must_match_and_prefixes_count(self):
+        self.assertEqual([doctor['name'] for doctor in self.search('anx alco')], ['Sam Mills'])
+        self.assertEqual([doctor['name'] for doctor in self.search('child psych')], ['Anna Hale'])
+        self.assertEqual(self.search('a'), [])
+
+    def test_list_filters_apply_to_results(self):
+        results = self.search('anxiety', specialization=self.addiction.id)
+        self.assertEqual([doctor['name'] for doctor in results], ['Harper Anxiety', 'Sam Mills'])
+
+    def test_filters_apply_before_the_limit(self):
+        # Harper Anxiety ranks first overall but is not in Child Psychology
+        results = self.search('anxiety', specialization=self.child.id, limit=1)
+        self.assertEqual([doctor['name'] for doctor in results], ['Anna Hale'])
+        Doctor.objects.filter(id=self.harper.id).update(is_available=False)
+        results = self.search('anxiety', available='true', limit=1)
+        self.assertEqual([doctor['name'] for doctor in results], ['Anna Hale'])
+
+    def test_index_follows_doctor_and_specialization_edits(self):
+        self.search('anxiety')
+        self.assertTrue(search_index.built)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mills.bio = 'Sleep medicine.'
+            self.mills.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.harper.is_active = False
+            self.harper.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.child.name = 'Adolescent Care'
+            self.child.save()
+
+        self.assertEqual([doctor['name'] for doctor in self.search('anxiety')], ['Anna Hale'])
+        self.assertEqual([doctor['name'] for doctor in self.search('adolescent')], ['Anna Hale'])
+        self.assertEqual(self.search('child'), [])
+
+    def test_other_workers_rebuild_after_a_write(self):
+        from .search import DoctorSearchIndex
+        other_worker = DoctorSearchIndex()
+        self.assertIn(self.mills.id, other_worker.scores('alcohol'))
+        self.search('anxiety')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mills.bio = 'Sleep medicine.'
+            self.mills.save()
+
+        # The writer patched its own index; the other one rebuilds from the rows
+        self.assertEqual(search_index._version, other_worker._version + 1)
+        self.assertEqual(other_worker.scores('alcohol'), {})
+        self.assertIn(self.mills.id, other_worker.scores('sleep'))
+        self.assertEqual(search_index._version, other_worker._version)
+
+    def test_repeat_searches_are_cached(self):
+        self.search('anxiety')
+        with self.assertNumQueries(0):
+            self.search('anxiety')
+
+    def test_admin_search_uses_the_index(self):
+        from django.contrib.admin.sites import site
+        from django.test import RequestFactory
+        admin = site._registry[Doctor]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.harper.is_active = False
+            self.harper.save()
+        queryset, _ = admin.get_search_results(RequestFactory().get('/'), Doctor.objects.all(), 'harp')
+        self.assertEqual(list(queryset), [self.harper])
+
+    def test_admin_search_keeps_every_match(self):
+        from django.contrib.admin.sites import site
+        from django.test import RequestFactory
+        Doctor.objects.bulk_create([
+            Doctor(name=f'Locum {index}', specialization=self.child, years_experience=1, bio='Cover shifts.')
+            for index in range(1200)
+        ])
+        search_index.reset()
+        admin = site._registry[Doctor]
+        queryset, _ = admin.get_search_results(RequestFactory().get('/'), Doctor.objects.all(), 'locum')
+        self.assertEqual(queryset.count(), 1200)
+        self.assertFalse(admin.get_search_results(RequestFactory().get('/'), Doctor.objects.all(), 'zzz')[0].exists())
+
+
+class DoctorAvailabilityViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.doctor = make_doctor()
+        self.target_date = date.today() + timedelta(days=7)
+        self.url = f'/api/doctors/{self.doctor.id}/availability/'
+
+    def test_booked_slots_are_unavailable(self):
+        make_appointment(self.doctor, self.target_date, time(10, 0))
+        make_appointment(self.doctor, self.target_date, time(11, 0), status='cancelled')
+
+        response = self.client.get(self.url, {'date': self.target_date.isoformat()})
+
+        self.assertEqual(response.status_code, 200)
+        slots = {slot['time']: slot['available'] for slot in response.data['time_slots']}
+        self.assertFalse(slots['10:00'])
+        self.assertTrue(slots['11:00'])
+        self.assertEqual(len(slots), 8)
+
+    def test_query_count_is_constant_regardless_of_slot_count(self):
+        params = {'date': self.target_date.isoformat()}
+
+        # doctor, schedule (doctor with working hours, time off) and bookings
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url, params)
+        self.assertEqual(len(response.data['time_slots']), 8)
+
+        # The compiled schedule is cached; the default working day follows settings
+        with override_settings(APPOINTMENT_DAY_START='06:00', APPOINTMENT_DAY_END='22:00',
+                               APPOINTMENT_SLOT_MINUTES=15):
+            with self.assertNumQueries(2):
+                response = self.client.get(self.url, params)
+        self.assertEqual(len(response.data['time_slots']), 64)
+
+
+class AvailabilityCalendarViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.start = date.today() + timedelta(days=1)
+
+    def test_returns_bitmap_per_doctor_per_day(self):
+        doctor = make_doctor()
+        busy = make_doctor(name='Jones', is_available=False)
+        make_appointment(doctor, self.start, time(9, 0))
+        make_appointment(doctor, self.start, time(16, 0))
+
+        response = self.client.get('/api/availability/', {
+            'doctors': f'{doctor.id},{busy.id}',
+            'start': self.start.isoformat(),
+            'end': (self.start + timedelta(days=1)).isoformat(),
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['slots'][0], '09:00')
+        calendar = {entry['doctor_id']: entry['days'] for entry in response.data['doctors']}
+        self.assertEqual(calendar[doctor.id][self.start.isoformat()], '01111110')
+        self.assertEqual(calendar[doctor.id][(self.start + timedelta(days=1)).isoformat()], '11111111')
+        self.assertEqual(calendar[busy.id][self.start.isoformat()], '00000000')
+
+    def test_month_for_fifty_doctors_uses_fixed_query_budget(self):
+        specialization = Specialization.objects.create(name='Psychology')
+        doctors = [make_doctor(name=f'Doctor {i}', specialization=specialization) for i in range(50)]
+        for i, doctor in enumerate(doctors):
+            make_appointment(doctor, self.start + timedelta(days=i % 30), time(10, 0))
+
+        # doctors, bookings, and every doctor's schedule in two queries
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/availability/', {
+                'doctors': ','.join(str(doctor.id) for doctor in doctors),
+                'start': self.start.isoformat(),
+                'end': (self.start + timedelta(days=29)).isoformat(),
+            })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['doctors']), 50)
+        self.assertEqual(len(response.data['doctors'][0]['days']), 30)
+
+    def test_rejects_oversized_range(self):
+        response = self.client.get('/api/availability/', {
+            'start': self.start.isoformat(),
+            'end': (self.start + timedelta(days=365)).isoformat(),
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+def next_weekday(weekday, after=None):
+    """The first date with the given weekday (0 is Monday) more than a week after `after` (default today)"""
+    day = (after or date.today()) + timedelta(days=8)
+    return day + timedelta(days=(weekday - day.weekday()) % 7)
+
+
+class ScheduleTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        # Weekdays 09:00-17:00 with lunch 12:00-13:00, half-hour slots
+        self.doctor = make_doctor(slot_minutes=30)
+        for weekday in range(5):
+            WorkingHours.objects.create(
+                doctor=self.doctor, weekday=weekday, start_time=time(9, 0), end_time=time(17, 0),
+                break_start=time(12, 0), break_end=time(13, 0)
+            )
+        self.tuesday = next_weekday(1)
+        self.saturday = next_weekday(5)
+
+    def slots(self, day):
+        response = self.client.get(f'/api/doctors/{self.doctor.id}/availability/', {'date': day.isoformat()})
+        return [slot['time'] for slot in response.data['time_slots']]
+
+    def check(self, day, slot):
+        return self.client.post('/api/check-availability/', {
+            'doctor_id': self.doctor.id, 'date': day.isoformat(), 'time': slot
+        }, format='json').data
+
+    def test_availability_follows_the_weekly_template(self):
+        slots = self.slots(self.tuesday)
+        self.assertEqual(len(slots), 14)
+        self.assertEqual((slots[0], slots[5], slots[6], slots[-1]), ('09:00', '11:30', '13:00', '16:30'))
+        self.assertEqual(self.slots(self.saturday), [])
+
+        # Template minus bookings, without reloading the schedule
+        make_appointment(self.doctor, self.tuesday, time(13, 0))
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/doctors/{self.doctor.id}/availability/', {'date': self.tuesday.isoformat()})
+        self.assertFalse(response.data['time_slots'][6]['available'])
+
+    def test_time_off_closes_the_days(self):
+        self.slots(self.tuesday)
+        TimeOff.objects.create(doctor=self.doctor, start_date=self.tuesday, end_date=self.tuesday + timedelta(days=1))
+        self.assertEqual(self.slots(self.tuesday), [])
+        self.assertEqual(self.slots(self.tuesday + timedelta(days=1)), [])
+        self.assertEqual(len(self.slots(self.tuesday + timedelta(days=2))), 14)
+        self.assertEqual(self.check(self.tuesday, '10:00')['reason'], 'Doctor is not working on this date')
+
+    def test_check_and_booking_refuse_times_outside_the_slots(self):
+        self.assertTrue(self.check(self.tuesday, '13:30')['available'])
+        self.assertEqual(self.check(self.tuesday, '12:00')['reason'], "Outside the doctor's working hours")
+        self.assertEqual(self.check(self.tuesday, '17:00')['reason'], "Outside the doctor's working hours")
+        self.assertEqual(self.check(self.saturday, '10:00')['reason'], 'Doctor is not working on this date')
+
+        payload = {
+            'doctor': self.doctor.id,
+            'patient_name': 'Jane Doe',
+            'patient_email': 'jane@example.com',
+            'patient_phone': '5551234',
+            'appointment_date': self.tuesday.isoformat(),
+            'appointment_time': '12:30',
+            'consultation_type': 'video',
+        }
+        response = self.client.post('/api/appointments/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('appointment_time', response.data)
+        payload['appointment_time'] = '13:30'
+        self.assertEqual(self.client.post('/api/appointments/', payload, format='json').status_code, 201)
+        self.assertFalse(self.check(self.tuesday, '13:30')['available'])
+
+    def test_calendar_bitmaps_run_over_each_doctors_grid(self):
+        default = make_doctor(name='Jones')
+        response = self.client.get('/api/availability/', {
+            'doctors': f'{self.doctor.id},{default.id}',
+            'start': self.saturday.isoformat(),
+            'end': (self.saturday + timedelta(days=3)).isoformat(),
+        })
+        calendar = {entry['doctor_id']: entry for entry in response.data['doctors']}
+        entry = calendar[self.doctor.id]
+        self.assertEqual((entry['slot_minutes'], len(entry['slots'])), (30, 14))
+        self.assertEqual(entry['days'][self.saturday.isoformat()], '0' * 14)
+        self.assertEqual(entry['days'][(self.saturday + timedelta(days=2)).isoformat()], '1' * 14)
+        self.assertEqual(calendar[default.id]['days'][self.saturday.isoformat()], '1' * 8)
+
+    def test_calendar_slot_minutes_without_monday_hours(self):
+        doctor = make_doctor(name='Weekend', slot_minutes=20)
+        WorkingHours.objects.create(doctor=doctor, weekday=5, start_time=time(9, 0), end_time=time(10, 0))
+        response = self.client.get('/api/availability/', {
+            'doctors': str(doctor.id),
+            'start': self.saturday.isoformat(),
+            'end': (self.saturday + timedelta(days=2)).isoformat(),
+        })
+        entry = response.data['doctors'][0]
+        self.assertEqual((entry['slot_minutes'], entry['slots']), (20, ['09:00', '09:20', '09:40']))
+        self.assertEqual(entry['days'][(self.saturday + timedelta(days=2)).isoformat()], '000')
+
+    def test_series_reports_days_off(self):
+        response = self.client.post('/api/appointments/series/', {
+            'doctor': self.doctor.id,
+            'patient_name': 'Jane Doe',
+            'patient_email': 'jane@example.com',
+            'patient_phone': '5551234',
+            'consultation_type': 'video',
+            'appointment_time': '10:00',
+            'start_date': self.saturday.isoformat(),
+            'occurrences': 2,
+        }, format='json')
+        self.assertEqual(response.status_code, 409)
+        conflict = response.data['conflicts'][0]
+        self.assertEqual(conflict['error'], 'Doctor is not working on this date')
+        self.assertEqual(conflict['suggestion'], {'date': self.saturday + timedelta(days=2), 'time': '09:00'})
+
+    def test_admin_edits_evict_the_compiled_schedule(self):
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'secret'))
+        self.assertEqual(len(self.slots(self.tuesday)), 14)
+
+        hours = list(WorkingHours.objects.filter(doctor=self.doctor).order_by('weekday'))
+        form = {
+            'name': self.doctor.name, 'specialization': self.doctor.specialization_id,
+            'years_experience': 10, 'bio': self.doctor.bio, 'consultation_modes': 'all',
+            'slot_minutes': 60, 'is_available': 'on', 'is_active': 'on',
+            'working_hours-TOTAL_FORMS': len(hours), 'working_hours-INITIAL_FORMS': len(hours),
+            'working_hours-MIN_NUM_FORMS': 0, 'working_hours-MAX_NUM_FORMS': 7,
+            'time_off-TOTAL_FORMS': 0, 'time_off-INITIAL_FORMS': 0,
+            'time_off-MIN_NUM_FORMS': 0, 'time_off-MAX_NUM_FORMS': 1000,
+        }
+        for index, row in enumerate(hours):
+            form.update({
+                f'working_hours-{index}-id': row.id, f'working_hours-{index}-doctor': self.doctor.id,
+                f'working_hours-{index}-weekday': row.weekday,
+                # Tuesdays become mornings only
+                f'working_hours-{index}-start_time': '09:00',
+                f'working_hours-{index}-end_time': '12:00' if row.weekday == 1 else '17:00',
+            })
+        response = self.client.post(f'/admin/api/doctor/{self.doctor.id}/change/', form)
+        self.assertEqual(response.status_code, 302)
+
+        self.assertEqual(self.slots(self.tuesday), ['09:00', '10:00', '11:00'])
+        self.assertEqual(len(self.slots(self.tuesday + timedelta(days=1))), 8)
+
+    def test_schedule_validation(self):
+        from django.core.exceptions import ValidationError
+        with self.assertRaises(ValidationError):
+            WorkingHours(doctor=self.doctor, weekday=5, start_time=time(9, 0), end_time=time(12, 0),
+                         break_start=time(13, 0), break_end=time(14, 0)).full_clean()
+        with self.assertRaises(ValidationError):
+            WorkingHours(doctor=self.doctor, weekday=5, start_time=time(9, 2), end_time=time(12, 0)).full_clean()
+        with self.assertRaises(ValidationError):
+            make_doctor(name='Odd', slot_minutes=7).full_clean()
+
+class SlotOccupancyTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.specialization = Specialization.objects.create(name='Psychology')
+        self.doctor = make_doctor(specialization=self.specialization)
+        self.day = date.today() + timedelta(days=2)
+
+    def mask(self, doctor=None, day=None):
+        row = SlotOccupancy.objects.filter(doctor=doctor or self.doctor, date=day or self.day).first()
+        return decode_mask(row.booked) if row else 0
+
+    def test_writes_keep_the_bitmask_in_step(self):
+        appointment = make_appointment(self.doctor, self.day, time(10, 0))
+        make_appointment(self.doctor, self.day, time(14, 30))
+        self.assertEqual(self.mask(), mask_from_times([time(10, 0), time(14, 30)]))
+
+        appointment.appointment_date = self.day + timedelta(days=1)
+        appointment.save()
+        self.assertEqual(self.mask(), mask_from_times([time(14, 30)]))
+        self.assertEqual(self.mask(day=self.day + timedelta(days=1)), mask_from_times([time(10, 0)]))
+
+        appointment.status = 'cancelled'
+        appointment.save()
+        self.assertEqual(self.mask(day=self.day + timedelta(days=1)), 0)
+
+        Appointment.objects.filter(appointment_time=time(14, 30)).delete()
+        self.assertEqual(self.mask(), 0)
+
+    def test_deleting_a_doctor_drops_its_occupancy(self):
+        make_appointment(self.doctor, self.day, time(10, 0))
+        self.doctor.delete()
+        self.assertFalse(SlotOccupancy.objects.exists())
+
+    def test_rebuild_matches_incremental_state(self):
+        for hour in (9, 11, 13):
+            make_appointment(self.doctor, self.day, time(hour, 0))
+        make_appointment(self.doctor, self.day, time(15, 0), status='cancelled')
+        expected = self.mask()
+
+        SlotOccupancy.objects.update(booked=b'')
+        self.assertEqual(rebuild_occupancy(batch_size=1), 1)
+        self.assertEqual(self.mask(), expected)
+
+    def test_unaligned_slots_are_rejected(self):
+        with self.assertRaises(ValueError):
+            generate_slots('09:02', '12:00', 60)
+        with self.assertRaises(ValueError):
+            generate_slots('09:00', '12:00', 7)
+
+    def test_available_days_skip_full_days(self):
+        for hour in range(9, 17):
+            make_appointment(self.doctor, self.day, time(hour, 0))
+        make_appointment(self.doctor, self.day + timedelta(days=1), time(9, 0))
+
+        # doctor, bookings and schedule
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/doctors/{self.doctor.id}/available-days/', {
+                'start': self.day.isoformat(), 'count': 2
+            })
+
+        self.assertEqual(response.status_code, 200)
+        days = response.data['days']
+        self.assertEqual([day['date'] for day in days], [self.day + timedelta(days=1), self.day + timedelta(days=2)])
+        self.assertEqual(days[0]['first_free'], '10:00')
+        self.assertEqual(len(days[0]['free_slots']), 7)
+        self.assertEqual(len(days[1]['free_slots']), 8)
+
+    def test_specialization_availability_intersects_doctors(self):
+        other = make_doctor(name='Jones', specialization=self.specialization)
+        make_doctor(name='Away', specialization=self.specialization, is_available=False)
+        make_appointment(self.doctor, self.day, time(9, 0))
+        make_appointment(other, self.day, time(10, 0))
+        make_appointment(other, self.day, time(9, 0), status='cancelled')
+
+        # specialization, doctors, schedules (two) and bookings
+        with self.assertNumQueries(5):
+            response = self.client.get(f'/api/specializations/{self.specialization.id}/availability/', {
+                'date': self.day.isoformat()
+            })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['doctor_count'], 2)
+        free = {slot['time']: slot['free_doctors'] for slot in response.data['slots']}
+        self.assertEqual((free['09:00'], free['10:00'], free['11:00']), (1, 1, 2))
+        self.assertEqual(response.data['shared_free_slots'][0], '11:00')
+        self.assertEqual(response.data['earliest_free'], '09:00')
+
+
+class BookingCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.specialization = Specialization.objects.create(name='Psychology')
+        self.doctor = make_doctor(specialization=self.specialization)
+        self.other = make_doctor(name='Jones')
+        self.day = date.today() + timedelta(days=2)
+
+    def counts(self):
+        return {
+            (row.doctor_id, row.date, row.status, row.consultation_type): row.count
+            for row in DailyBookingCount.objects.all()
+        }
+
+    def test_writes_keep_the_counts_in_step(self):
+        appointment = make_appointment(self.doctor, self.day, time(10, 0))
+        make_appointment(self.doctor, self.day, time(11, 0))
+        make_appointment(self.doctor, self.day, time(12, 0), consultation_type='phone')
+        self.assertEqual(self.counts(), {
+            (self.doctor.id, self.day, 'confirmed', 'video'): 2,
+            (self.doctor.id, self.day, 'confirmed', 'phone'): 1,
+        })
+
+        appointment.status = 'cancelled'
+        appointment.save()
+        later = self.day + timedelta(days=1)
+        Appointment.objects.get(appointment_time=time(12, 0)).delete()
+        moved = Appointment.objects.get(appointment_time=time(11, 0))
+        moved.appointment_date = later
+        moved.save()
+        self.assertEqual(self.counts(), {
+            (self.doctor.id, self.day, 'cancelled', 'video'): 1,
+            (self.doctor.id, later, 'confirmed', 'video'): 1,
+        })
+
+        self.doctor.delete()
+        self.assertFalse(DailyBookingCount.objects.exists())
+
+    def test_reconcile_repairs_drift(self):
+        for hour in (9, 10, 11):
+            make_appointment(self.doctor, self.day, time(hour, 0))
+        make_appointment(self.other, self.day, time(9, 0), status='completed')
+        expected = self.counts()
+
+        DailyBookingCount.objects.filter(doctor=self.doctor).update(count=7)
+        DailyBookingCount.objects.filter(doctor=self.other).delete()
+        DailyBookingCount.objects.create(
+            doctor=self.other, date=self.day, status='cancelled', consultation_type='phone', count=1
+        )
+
+        doctor_ids = [self.doctor.id, self.other.id]
+        self.assertEqual(reconcile_booking_counts(doctor_ids, batch_size=1, dry_run=True), (1, 1, 1))
+        self.assertNotEqual(self.counts(), expected)
+        self.assertEqual(reconcile_booking_counts(doctor_ids, batch_size=1), (1, 1, 1))
+        self.assertEqual(self.counts(), expected)
+        self.assertEqual(reconcile_booking_counts(doctor_ids), (0, 0, 0))
+
+    def test_stats_read_only_the_summary(self):
+        make_appointment(self.doctor, self.day, time(9, 0))
+        make_appointment(self.doctor, self.day, time(10, 0), status='cancelled', consultation_type='phone')
+        make_appointment(self.doctor, self.day + timedelta(days=1), time(9, 0), consultation_type='in_person')
+        make_appointment(self.other, self.day, time(9, 0))
+        make_appointment(self.other, self.day + timedelta(days=40), time(9, 0))
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/stats/bookings/', {'start': self.day.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['end'], self.day + timedelta(days=29))
+        self.assertEqual(response.data['totals']['total'], 4)
+        rows = {row['doctor_id']: row for row in response.data['rows']}
+        self.assertEqual(rows[self.doctor.id]['doctor_name'], 'Smith')
+        self.assertEqual(rows[self.doctor.id]['total'], 3)
+        self.assertEqual(rows[self.doctor.id]['by_status'], {'confirmed': 2, 'cancelled': 1, 'completed': 0})
+        self.assertEqual(rows[self.doctor.id]['by_type'], {'video': 1, 'phone': 1, 'in_person': 1})
+
+        response = self.client.get('/api/stats/bookings/', {
+            'start': self.day.isoformat(), 'group_by': 'date', 'specialization': self.specialization.id
+        })
+        self.assertEqual([(row['date'], row['total']) for row in response.data['rows']], [
+            (self.day, 2), (self.day + timedelta(days=1), 1)
+        ])
+
+        response = self.client.get('/api/stats/bookings/', {'group_by': 'doctor_date', 'doctor': self.other.id})
+        self.assertEqual([(row['doctor_id'], row['date']) for row in response.data['rows']], [(self.other.id, self.day)])
+
+    def test_stats_reject_bad_params(self):
+        for params in ({'group_by': 'week'}, {'start': '2026-02-30'}, {'start': '2026-03-02', 'end': '2026-03-01'},
+                       {'start': '2026-01-01', 'end': '2027-06-01'}):
+            self.assertEqual(self.client.get('/api/stats/bookings/', params).status_code, 400)
+
+
+class NextAvailableSlotsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.psychiatry = Specialization.objects.create(name='Psychiatry')
+        self.day = date.today() + timedelta(days=3)
+        self.video = make_doctor(name='Video', specialization=self.psychiatry, consultation_modes='online_only')
+        self.both = make_doctor(name='Both', specialization=self.psychiatry, consultation_modes='all')
+        make_doctor(name='Clinic', specialization=self.psychiatry, consultation_modes='in_person_only')
+        make_doctor(name='Other', specialization=Specialization.objects.create(name='Psychology'))
+
+    def search(self, **params):
+        params = {'specialization': self.psychiatry.id, 'consultation_type': 'video',
+                  'start': self.day.isoformat(), **params}
+        return self.client.get('/api/availability/next/', params)
+
+    def test_merges_matching_doctors_in_time_order(self):
+        make_appointment(self.video, self.day, time(9, 0))
+        make_appointment(self.both, self.day, time(10, 0))
+
+        # doctors, their schedules, then one chunk of bitmasks
+        with self.assertNumQueries(4):
+            response = self.search(limit=4)
+
+        self.assertEqual(response.status_code, 200)
+        found = [(slot['time'], slot['doctor_name']) for slot in response.data['slots']]
+        self.assertEqual(found, [('09:00', 'Both'), ('10:00', 'Video'), ('11:00', 'Video'), ('11:00', 'Both')])
+        self.assertTrue(all(slot['date'] == self.day for slot in response.data['slots']))
+
+    def test_window_bounds_are_respected(self):
+        response = self.search(start=f'{self.day.isoformat()}T15:30', end=self.day.isoformat(), limit=10)
+        self.assertEqual([slot['time'] for slot in response.data['slots']], ['16:00', '16:00'])
+
+    def test_search_widens_past_a_full_week(self):
+        for offset in range(8):
+            for hour in range(9, 17):
+                make_appointment(self.video, self.day + timedelta(days=offset), time(hour, 0))
+                make_appointment(self.both, self.day + timedelta(days=offset), time(hour, 0))
+
+        # doctors, schedules, then two chunks of bitmasks
+        with self.assertNumQueries(5):
+            response = self.search(limit=1)
+        self.assertEqual(response.data['slots'][0]['date'], self.day + timedelta(days=8))
+
+    def test_past_start_is_clamped_to_now(self):
+        response = self.search(start=(date.today() - timedelta(days=5)).isoformat())
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(response.data['slots'][0]['date'], date.today())
+
+    def test_rejects_bad_parameters(self):
+        self.assertEqual(self.search(consultation_type='carrier_pigeon').status_code, 400)
+        self.assertEqual(self.search(end=(self.day + timedelta(days=365)).isoformat()).status_code, 400)
+        self.assertEqual(self.search(limit=0).status_code, 400)
+
+
+class QueryCountTests(TestCase):
+    """Pin every endpoint to a constant number of queries regardless of row count"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = date.today() + timedelta(days=3)
+        specializations = [Specialization.objects.create(name=f'Specialty {i}') for i in range(3)]
+        cls.doctors = [
+            make_doctor(name=f'Doctor {i}', specialization=specializations[i % 3])
+            for i in range(6)
+        ]
+        cls.appointments = [
+            make_appointment(doctor, cls.day + timedelta(days=day), time(9 + hour, 0))
+            for doctor in cls.doctors
+            for day in range(2)
+            for hour in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        booked_slot_cache.clear()
+        doctor_cache.clear()
+        schedule_cache.clear()
+
+    def test_specialization_list(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/specializations/')
+        self.assertEqual(len(response.data), 3)
+
+    def test_doctor_list(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/doctors/')
+        self.assertEqual(len(response.data), 6)
+        self.assertTrue(all(doctor['specialization_name'] for doctor in response.data))
+
+    def test_doctor_detail(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/doctors/{self.doctors[0].id}/')
+        self.assertEqual(response.data['specialization_name'], 'Specialty 0')
+
+    def test_appointment_list(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/appointments/')
+        self.assertEqual(len(response.data['results']), 36)
+        self.assertTrue(all(appointment['doctor_specialization'] for appointment in response.data['results']))
+
+    def test_appointment_detail(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/appointments/{self.appointments[0].id}/')
+        self.assertEqual(response.data['doctor_name'], 'Doctor 0')
+
+    def test_appointment_create(self):
+        payload = {
+            'doctor': self.doctors[0].id,
+            'patient_name': 'New Patient',
+            'patient_email': 'new@example.com',
+            'patient_phone': '5550000',
+            'appointment_date': self.day.isoformat(),
+            'appointment_time': '15:00',
+            'consultation_type': 'phone',
+        }
+        # doctor lookup, schedule (two), savepoint, full_clean doctor check, insert,
+        # occupancy row insert, lock, day's bookings and update,
+        # day's counts, stored counts and update, release
+        with self.assertNumQueries(14):
+            response = self.client.post('/api/appointments/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['appointment']['doctor_specialization'], 'Specialty 0')
+
+    def test_appointment_cancel(self):
+        # fetch, savepoint, full_clean doctor check, update,
+        # occupancy row insert, lock, day's bookings and update,
+        # day's counts, stored counts, cancelled insert and confirmed update, release
+        with self.assertNumQueries(13):
+            response = self.client.delete(f'/api/appointments/{self.appointments[0].id}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_check_availability(self):
+        # doctor, schedule (two) and booked-slot lookups; repeats are served from the caches
+        with self.assertNumQueries(4):
+            response = self.client.post('/api/check-availability/', {
+                'doctor_id': self.doctors[0].id,
+                'date': self.day.isoformat(),
+                'time': '09:00',
+            }, format='json')
+        self.assertFalse(response.data['available'])
+
+
+class AdminChangelistTests(TestCase):
+    """The admin changelists cost the same number of queries for 10 rows or 100"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth.models import User
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        cls.day = date.today() + timedelta(days=3)
+        specializations = [Specialization.objects.create(name=f'Specialty {i}') for i in range(3)]
+        cls.doctors = [make_doctor(name=f'Doctor {i}', specialization=specializations[i % 3]) for i in range(6)]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        search_index.reset()
+
+    def book(self, days, first=0):
+        Appointment.objects.bulk_create([
+            Appointment(
+                doctor=doctor, patient_name='Jane Doe', patient_email='jane@example.com', patient_phone='5551234',
+                appointment_date=self.day + timedelta(days=day), appointment_time=time(9 + hour, 0),
+                consultation_type='video'
+            )
+            for doctor in self.doctors for day in range(first, first + days) for hour in range(2)
+        ])
+
+    def assert_constant_queries(self, url, params=None, expected=None):
+        counts = []
+        for first, days in ((0, 1), (1, 7)):
+            self.book(days, first)
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(captured))
+        self.assertEqual(counts[0], counts[1])
+        if expected is not None:
+            self.assertEqual(counts[0], expected)
+        return response
+
+    def test_appointment_changelist(self):
+        # session, user, date range, years, page count, page rows
+        response = self.assert_constant_queries('/admin/api/appointment/', expected=6)
+        self.assertContains(response, 'Dr. Doctor 0 - Specialty 0')
+        # The doctor filter renders an autocomplete box, not one link per doctor
+        self.assertContains(response, 'data-filter-param="doctor__id__exact"')
+        self.assertNotContains(response, '?doctor__id__exact=')
+
+    def test_appointment_changelist_filtered_by_doctor(self):
+        doctor = self.doctors[1]
+        response = self.assert_constant_queries('/admin/api/appointment/', {
+            'doctor__id__exact': doctor.id,
+            'appointment_date__year': self.day.year,
+            'appointment_date__month': self.day.month,
+        })
+        self.assertContains(response, f'<option value="{doctor.id}" selected>Dr. Doctor 1 - Specialty 1</option>', html=True)
+
+    def test_doctor_changelist_and_autocomplete(self):
+        self.assert_constant_queries('/admin/api/doctor/')
+        # session, user, search index build, count, doctors with their specializations
+        with self.assertNumQueries(5):
+            response = self.client.get('/admin/autocomplete/', {
+                'term': 'doctor', 'app_label': 'api', 'model_name': 'appointment', 'field_name': 'doctor'
+            })
+        self.assertEqual(len(response.json()['results']), 6)
+        self.assertIn('Specialty', response.json()['results'][0]['text'])
+
+    def test_large_results_use_the_planner_estimate(self):
+        from unittest import mock
+        from .pagination import EstimatedCountPaginator
+        self.book(1)
+        appointments = Appointment.objects.order_by('id')
+        # No estimates outside Postgres: counted exactly
+        self.assertEqual(EstimatedCountPaginator(appointments, 100).count, 12)
+        with mock.patch('api.pagination.estimated_count', return_value=5_000_000), self.assertNumQueries(0):
+            self.assertEqual(EstimatedCountPaginator(appointments, 100).count, 5_000_000)
+        with mock.patch('api.pagination.estimated_count', return_value=50):
+            self.assertEqual(EstimatedCountPaginator(appointments, 100).count, 12)
+
+
+class FastReadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = make_doctor(name='Dr. Zoë Ångström')
+        make_doctor(name='Jones', consultation_modes='video')
+        day = date.today() + timedelta(days=1)
+        make_appointment(cls.doctor, day, time(9, 0), patient_name='José Niño', notes='Line\u2028separator "quoted"')
+        make_appointment(cls.doctor, day, time(10, 0), consultation_type='phone')
+        make_appointment(cls.doctor, day + timedelta(days=1), time(9, 30), notes='')
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    def test_appointment_reads_match_the_model_serializer(self):
+        from rest_framework.renderers import JSONRenderer
+        appointments = Appointment.objects.select_related('doctor__specialization').order_by(
+            'appointment_date', 'appointment_time', 'id'
+        )
+        expected = JSONRenderer().render({'next': None, 'results': AppointmentSerializer(appointments, many=True).data})
+        self.assertEqual(self.client.get('/api/appointments/').content, expected)
+        self.assertEqual(self.client.get('/api/async/appointments/').content, expected)
+
+        first = appointments[0]
+        response = self.client.get(f'/api/appointments/{first.id}/')
+        self.assertEqual(response.content, JSONRenderer().render(AppointmentSerializer(first).data))
+
+        response = self.client.get('/api/appointments/', {'stream': 'true'})
+        self.assertEqual(b''.join(response.streaming_content), JSONRenderer().render(AppointmentSerializer(appointments, many=True).data))
+
+        from django.utils import timezone as tz
+        from .serializers import appointment_reader
+        with tz.override('Asia/Kolkata'):
+            rows = appointment_reader.values(appointments)
+            self.assertEqual(appointment_reader.serialize(rows), AppointmentSerializer(appointments, many=True).data)
+
+    def test_doctor_reads_match_the_model_serializer(self):
+        from rest_framework.renderers import JSONRenderer
+        doctors = Doctor.objects.filter(is_active=True).select_related('specialization')
+        self.assertEqual(self.client.get('/api/doctors/').content, JSONRenderer().render(DoctorSerializer(doctors, many=True).data))
+        response = self.client.get(f'/api/doctors/{self.doctor.id}/')
+        self.assertEqual(response.content, JSONRenderer().render(DoctorSerializer(self.doctor).data))
+        self.assertEqual(self.client.get('/api/doctors/999999/').status_code, 404)
+
+    def test_renderer_matches_the_stock_renderer(self):
+        from decimal import Decimal
+        from django.utils import timezone as tz
+        from django.utils.translation import gettext_lazy
+        from rest_framework.renderers import JSONRenderer
+        from .renderers import FastJSONRenderer
+
+        data = {
+            'when': tz.now(), 'day': date(2026, 1, 2), 'at': time(9, 30, 15, 250000),
+            'amount': Decimal('12.50'), 'lazy': gettext_lazy('Not found.'), 1: [True, None, 0.25, 'ü\u2029'],
+            'nested': {'ids': (1, 2), 'empty': {}},
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+        # Indented output (browsable API) is left to the stock renderer
+        indented = FastJSONRenderer().render(data, 'application/json; indent=2')
+        self.assertEqual(indented, JSONRenderer().render(data, 'application/json; indent=2'))
+
+
+class AppointmentPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = date.today() + timedelta(days=1)
+        doctors = [make_doctor(name=f'Doctor {i}') for i in range(3)]
+        for day in range(5):
+            for doctor in doctors:
+                for hour in range(9, 13):
+                    make_appointment(doctor, cls.day + timedelta(days=day), time(hour, 0))
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_cursor_walks_every_row_once_in_order(self):
+        seen = []
+        url, params = '/api/appointments/', {'page_size': 7}
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url, params)
+            self.assertLessEqual(len(response.data['results']), 7)
+            seen.extend(response.data['results'])
+            url, params = response.data['next'], None
+
+        self.assertEqual(len(seen), 60)
+        self.assertEqual(len({appointment['id'] for appointment in seen}), 60)
+        keys = [(a['appointment_date'], a['appointment_time'], a['id']) for a in seen]
+        self.assertEqual(keys, sorted(keys))
+
+    def test_page_size_is_bounded(self):
+        with self.settings(APPOINTMENT_MAX_PAGE_SIZE=10):
+            response = self.client.get('/api/appointments/', {'page_size': 1000})
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/appointments/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_streaming_export_matches_paginated_rows(self):
+        with self.settings(APPOINTMENT_STREAM_CHUNK_SIZE=8):
+            response = self.client.get('/api/appointments/', {'stream': 'true'})
+            body = b''.join(response.streaming_content)
+
+        self.assertTrue(response.streaming)
+        rows = json.loads(body)
+        self.assertEqual(len(rows), 60)
+        paged = self.client.get('/api/appointments/', {'page_size': 60}).data['results']
+        self.assertEqual([row['id'] for row in rows], [row['id'] for row in paged])
+        self.assertEqual(rows[0]['doctor_name'], paged[0]['doctor_name'])
+
+
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = make_doctor()
+        cls.old = date.today() - timedelta(days=400)
+        cls.recent = date.today() - timedelta(days=10)
+        cls.upcoming = date.today() + timedelta(days=1)
+        # Past appointments only arrive in bulk (save() refuses past dates)
+        history = [(cls.old, hour, 'completed') for hour in range(9, 13)] + [
+            (cls.old, 13, 'cancelled'), (cls.old, 14, 'confirmed'), (cls.recent, 9, 'completed')
+        ]
+        Appointment.objects.bulk_create([
+            Appointment(
+                doctor=cls.doctor, appointment_date=day, appointment_time=time(hour, 0), status=status,
+                patient_name='Jane Doe', patient_email='jane@example.com', patient_phone='5551234',
+                consultation_type='video'
+            )
+            for day, hour, status in history
+        ])
+        reconcile_booking_counts([cls.doctor.id])
+        make_appointment(cls.doctor, cls.upcoming, time(9, 0))
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def counts(self):
+        return sorted(DailyBookingCount.objects.values_list('doctor_id', 'date', 'status', 'consultation_type', 'count'))
+
+    def test_moves_only_old_finished_appointments(self):
+        counts = self.counts()
+        ids = set(Appointment.objects.values_list('id', flat=True))
+
+        self.assertEqual(archive_appointments(batch_size=2), 5)
+        self.assertEqual(archive_appointments(batch_size=2), 0)
+
+        archived = ArchivedAppointment.objects.all()
+        self.assertEqual({row.status for row in archived}, {'completed', 'cancelled'})
+        self.assertEqual({row.appointment_date for row in archived}, {self.old})
+        self.assertEqual(set(Appointment.objects.values_list('status', flat=True)), {'confirmed', 'completed'})
+        self.assertEqual(ids, set(Appointment.objects.values_list('id', flat=True)) | {row.id for row in archived})
+        # Booking counts still include the archived history, also after a recount
+        self.assertEqual(self.counts(), counts)
+        reconcile_booking_counts([self.doctor.id])
+        self.assertEqual(self.counts(), counts)
+
+    def test_series_link_is_kept(self):
+        series = AppointmentSeries.objects.create(
+            doctor=self.doctor, patient_name='Jane Doe', patient_email='jane@example.com', patient_phone='5551234',
+            consultation_type='video', appointment_time=time(15, 0)
+        )
+        Appointment.objects.bulk_create([Appointment(
+            doctor=self.doctor, appointment_date=self.old, appointment_time=time(15, 0), status='completed',
+            patient_name='Jane Doe', patient_email='jane@example.com', patient_phone='5551234',
+            consultation_type='video', series=series
+        )])
+        archive_appointments()
+        self.assertEqual(list(series.archived_appointments.values_list('appointment_time', flat=True)), [time(15, 0)])
+
+    def test_max_batches_and_command(self):
+        self.assertEqual(archive_appointments(batch_size=2, max_batches=1), 2)
+        out = io.StringIO()
+        call_command('archive_appointments', '--dry-run', stdout=out)
+        self.assertIn('Would archive 3 appointments', out.getvalue())
+        call_command('archive_appointments', '--older-than-days', '5', stdout=out)
+        self.assertIn('Archived 4 appointments', out.getvalue())
+        self.assertEqual(ArchivedAppointment.objects.count(), 6)
+
+    def test_reads_span_both_tables_on_request(self):
+        live = self.client.get('/api/appointments/', {'page_size': 100}).data['results']
+        archive_appointments()
+        archived_id = ArchivedAppointment.objects.values_list('id', flat=True).first()
+
+        self.assertEqual(len(self.client.get('/api/appointments/').data['results']), 3)
+        self.assertEqual(self.client.get(f'/api/appointments/{archived_id}/').status_code, 404)
+        response = self.client.get(f'/api/appointments/{archived_id}/', {'include_archived': 'true'})
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual(response.data['doctor_name'], self.doctor.name)
+
+        seen = []
+        url, params = '/api/appointments/', {'include_archived': 'true', 'page_size': 4}
+        while url:
+            with self.assertNumQueries(2):
+                response = self.client.get(url, params)
+            seen.extend(response.data['results'])
+            url, params = response.data['next'], None
+        self.assertEqual(seen, live)
+
+        with self.settings(APPOINTMENT_STREAM_CHUNK_SIZE=3):
+            response = self.client.get('/api/appointments/', {'include_archived': 'true', 'stream': 'true'})
+            rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([row['id'] for row in rows], [row['id'] for row in live])
+
+
+    async def test_async_list_spans_both_tables_on_request(self):
+        from asgiref.sync import sync_to_async
+        from unittest import mock
+        # The streams pick their database on the event loop thread, outside the
+        # test's transaction; with replicas configured, keep it on default
+        self.enterContext(mock.patch('api.routers.choose_replica', return_value='default'))
+        await sync_to_async(archive_appointments)()
+        response = await sync_to_async(self.client.get)('/api/appointments/', {'include_archived': 'true', 'page_size': 100})
+        ids = [row['id'] for row in response.data['results']]
+        self.assertEqual(len(ids), 8)
+
+        seen = []
+        url, params = '/api/async/appointments/', {'include_archived': 'true', 'page_size': 3}
+        while url:
+            response = await self.async_client.get(url, params)
+            seen.extend(row['id'] for row in response.json()['results'])
+            url, params = response.json()['next'], None
+        self.assertEqual(seen, ids)
+
+        with self.settings(APPOINTMENT_STREAM_CHUNK_SIZE=3):
+            response = await self.async_client.get('/api/async/appointments/', {'include_archived': 'true', 'stream': 'true'})
+            rows = json.loads(b''.join([chunk async for chunk in response.streaming_content]))
+            self.assertEqual([row['id'] for row in rows], ids)
+            response = await self.async_client.get('/api/async/appointments/', {'stream': 'true'})
+            rows = json.loads(b''.join([chunk async for chunk in response.streaming_content]))
+            self.assertEqual(len(rows), 3)
+
+
+class BookingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.doctor = make_doctor()
+        self.day = date.today() + timedelta(days=3)
+
+    def book(self, appointment_time='10:00', **kwargs):
+        payload = {
+            'doctor': self.doctor.id,
+            'patient_name': 'New Patient',
+            'patient_email': 'new@example.com',
+            'patient_phone': '5550000',
+            'appointment_date': self.day.isoformat(),
+            'appointment_time': appointment_time,
+            'consultation_type': 'video',
+        }
+        payload.update(kwargs)
+        return self.client.post('/api/appointments/', payload, format='json')
+
+    def test_double_booking_is_rejected(self):
+        self.assertEqual(self.book().status_code, 201)
+        response = self.book()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'This time slot is already booked')
+
+    def test_cancelled_slot_can_be_rebooked(self):
+        appointment_id = self.book().data['appointment_id']
+        self.client.delete(f'/api/appointments/{appointment_id}/')
+        self.assertEqual(self.book().status_code, 201)
+        self.assertEqual(Appointment.objects.filter(appointment_date=self.day).count(), 2)
+
+    def test_reschedule_onto_booked_slot_is_rejected(self):
+        self.book('10:00')
+        appointment_id = self.book('11:00').data['appointment_id']
+        response = self.client.put(f'/api/appointments/{appointment_id}/', {
+            'doctor': self.doctor.id,
+            'patient_name': 'New Patient',
+            'patient_email': 'new@example.com',
+            'patient_phone': '5550000',
+            'appointment_date': self.day.isoformat(),
+            'appointment_time': '10:00',
+            'consultation_type': 'video',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Appointment.objects.get(id=appointment_id).appointment_time, time(11, 0))
+
+
+class BatchChangeTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.sick = make_doctor(name='Sick')
+        self.cover = make_doctor(name='Cover')
+        self.day = date.today() + timedelta(days=2)
+
+    def mask(self, doctor, day=None):
+        row = SlotOccupancy.objects.filter(doctor=doctor, date=day or self.day).first()
+        return decode_mask(row.booked) if row else 0
+
+    def assert_summaries_in_step(self):
+        self.assertEqual(reconcile_booking_counts([self.sick.id, self.cover.id], dry_run=True), (0, 0, 0))
+        masks = {(row.doctor_id, row.date): decode_mask(row.booked) for row in SlotOccupancy.objects.all()}
+        rebuild_occupancy()
+        self.assertEqual(
+            {(row.doctor_id, row.date): decode_mask(row.booked) for row in SlotOccupancy.objects.all()},
+            {key: mask for key, mask in masks.items() if mask}
+        )
+
+    def test_cancel_a_doctors_range(self):
+        for offset in range(3):
+            make_appointment(self.sick, self.day + timedelta(days=offset), time(9, 0))
+        make_appointment(self.sick, self.day + timedelta(days=5), time(9, 0))
+        make_appointment(self.sick, self.day, time(10, 0), status='cancelled')
+        make_appointment(self.cover, self.day, time(9, 0))
+
+        # doctor check, savepoint, locking read, update, occupancy refresh (insert, lock,
+        # bookings, update) and count refresh (counts, stored, delete, insert, update), release
+        with self.assertNumQueries(14):
+            response = self.client.post('/api/appointments/batch/cancel/', {
+                'doctor': self.sick.id,
+                'start_date': self.day.isoformat(),
+                'end_date': (self.day + timedelta(days=2)).isoformat()
+            }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['cancelled'], 3)
+        self.assertEqual([result['date'] for result in response.data['results']], [
+            self.day + timedelta(days=offset) for offset in range(3)
+        ])
+        self.assertEqual(Appointment.objects.filter(doctor=self.sick, status='confirmed').count(), 1)
+        self.assertEqual(self.mask(self.sick), 0)
+        self.assertEqual(self.mask(self.cover), mask_from_times([time(9, 0)]))
+        self.assert_summaries_in_step()
+
+    def test_reschedule_onto_free_slots(self):
+        moved = [make_appointment(self.sick, self.day, time(hour, 0)) for hour in (9, 10, 11)]
+        make_appointment(self.cover, self.day, time(10, 0))
+        phone_only = make_doctor(name='Phone', consultation_modes='phone_only')
+        cancelled = make_appointment(self.sick, self.day, time(12, 0), status='cancelled')
+
+        response = self.client.post('/api/appointments/batch/reschedule/', {
+            'doctor': self.cover.id,
+            'appointment_ids': [appointment.id for appointment in moved] + [cancelled.id, 0],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['rescheduled'], response.data['failed']), (3, 2))
+        results = response.data['results']
+        # 10:00 is taken, so it moves to 11:00, which pushes the 11:00 booking to noon
+        self.assertEqual([result['to']['time'] for result in results[:3]], ['09:00', '11:00', '12:00'])
+        self.assertEqual(results[0]['from'], {
+            'appointment_id': moved[0].id, 'doctor_id': self.sick.id, 'date': self.day, 'time': '09:00'
+        })
+        self.assertEqual(results[3]['error'], 'Only confirmed appointments can be rescheduled, not cancelled ones')
+        self.assertEqual(results[4]['error'], 'Appointment not found')
+        self.assertEqual(self.mask(self.sick), 0)
+        self.assertEqual(self.mask(self.cover), mask_from_times([time(hour, 0) for hour in (9, 10, 11, 12)]))
+        self.assert_summaries_in_step()
+
+        response = self.client.post('/api/appointments/batch/reschedule/', {
+            'doctor': phone_only.id, 'appointment_ids': [moved[0].id]
+        }, format='json')
+        self.assertEqual(response.data['results'][0]['error'], 'Doctor does not support video consultations')
+
+    def test_reschedule_can_keep_times_only(self):
+        kept = make_appointment(self.sick, self.day, time(9, 0))
+        clash = make_appointment(self.sick, self.day, time(10, 0))
+        make_appointment(self.cover, self.day, time(10, 0))
+
+        response = self.client.post('/api/appointments/batch/reschedule/', {
+            'doctor': self.cover.id, 'appointment_ids': [kept.id, clash.id], 'find_next': False
+        }, format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], ['rescheduled', 'failed'])
+        clash.refresh_from_db()
+        self.assertEqual((clash.doctor_id, clash.appointment_time), (self.sick.id, time(10, 0)))
+
+    def test_reschedule_queries_do_not_grow_with_the_batch(self):
+        counts = []
+        for hours in ((9,), (10, 11, 12, 13, 14)):
+            ids = [make_appointment(self.sick, self.day, time(hour, 0)).id for hour in hours]
+            schedule_cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.post('/api/appointments/batch/reschedule/', {
+                    'doctor': self.cover.id, 'appointment_ids': ids
+                }, format='json')
+            self.assertEqual(response.data['rescheduled'], len(hours))
+            counts.append(len(captured))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_bad_requests(self):
+        post = lambda url, payload: self.client.post(url, payload, format='json').status_code
+        self.assertEqual(post('/api/appointments/batch/cancel/', {'doctor': self.sick.id}), 400)
+        self.assertEqual(post('/api/appointments/batch/cancel/', {'doctor': 0, 'start_date': '2030-01-01'}), 404)
+        self.assertEqual(post('/api/appointments/batch/reschedule/', {'doctor': self.cover.id, 'appointment_ids': []}), 400)
+        self.assertEqual(post('/api/appointments/batch/reschedule/', {'doctor': self.cover.id, 'appointment_ids': 'x'}), 400)
+        self.assertEqual(post('/api/appointments/batch/reschedule/', {'doctor': 0, 'appointment_ids': [1]}), 404)
+
+
+
+class SeriesTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.doctor = make_doctor()
+        # A Tuesday over a week away, so every occurrence is in the future
+        self.start = date.today() + timedelta(days=7)
+        self.start += timedelta(days=(1 - self.start.weekday()) % 7)
+
+    def book(self, occurrences=12, **payload):
+        return self.client.post('/api/appointments/series/', dict({
+            'doctor': self.doctor.id,
+            'patient_name': 'Jane Doe',
+            'patient_email': 'jane@example.com',
+            'patient_phone': '5551234',
+            'consultation_type': 'video',
+            'appointment_time': '10:00',
+            'start_date': self.start.isoformat(),
+            'weekday': 'tuesday',
+            'occurrences': occurrences,
+        }, **payload), format='json')
+
+    def week(self, index, days=0):
+        return self.start + timedelta(weeks=index, days=days)
+
+    def mask(self, day):
+        row = SlotOccupancy.objects.filter(doctor=self.doctor, date=day).first()
+        return decode_mask(row.booked) if row else 0
+
+    def assert_summaries_in_step(self):
+        self.assertEqual(reconcile_booking_counts([self.doctor.id], dry_run=True), (0, 0, 0))
+        masks = {(row.doctor_id, row.date): decode_mask(row.booked) for row in SlotOccupancy.objects.all()}
+        rebuild_occupancy()
+        self.assertEqual(
+            {(row.doctor_id, row.date): decode_mask(row.booked) for row in SlotOccupancy.objects.all()},
+            {key: mask for key, mask in masks.items() if mask}
+        )
+
+    def test_book_every_tuesday_for_twelve_weeks(self):
+        response = self.book(start_date=(self.start - timedelta(days=3)).isoformat())
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['message'], 'Booked 12 of 12 occurrences')
+        self.assertEqual(response.data['skipped'], [])
+        self.assertEqual(
+            [appointment['appointment_date'] for appointment in response.data['appointments']],
+            [self.week(index).isoformat() for index in range(12)]
+        )
+        series = AppointmentSeries.objects.get(id=response.data['series']['id'])
+        self.assertEqual(series.appointments.filter(status='confirmed', appointment_time=time(10, 0)).count(), 12)
+        self.assertEqual(self.mask(self.week(11)), mask_from_times([time(10, 0)]))
+        self.assert_summaries_in_step()
+
+        detail = self.client.get(f'/api/appointments/series/{series.id}/')
+        self.assertEqual(detail.data['series']['interval_weeks'], 1)
+        self.assertEqual(len(detail.data['appointments']), 12)
+
+    def test_booking_queries_do_not_grow_with_the_series(self):
+        counts = []
+        for occurrences, doctor in ((2, self.doctor), (12, make_doctor(name='Jones'))):
+            with CaptureQueriesContext(connection) as captured:
+                response = self.book(occurrences, doctor=doctor.id)
+            self.assertEqual(response.status_code, 201)
+            counts.append(len(captured))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_conflicts_are_reported_with_suggestions(self):
+        make_appointment(self.doctor, self.week(1), time(10, 0))
+        for hour in (9, 10, 11):
+            make_appointment(self.doctor, self.week(2), time(hour, 0))
+        for hour in range(9, 17):
+            make_appointment(self.doctor, self.week(3), time(hour, 0))
+
+        response = self.book(occurrences=5)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['error'], '3 of 5 occurrences are unavailable')
+        self.assertEqual(
+            [(conflict['date'], conflict['suggestion']) for conflict in response.data['conflicts']],
+            [
+                (self.week(1), {'date': self.week(1), 'time': '09:00'}),
+                (self.week(2), {'date': self.week(2), 'time': '12:00'}),
+                # A full day suggests the next free slot before the next occurrence
+                (self.week(3), {'date': self.week(3, days=1), 'time': '09:00'}),
+            ]
+        )
+        self.assertFalse(AppointmentSeries.objects.exists())
+        self.assertFalse(Appointment.objects.filter(series__isnull=False).exists())
+
+        response = self.book(occurrences=5, skip_conflicts=True)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['message'], 'Booked 2 of 5 occurrences')
+        self.assertEqual(len(response.data['skipped']), 3)
+        self.assert_summaries_in_step()
+
+    def test_cancel_the_rest_of_a_series(self):
+        series_id = self.book(occurrences=4).data['series']['id']
+
+        response = self.client.post(f'/api/appointments/series/{series_id}/cancel/', {
+            'from_date': self.week(2).isoformat()
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['date'] for result in response.data['results']], [self.week(2), self.week(3)])
+        self.assertEqual(self.mask(self.week(1)), mask_from_times([time(10, 0)]))
+        self.assertEqual(self.mask(self.week(3)), 0)
+        self.assert_summaries_in_step()
+
+    def test_reschedule_a_series(self):
+        series_id = self.book(occurrences=3).data['series']['id']
+        make_appointment(self.doctor, self.week(1, days=2), time(14, 0))
+
+        move = {'appointment_time': '14:00', 'shift_days': 2}
+        response = self.client.post(f'/api/appointments/series/{series_id}/reschedule/', move, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['conflicts'], [{
+            'date': self.week(1, days=2), 'time': '14:00',
+            'error': 'This time slot is already booked',
+            'suggestion': {'date': self.week(1, days=2), 'time': '13:00'},
+        }])
+        self.assertEqual(self.mask(self.week(0)), mask_from_times([time(10, 0)]))
+
+        move['appointment_time'] = '15:00'
+        response = self.client.post(f'/api/appointments/series/{series_id}/reschedule/', move, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['rescheduled'], 3)
+        self.assertEqual(response.data['results'][0]['to']['date'], self.week(0, days=2))
+        self.assertEqual(self.mask(self.week(0)), 0)
+        self.assertEqual(self.mask(self.week(1, days=2)), mask_from_times([time(14, 0), time(15, 0)]))
+        self.assertEqual(AppointmentSeries.objects.get(id=series_id).appointment_time, time(15, 0))
+        self.assert_summaries_in_step()
+
+        # Only the time changes: the occurrences' own cells count as free
+        response = self.client.post(f'/api/appointments/series/{series_id}/reschedule/', {
+            'appointment_time': '16:00'
+        }, format='json')
+        self.assertEqual(response.data['rescheduled'], 3)
+
+    def test_bad_requests(self):
+        series_id = self.book(occurrences=2).data['series']['id']
+        self.assertEqual(self.book(occurrences=53).status_code, 400)
+        self.assertEqual(self.book(weekday='someday').status_code, 400)
+        self.assertEqual(self.book(consultation_type='fax').status_code, 400)
+        post = lambda url, payload: self.client.post(url, payload, format='json').status_code
+        reschedule = f'/api/appointments/series/{series_id}/reschedule/'
+        self.assertEqual(post(reschedule, {'shift_days': 7}), 400)
+        self.assertEqual(post(reschedule, {'appointment_time': '10:00'}), 400)
+        self.assertEqual(post(reschedule, {'appointment_time': 'ten'}), 400)
+        self.assertEqual(post(f'/api/appointments/series/{series_id}/cancel/', {'from_date': 'x'}), 400)
+        self.assertEqual(post('/api/appointments/series/0/cancel/', {}), 404)
+
+# The in-memory test database reports lock conflicts at once instead of waiting
+# out a busy timeout, so sixteen writers lean on the retries more than usual
+class ConcurrentBookingTests(TransactionTestCase):
+    workers = 16
+    attempts = 64
+
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.day = date.today() + timedelta(days=3)
+
+    def hammer(self, slot_for):
+        """POST `attempts` bookings from a pool of threads released together and time them"""
+        run = run_contention([{
+            'doctor': self.doctor.id,
+            'patient_name': f'Patient {index}',
+            'patient_email': f'patient{index}@example.com',
+            'patient_phone': '5550000',
+            'appointment_date': self.day.isoformat(),
+            'appointment_time': slot_for(index),
+            'consultation_type': 'video',
+        } for index in range(self.attempts)], workers=self.workers)
+        self.assertEqual(run['attempts'], self.attempts)
+        self.assertGreater(run['duration_s'], 0)
+        self.assertGreater(run['bookings_per_second'], 0)
+        return run['status_codes']
+
+    def test_exactly_one_booking_wins_a_contended_slot(self):
+        codes = self.hammer(lambda index: '10:00')
+        self.assertEqual(codes, {201: 1, 400: self.attempts - 1})
+        self.assertEqual(Appointment.objects.filter(doctor=self.doctor, status='confirmed').count(), 1)
+
+    # Quarter-hour slots from midnight, so the 64 bookings are all on the grid
+    @override_settings(APPOINTMENT_DAY_START='00:00', APPOINTMENT_DAY_END='16:00', APPOINTMENT_SLOT_MINUTES=15)
+    def test_distinct_slots_do_not_block_each_other(self):
+        codes = self.hammer(lambda index: f'{index // 4:02d}:{index % 4 * 15:02d}')
+        self.assertEqual(codes, {201: self.attempts})
+        self.assertEqual(Appointment.objects.filter(doctor=self.doctor).count(), self.attempts)
+        # Every concurrent booking landed in the day's bitmask; none overwrote another
+        booked = Appointment.objects.filter(doctor=self.doctor).values_list('appointment_time', flat=True)
+        occupancy = SlotOccupancy.objects.get(doctor=self.doctor, date=self.day)
+        self.assertEqual(decode_mask(occupancy.booked), mask_from_times(booked))
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.doctor = make_doctor()
+
+    def test_repeat_reads_skip_the_database(self):
+        self.client.get('/api/doctors/')
+        self.client.get(f'/api/doctors/{self.doctor.id}/')
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.client.get('/api/doctors/').data), 1)
+            self.assertEqual(self.client.get(f'/api/doctors/{self.doctor.id}/').data['name'], 'Smith')
+
+    def test_query_params_are_cached_separately(self):
+        other = Specialization.objects.create(name='Counselling')
+        make_doctor(name='Jones', specialization=other)
+        self.assertEqual(len(self.client.get('/api/doctors/').data), 2)
+        self.assertEqual(len(self.client.get('/api/doctors/', {'specialization': other.id}).data), 1)
+
+    def test_saving_a_doctor_invalidates_the_catalog(self):
+        etag = self.client.get('/api/doctors/')['ETag']
+        self.doctor.name = 'Renamed'
+        self.doctor.save()
+
+        response = self.client.get('/api/doctors/')
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data[0]['name'], 'Renamed')
+
+    def test_read_during_the_write_transaction_is_replaced_after_commit(self):
+        stale = self.client.get('/api/doctors/').data
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.name = 'Renamed'
+            self.doctor.save()
+            # A concurrent reader cannot see the uncommitted rename and caches
+            # the old payload under the version the save just started
+            catalog_response(Request(RequestFactory().get('/api/doctors/')), 'doctors', lambda: stale)
+
+        self.assertEqual(self.client.get('/api/doctors/').data[0]['name'], 'Renamed')
+
+    def test_deleting_a_specialization_invalidates_the_catalog(self):
+        other = Specialization.objects.create(name='Counselling')
+        self.assertEqual(len(self.client.get('/api/specializations/').data), 2)
+        other.delete()
+        self.assertEqual(len(self.client.get('/api/specializations/').data), 1)
+
+    def test_conditional_requests_return_304(self):
+        response = self.client.get('/api/specializations/')
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(0):
+            revalidated = self.client.get('/api/specializations/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+        revalidated = self.client.get('/api/specializations/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_missing_doctor_is_not_cached(self):
+        self.assertEqual(self.client.get('/api/doctors/999/').status_code, 404)
+
+
+class TTLCacheTests(TestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        slot_cache = TTLCache(max_entries=2, ttl=60)
+        slot_cache.get_or_load('a', lambda: 1)
+        slot_cache.get_or_load('b', lambda: 2)
+        slot_cache.get_or_load('a', lambda: 1)
+        slot_cache.get_or_load('c', lambda: 3)
+
+        self.assertEqual(slot_cache.get_or_load('a', lambda: 'reloaded'), 1)
+        self.assertEqual(slot_cache.get_or_load('b', lambda: 'reloaded'), 'reloaded')
+        self.assertEqual(slot_cache.stats()['evictions'], 2)
+
+    def test_expired_entry_is_reloaded(self):
+        slot_cache = TTLCache(max_entries=10, ttl=0)
+        slot_cache.get_or_load('a', lambda: 1)
+        self.assertEqual(slot_cache.get_or_load('a', lambda: 2), 2)
+        self.assertEqual(slot_cache.stats()['misses'], 2)
+
+    def test_load_racing_an_eviction_is_not_stored(self):
+        slot_cache = TTLCache(max_entries=10, ttl=60)
+
+        def stale_load():
+            slot_cache.evict('a')
+            return 'stale'
+
+        slot_cache.get_or_load('a', stale_load)
+        self.assertEqual(slot_cache.get_or_load('a', lambda: 'fresh'), 'fresh')
+
+
+class CheckAvailabilityCacheTests(TestCase):
+    def setUp(self):
+        booked_slot_cache.clear()
+        doctor_cache.clear()
+        self.client = APIClient()
+        self.doctor = make_doctor()
+        self.day = date.today() + timedelta(days=2)
+
+    def check(self, slot='10:00'):
+        return self.client.post('/api/check-availability/', {
+            'doctor_id': self.doctor.id,
+            'date': self.day.isoformat(),
+            'time': slot,
+        }, format='json').data
+
+    def book(self, slot='10:00'):
+        return self.client.post('/api/appointments/', {
+            'doctor': self.doctor.id,
+            'patient_name': 'New Patient',
+            'patient_email': 'new@example.com',
+            'patient_phone': '5550000',
+            'appointment_date': self.day.isoformat(),
+            'appointment_time': slot,
+            'consultation_type': 'video',
+        }, format='json').data
+
+    def test_repeat_checks_cost_no_queries(self):
+        self.check('10:00')
+        with self.assertNumQueries(0):
+            self.assertTrue(self.check('10:00')['available'])
+            self.assertTrue(self.check('11:00')['available'])
+        self.assertEqual(booked_slot_cache.stats()['hits'], 2)
+
+    def test_booking_and_cancelling_update_the_cached_day(self):
+        self.assertTrue(self.check()['available'])
+        appointment_id = self.book()['appointment_id']
+        self.assertFalse(self.check()['available'])
+
+        self.client.delete(f'/api/appointments/{appointment_id}/')
+        self.assertTrue(self.check()['available'])
+
+    def test_writes_in_another_worker_invalidate_this_ones_entries(self):
+        self.assertTrue(self.check()['available'])
+        # This worker's slot cache as it was before another worker booked the slot
+        entries = dict(booked_slot_cache._entries)
+        self.book()
+        booked_slot_cache._entries.update(entries)
+
+        self.assertFalse(self.check()['available'])
+
+    async def test_async_check_sees_writes_from_other_workers(self):
+        from asgiref.sync import sync_to_async
+
+        check = {'doctor_id': self.doctor.id, 'date': self.day.isoformat(), 'time': '10:00'}
+        response = await self.async_client.post('/api/async/check-availability/', check, content_type='application/json')
+        self.assertTrue(response.json()['available'])
+        entries = dict(booked_slot_cache._entries)
+        await sync_to_async(make_appointment)(self.doctor, self.day, time(10, 0))
+        booked_slot_cache._entries.update(entries)
+
+        response = await self.async_client.post('/api/async/check-availability/', check, content_type='application/json')
+        self.assertFalse(response.json()['available'])
+
+    def test_rescheduling_evicts_both_days(self):
+        appointment_id = self.book()['appointment_id']
+        next_day = self.day + timedelta(days=1)
+        self.assertFalse(self.check()['available'])
+
+        appointment = Appointment.objects.get(id=appointment_id)
+        appointment.appointment_date = next_day
+        appointment.save()
+
+        self.assertTrue(self.check()['available'])
+        self.day = next_day
+        self.assertFalse(self.check()['available'])
+
+    def test_doctor_edits_evict_the_doctor(self):
+        self.assertTrue(self.check()['available'])
+        self.doctor.is_available = False
+        self.doctor.save()
+        self.assertEqual(self.check()['reason'], 'Doctor is not available for appointments')
+
+    def test_stats_endpoint(self):
+        self.check()
+        self.check()
+        stats = self.client.get('/api/availability/cache-stats/').data['booked_slots']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+
+class BulkImportExportTests(TestCase):
+    def setUp(self):
+        booked_slot_cache.clear()
+        doctor_cache.clear()
+        schedule_cache.clear()
+        self.client = APIClient()
+        self.doctor = make_doctor()
+        self.video_only = make_doctor(name='Jones', consultation_modes='video_only')
+        self.day = date.today() + timedelta(days=5)
+
+    def row(self, doctor=None, slot='10:00', **kwargs):
+        row = {
+            'doctor': (doctor or self.doctor).id,
+            'patient_name': 'Imported Patient',
+            'patient_email': 'imported@example.com',
+            'patient_phone': '5550000',
+            'appointment_date': self.day.isoformat(),
+            'appointment_time': slot,
+            'consultation_type': 'video',
+            'status': 'confirmed',
+            'notes': '',
+        }
+        row.update(kwargs)
+        return row
+
+    def write_csv(self, rows):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'w', newline='') as fh:
+            fh.write(','.join(rows[0]) + '\n')
+            for row in rows:
+                fh.write(','.join(str(value) for value in row.values()) + '\n')
+        return path
+
+    def test_command_imports_valid_rows_and_reports_bad_ones(self):
+        make_appointment(self.doctor, self.day, time(9, 0))
+        rows = [
+            self.row(slot='11:00'),
+            self.row(slot='11:00'),
+            self.row(slot='09:00'),
+            self.row(doctor=self.video_only, consultation_type='phone'),
+            self.row(doctor=self.video_only, slot='12:00'),
+            self.row(appointment_date=(date.today() - timedelta(days=30)).isoformat(), status='completed'),
+            self.row(appointment_date=(date.today() - timedelta(days=30)).isoformat()),
+            self.row(patient_email='not-an-email'),
+            dict(self.row(), doctor=999),
+        ]
+        path = self.write_csv(rows)
+        errors_path = path + '.errors'
+        self.addCleanup(lambda: os.path.exists(errors_path) and os.remove(errors_path))
+
+        call_command('import_appointments', path, errors=errors_path, batch_size=4, stdout=io.StringIO())
+
+        self.assertEqual(Appointment.objects.count(), 1 + 3)
+        with open(errors_path) as fh:
+            errors = {error['line']: error['errors'] for error in map(json.loads, fh)}
+        # Line 1 is the CSV header
+        self.assertEqual(sorted(errors), [3, 4, 5, 8, 9, 10])
+        self.assertIn('appointment_time', errors[3])
+        self.assertIn('appointment_time', errors[4])
+        self.assertIn('consultation_type', errors[5])
+        self.assertIn('appointment_date', errors[8])
+        self.assertIn('patient_email', errors[9])
+        self.assertEqual(errors[10], {'doctor': 'Doctor not found.'})
+
+    # Quarter-hour slots, so every row is on the doctor's grid
+    @override_settings(APPOINTMENT_SLOT_MINUTES=15)
+    def test_query_count_is_per_batch_not_per_row(self):
+        rows = [self.row(slot=f'{hour:02d}:{minute:02d}') for hour in range(9, 17) for minute in (0, 15, 30, 45)]
+        path = self.write_csv(rows)
+        # per batch: doctor lookup and schedule (first batch only), existing slot check,
+        # savepoint, insert, occupancy row insert, lock, day's bookings and update, day's
+        # counts, stored counts and insert, release
+        with self.assertNumQueries(5 + 2 + 4 + 2 * 7):
+            call_command('import_appointments', path, batch_size=20, stdout=io.StringIO())
+        self.assertEqual(Appointment.objects.count(), 32)
+
+    def test_confirmed_rows_must_fall_on_the_doctors_slots(self):
+        # Weekdays 09:00-12:00 with half-hour slots; the import day is a Tuesday
+        tuesday = next_weekday(1)
+        doctor = make_doctor(name='Part-time', slot_minutes=30)
+        for weekday in range(5):
+            WorkingHours.objects.create(doctor=doctor, weekday=weekday, start_time=time(9, 0), end_time=time(12, 0))
+        TimeOff.objects.create(doctor=doctor, start_date=tuesday + timedelta(days=1), end_date=tuesday + timedelta(days=1))
+        rows = [
+            self.row(doctor=doctor, slot='09:30', appointment_date=tuesday.isoformat()),
+            self.row(doctor=doctor, slot='09:15', appointment_date=tuesday.isoformat()),
+            self.row(doctor=doctor, slot='13:00', appointment_date=tuesday.isoformat()),
+            self.row(doctor=doctor, slot='10:00', appointment_date=(tuesday + timedelta(days=1)).isoformat()),
+            self.row(doctor=doctor, slot='10:00', appointment_date=(tuesday + timedelta(days=4)).isoformat()),
+            self.row(doctor=doctor, slot='13:00', appointment_date=tuesday.isoformat(), status='cancelled'),
+        ]
+
+        report = AppointmentImporter().run((index, row, None) for index, row in enumerate(rows, start=1))
+
+        self.assertEqual(report['created'], 2)
+        errors = {error['line']: error['errors'] for error in report['errors']}
+        self.assertEqual(sorted(errors), [2, 3, 4, 5])
+        self.assertIn('appointment_time', errors[2])
+        self.assertIn('appointment_time', errors[3])
+        # Time off and the weekend are days off
+        self.assertEqual(errors[4], {'appointment_date': 'Doctor is not working on this date.'})
+        self.assertEqual(errors[5], {'appointment_date': 'Doctor is not working on this date.'})
+
+    def test_confirmed_rows_earlier_today_are_in_the_past(self):
+        rows = [
+            self.row(slot='10:00'),
+            self.row(slot='14:00'),
+            self.row(slot='11:00', status='completed'),
+        ]
+        # Import at noon on the rows' day
+        importer = AppointmentImporter(now=datetime.combine(self.day, time(12, 0)))
+        report = importer.run((index, row, None) for index, row in enumerate(rows, start=1))
+
+        self.assertEqual(report['created'], 2)
+        self.assertEqual(report['errors'], [{'line': 1, 'errors': {'appointment_time': 'Cannot book appointments in the past.'}}])
+
+    def test_dry_run_writes_nothing(self):
+        path = self.write_csv([self.row()])
+        call_command('import_appointments', path, dry_run=True, stdout=io.StringIO())
+        self.assertEqual(Appointment.objects.count(), 0)
+
+    def test_api_import_jsonl_evicts_the_slot_cache(self):
+        check = {'doctor_id': self.doctor.id, 'date': self.day.isoformat(), 'time': '10:00'}
+        self.assertTrue(self.client.post('/api/check-availability/', check, format='json').data['available'])
+
+        body = '\n'.join(json.dumps(row) for row in [self.row(), self.row(slot='11:00')]) + '\n{broken\n'
+        upload = SimpleUploadedFile('appointments.jsonl', body.encode(), content_type='application/x-ndjson')
+        response = self.client.post('/api/appointments/import/', {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['errors'], [{'line': 3, 'errors': {'row': 'Invalid JSON'}}])
+        self.assertFalse(self.client.post('/api/check-availability/', check, format='json').data['available'])
+
+    def test_export_round_trips_through_import(self):
+        for hour in range(9, 13):
+            make_appointment(self.doctor, self.day, time(hour, 0))
+
+        response = self.client.get('/api/appointments/export/', {'file_format': 'csv'})
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(len(body.strip().splitlines()), 5)
+
+        Appointment.objects.all().delete()
+        upload = SimpleUploadedFile('appointments.csv', body.encode(), content_type='text/csv')
+        response = self.client.post('/api/appointments/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.data['created'], 4)
+        self.assertEqual(
+            list(Appointment.objects.order_by('appointment_time').values_list('appointment_time', flat=True)),
+            [time(hour, 0) for hour in range(9, 13)]
+        )
+
+    def test_export_jsonl_command(self):
+        make_appointment(self.doctor, self.day, time(9, 0))
+        out = io.StringIO()
+        call_command('export_appointments', format='jsonl', stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(rows[0]['doctor'], self.doctor.id)
+        self.assertEqual(rows[0]['appointment_time'], '09:00:00')
+
+
+class BenchmarkCommandTests(TransactionTestCase):
+    # Its GETs read from the replicas when DATABASE_REPLICA_URLS is set
+    databases = '__all__'
+
+    def test_benchmark_api_reports_every_view(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+
+        call_command(
+            'benchmark_api', seed=True, doctors=5, appointments=40, days=10, repeat=2,
+            workers=2, duration=0.3, contention=8, output=path, stdout=io.StringIO()
+        )
+
+        with open(path) as fh:
+            results = json.load(fh)
+        self.assertEqual(set(results['views']), set(SCENARIOS))
+        self.assertTrue(all(result['queries_per_request'] is not None for result in results['views'].values()))
+        self.assertIn('AppointmentSerializer.is_valid', results['serializers'])
+        self.assertGreater(results['load']['requests'], 0)
+        self.assertIn('p99_ms', results['load']['overall'])
+        contention = results['contention']
+        self.assertEqual(contention['same_slot']['status_codes'], {'201': 1, '400': 7})
+        self.assertEqual(contention['distinct_slots']['status_codes'], {'201': 8})
+        self.assertGreater(contention['distinct_slots']['bookings_per_second'], 0)
+        # Rows booked by the benchmark are cleaned up
+        self.assertEqual(Appointment.objects.count(), 40)
+
+
+@override_settings(METRICS_SAMPLE_RATE=1.0, METRICS_TOKEN='secret', METRICS_PROFILE_DIR='')
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer secret')
+        self.doctor = make_doctor()
+
+    def test_metrics_endpoint_exposes_sampled_requests(self):
+        day = (date.today() + timedelta(days=1)).isoformat()
+        self.client.get(f'/api/doctors/{self.doctor.id}/availability/', {'date': day})
+
+        body = self.client.get('/metrics').content.decode()
+        labels = 'view="doctor-availability",method="GET",status="200"'
+        self.assertIn(f'mindcare_request_duration_seconds_count{{{labels}}} 1', body)
+        self.assertIn(f'mindcare_request_queries_sum{{{labels}}} 4.000000', body)
+        self.assertIn(f'mindcare_request_similar_queries_total{{{labels}}} 0', body)
+        self.assertIn(f'mindcare_response_size_bytes_total{{{labels}}}', body)
+
+    def test_metrics_token(self):
+        client = APIClient()
+        self.assertEqual(client.get('/metrics').status_code, 403)
+        self.assertEqual(client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_metrics_without_a_token_are_only_served_in_debug(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    def test_connection_metrics(self):
+        from unittest import mock
+
+        connection_created.send(sender=connection.__class__, connection=connection)
+        pool = {'pool_min': 2, 'pool_max': 10, 'pool_size': 4, 'pool_available': 1, 'requests_waiting': 2,
+                'requests_queued': 5, 'requests_wait_ms': 1500, 'connections_num': 4, 'connections_ms': 320}
+        with mock.patch('api.metrics.pool_stats', return_value={'default': pool}):
+            body = self.client.get('/metrics').content.decode()
+
+        self.assertIn('mindcare_db_connections_opened_total{alias="default"} 1', body)
+        self.assertIn('mindcare_db_pool_in_use{alias="default"} 3', body)
+        self.assertIn('mindcare_db_pool_waits_total{alias="default"} 5', body)
+        self.assertIn('mindcare_db_pool_wait_seconds_total{alias="default"} 1.5', body)
+        self.assertIn('mindcare_db_pool_connect_seconds_total{alias="default"} 0.32', body)
+        self.assertIn('mindcare_db_pool_timeouts_total{alias="default"} 0', body)
+
+    def test_query_loop_is_flagged(self):
+        def per_slot_loop(request):
+            for hour in range(12):
+                list(Appointment.objects.filter(doctor=self.doctor, appointment_time=time(hour, 0)))
+            return HttpResponse('ok')
+
+        middleware = RequestMetricsMiddleware(per_slot_loop)
+        with self.assertLogs('api.middleware', level='WARNING') as logs:
+            middleware(RequestFactory().get('/loop'))
+
+        self.assertIn('ran 12 queries (11 repeated)', logs.output[0])
+        self.assertIn('mindcare_request_similar_queries_total{view="unresolved",method="GET",status="200"} 11', registry.render())
+
+    def test_profile_header_writes_a_dump(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        with self.settings(METRICS_PROFILE_DIR=directory, METRICS_SAMPLE_RATE=0.0):
+            response = self.client.get('/api/specializations/', HTTP_X_PROFILE='1')
+            unprofiled = self.client.get('/api/specializations/')
+
+        self.assertTrue(response['X-Profile-File'].startswith('specialization-list-'))
+        self.assertTrue(os.path.exists(os.path.join(directory, response['X-Profile-File'])))
+        self.assertNotIn('X-Profile-File', unprofiled)
+
+
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = date.today() + timedelta(days=2)
+        cls.doctors = [make_doctor(name=f'Doctor {i}') for i in range(3)]
+        for doctor in cls.doctors:
+            for hour in (9, 11, 14):
+                make_appointment(doctor, cls.day, time(hour, 0))
+
+    def setUp(self):
+        self.client = APIClient()
+        booked_slot_cache.clear()
+        doctor_cache.clear()
+
+    def test_appointment_list_walks_the_same_pages(self):
+        async_ids = []
+        url, params = '/api/async/appointments/', {'page_size': 4}
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            async_ids.extend(row['id'] for row in response.json()['results'])
+            url, params = response.json()['next'], None
+
+        response = self.client.get('/api/appointments/', {'page_size': 100})
+        self.assertEqual(async_ids, [row['id'] for row in response.data['results']])
+
+    async def test_invalid_cursor(self):
+        response = await self.async_client.get('/api/async/appointments/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_availability_matches_sync_view(self):
+        doctor = self.doctors[0]
+        params = {'date': self.day.isoformat()}
+        expected = self.client.get(f'/api/doctors/{doctor.id}/availability/', params).json()
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/async/doctors/{doctor.id}/availability/', params)
+        self.assertEqual(response.json(), expected)
+        self.assertEqual(self.client.get('/api/async/doctors/999999/availability/').status_code, 404)
+
+    def test_calendar_matches_sync_view(self):
+        params = {
+            'doctors': ','.join(str(doctor.id) for doctor in self.doctors),
+            'start': self.day.isoformat(),
+            'end': (self.day + timedelta(days=6)).isoformat(),
+        }
+        expected = self.client.get('/api/availability/', params).json()
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/async/availability/', params)
+        self.assertEqual(response.json(), expected)
+
+        params['end'] = (self.day + timedelta(days=365)).isoformat()
+        self.assertEqual(self.client.get('/api/async/availability/', params).status_code, 400)
+
+    def test_check_availability_matches_sync_view(self):
+        for slot in ('09:00', '10:00'):
+            payload = {'doctor_id': self.doctors[0].id, 'date': self.day.isoformat(), 'time': slot}
+            expected = self.client.post('/api/check-availability/', payload, format='json').json()
+            response = self.client.post('/api/async/check-availability/', payload, format='json')
+            self.assertEqual(response.json(), expected)
+
+        response = self.client.post('/api/async/check-availability/', {'doctor_id': self.doctors[0].id}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+# One replica alias whose reads the patched choose_replica sends back to the
+# test database, so the tests see which requests would have used a replica
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRoutingTests(TransactionTestCase):
+    def setUp(self):
+        from unittest import mock
+
+        patcher = mock.patch('api.routers.choose_replica', return_value='default')
+        self.choose_replica = patcher.start()
+        self.addCleanup(patcher.stop)
+        for cached in (cache, booked_slot_cache, doctor_cache, schedule_cache):
+            cached.clear()
+        self.client = APIClient()
+        self.doctor = make_doctor()
+        self.day = date.today() + timedelta(days=2)
+        make_appointment(self.doctor, self.day, time(9, 0))
+
+    def used_replica(self, method, url, data=None):
+        self.choose_replica.reset_mock()
+        response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 400)
+        return self.choose_replica.called
+
+    def booking(self, slot='10:00'):
+        return {
+            'doctor': self.doctor.id,
+            'patient_name': 'New Patient',
+            'patient_email': 'new@example.com',
+            'patient_phone': '5550000',
+            'appointment_date': self.day.isoformat(),
+            'appointment_time': slot,
+            'consultation_type': 'video',
+        }
+
+    def test_list_and_availability_reads_use_a_replica(self):
+        day = {'date': self.day.isoformat()}
+        self.assertTrue(self.used_replica('get', '/api/appointments/'))
+        self.assertTrue(self.used_replica('get', f'/api/doctors/{self.doctor.id}/availability/', day))
+        self.assertTrue(self.used_replica('get', '/api/availability/', {'doctors': str(self.doctor.id)}))
+        self.assertTrue(self.used_replica('get', '/api/async/appointments/'))
+        self.assertTrue(self.used_replica('get', '/api/appointments/export/'))
+        self.assertTrue(self.used_replica('get', f'/api/async/doctors/{self.doctor.id}/availability/', day))
+
+    def test_bookings_and_availability_checks_stay_on_the_primary(self):
+        check = {'doctor_id': self.doctor.id, 'date': self.day.isoformat(), 'time': '10:00'}
+        self.assertFalse(self.used_replica('post', '/api/check-availability/', check))
+        self.assertFalse(self.used_replica('post', '/api/async/check-availability/', check))
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, self.client.cookies)
+
+        self.assertFalse(self.used_replica('post', '/api/appointments/', self.booking()))
+        appointment = Appointment.objects.get(appointment_time=time(10, 0))
+        self.client.cookies.clear()
+        self.assertFalse(self.used_replica('put', f'/api/appointments/{appointment.id}/', self.booking('11:00')))
+
+    def test_client_reads_from_the_primary_after_writing(self):
+        response = self.client.post('/api/appointments/', self.booking(), format='json')
+        self.assertEqual(response.cookies[settings.REPLICA_PIN_COOKIE]['max-age'], settings.REPLICA_STICKY_SECONDS)
+        self.assertFalse(self.used_replica('get', '/api/appointments/'))
+
+        # Once the cookie expires reads go back to the replicas
+        self.client.cookies.clear()
+        self.assertTrue(self.used_replica('get', '/api/appointments/'))
+
+    def test_cached_data_is_loaded_from_the_primary(self):
+        from .routers import ReadRouting, routing
+
+        # Doctor and specialization reads are served from the shared catalog
+        self.assertFalse(self.used_replica('get', '/api/doctors/'))
+        self.assertFalse(self.used_replica('get', '/api/doctors/search/', {'q': 'smith'}))
+        self.assertFalse(self.used_replica('get', '/api/specializations/'))
+
+        token = routing.set(ReadRouting(replica=True))
+        self.addCleanup(routing.reset, token)
+        self.choose_replica.reset_mock()
+        self.assertEqual(TTLCache(10, 60).get_or_load('doctors', Doctor.objects.count), 1)
+        self.assertFalse(self.choose_replica.called)
+        Doctor.objects.count()
+        self.assertTrue(self.choose_replica.called)
+
+    def test_reads_in_a_transaction_or_after_a_write_use_the_primary(self):
+        from django.db import transaction
+
+        from .routers import ReadRouting, ReplicaRouter, routing
+
+        router, state = ReplicaRouter(), ReadRouting(replica=True)
+        token = routing.set(state)
+        self.addCleanup(routing.reset, token)
+
+        def used_replica():
+            self.choose_replica.reset_mock()
+            router.db_for_read(Doctor)
+            return self.choose_replica.called
+
+        self.assertTrue(used_replica())
+        with transaction.atomic():
+            self.assertFalse(used_replica())
+
+        self.assertEqual(router.db_for_write(Doctor), 'default')
+        self.assertFalse(used_replica())
+        self.assertTrue(state.wrote)
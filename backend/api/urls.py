@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views 
+from . import views, async_views
 
 router = DefaultRouter()
 router.register(r'doctors', views.DoctorViewSet)
@@ -10,8 +10,28 @@ urlpatterns = [
     path('', include(router.urls)),
     # Appointments endpoints
     path('appointments/', views.AppointmentView.as_view(), name='appointments'),
+    path('appointments/import/', views.AppointmentImportView.as_view(), name='appointment-import'),
+    path('appointments/export/', views.AppointmentExportView.as_view(), name='appointment-export'),
+    path('appointments/batch/cancel/', views.BatchCancelView.as_view(), name='appointment-batch-cancel'),
+    path('appointments/batch/reschedule/', views.BatchRescheduleView.as_view(), name='appointment-batch-reschedule'),
+    path('appointments/series/', views.AppointmentSeriesView.as_view(), name='appointment-series'),
+    path('appointments/series/<int:series_id>/', views.AppointmentSeriesView.as_view(), name='appointment-series-detail'),
+    path('appointments/series/<int:series_id>/cancel/', views.SeriesCancelView.as_view(), name='appointment-series-cancel'),
+    path('appointments/series/<int:series_id>/reschedule/', views.SeriesRescheduleView.as_view(), name='appointment-series-reschedule'),
     path('appointments/<int:appointment_id>/', views.AppointmentView.as_view(), name='appointment-detail'),
     # Availability endpoints
     path('check-availability/', views.CheckAvailabilityView.as_view(), name='check-availability'),
     path('doctors/<int:doctor_id>/availability/', views.DoctorAvailabilityView.as_view(), name='doctor-availability'),
+    path('doctors/<int:doctor_id>/available-days/', views.DoctorAvailableDaysView.as_view(), name='doctor-available-days'),
+    path('specializations/<int:specialization_id>/availability/', views.SpecializationAvailabilityView.as_view(), name='specialization-availability'),
+    path('availability/', views.AvailabilityCalendarView.as_view(), name='availability-calendar'),
+    path('availability/next/', views.NextAvailableSlotsView.as_view(), name='next-available-slots'),
+    path('availability/cache-stats/', views.SlotCacheStatsView.as_view(), name='slot-cache-stats'),
+    # Booking counts for dashboards
+    path('stats/bookings/', views.BookingStatsView.as_view(), name='booking-stats'),
+    # Async (ASGI) versions of the read-heavy endpoints
+    path('async/appointments/', async_views.AsyncAppointmentListView.as_view(), name='async-appointments'),
+    path('async/check-availability/', async_views.AsyncCheckAvailabilityView.as_view(), name='async-check-availability'),
+    path('async/doctors/<int:doctor_id>/availability/', async_views.AsyncDoctorAvailabilityView.as_view(), name='async-doctor-availability'),
+    path('async/availability/', async_views.AsyncAvailabilityCalendarView.as_view(), name='async-availability-calendar'),
 ]
\ No newline at end of file
@@ -1,23 +1,149 @@
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
+from rest_framework.parsers import MultiPartParser
+from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
+from django.conf import settings
 from datetime import datetime, timedelta
-from .models import Specialization, Doctor, Appointment
+import io
+from .models import Specialization, Doctor, Appointment, AppointmentSeries, ArchivedAppointment, DailyBookingCount
+from .archive import READ_ORDER, merge_ordered
+from .availability import (
+    build_time_slots, build_calendar, build_shared_availability, find_available_days, find_earliest_slots
+)
+from .batch import Rescheduler, cancel_range
+from .bulk import AppointmentImporter, FORMATS, detect_format, read_rows, stream_export
+from .booking import book_slot, SlotUnavailable
+from .catalog import catalog_response
+from .search import search_doctors
+from .series import OCCURRENCE_FIELDS, WEEKDAYS, SeriesPlanner, cancel_series, occurrence_dates
+from .stats import GROUPINGS, booking_stats, summarize_rows
+from .schedule import get_schedule, schedule_cache
+from .slotcache import booked_slot_cache, doctor_cache, get_booked_mask, get_doctor_summary
+from .pagination import AppointmentCursorPagination, stream_json_list
 from .serializers import (
     SpecializationSerializer, 
     DoctorSerializer, 
-    AppointmentSerializer
+    AppointmentSerializer,
+    AppointmentSeriesSerializer,
+    appointment_reader,
+    doctor_reader
 )
 
 
+def filter_appointments(appointments, params):
+    """Apply the appointment list query-string filters to a queryset"""
+    # Filter by doctor
+    doctor_id = params.get('doctor')
+    if doctor_id:
+        appointments = appointments.filter(doctor_id=doctor_id)
+    
+    # Filter by status
+    status_filter = params.get('status')
+    if status_filter:
+        appointments = appointments.filter(status=status_filter)
+    
+    # Filter by date range
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+    if start_date:
+        appointments = appointments.filter(appointment_date__gte=start_date)
+    if end_date:
+        appointments = appointments.filter(appointment_date__lte=end_date)
+    
+    # Filter by consultation type
+    consultation_type = params.get('consultation_type')
+    if consultation_type:
+        appointments = appointments.filter(consultation_type=consultation_type)
+    
+    return appointments
+
+
+def parse_calendar_params(params, today):
+    """Validate the calendar query string into (start, end, doctors queryset)
+
+    The queryset is capped one past the doctor limit so callers can detect an
+    oversized request. Raises ValueError with the message for the client.
+    """
+    # Parse the date range (default: the next 7 days)
+    try:
+        start_str = params.get('start')
+        end_str = params.get('end')
+        start_date = datetime.strptime(start_str, '%Y-%m-%d').date() if start_str else today
+        end_date = datetime.strptime(end_str, '%Y-%m-%d').date() if end_str else start_date + timedelta(days=6)
+    except ValueError:
+        raise ValueError('Invalid date format. Use YYYY-MM-DD')
+    
+    if end_date < start_date:
+        raise ValueError('end must not be before start')
+    
+    if (end_date - start_date).days + 1 > settings.AVAILABILITY_CALENDAR_MAX_DAYS:
+        raise ValueError(f'Date range cannot exceed {settings.AVAILABILITY_CALENDAR_MAX_DAYS} days')
+    
+    doctors = Doctor.objects.filter(is_active=True).only('id', 'name', 'is_available')
+    
+    # Filter by doctor ids (comma separated)
+    doctor_ids = params.get('doctors')
+    if doctor_ids:
+        try:
+            doctor_ids = [int(doctor_id) for doctor_id in doctor_ids.split(',') if doctor_id.strip()]
+        except ValueError:
+            raise ValueError('doctors must be a comma separated list of ids')
+        doctors = doctors.filter(id__in=doctor_ids)
+    
+    # Filter by specialization
+    specialization = params.get('specialization')
+    if specialization:
+        doctors = doctors.filter(specialization_id=specialization)
+    
+    return start_date, end_date, doctors.order_by('id')[:settings.AVAILABILITY_CALENDAR_MAX_DOCTORS + 1]
+
+
+def limit_calendar_doctors(doctors):
+    if len(doctors) > settings.AVAILABILITY_CALENDAR_MAX_DOCTORS:
+        raise ValueError(f'Cannot request more than {settings.AVAILABILITY_CALENDAR_MAX_DOCTORS} doctors at once')
+    return doctors
+
+
+def parse_check_params(data):
+    """Validate a check-availability payload into (doctor_id, date, time, time string)
+
+    Raises ValueError with the message for the client.
+    """
+    doctor_id = data.get('doctor_id')
+    date_str = data.get('date')
+    time_str = data.get('time')
+    
+    if not all([doctor_id, date_str, time_str]):
+        raise ValueError('doctor_id, date, and time are required')
+    
+    try:
+        doctor_id = int(doctor_id)
+        appointment_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        appointment_time = f"{time_str}:00" if ':' in time_str else f"{time_str}:00:00"
+        appointment_time = datetime.strptime(appointment_time, '%H:%M:%S').time()
+    except (TypeError, ValueError):
+        raise ValueError('Invalid date or time format')
+    
+    return doctor_id, appointment_date, appointment_time, time_str
+
+
 class SpecializationViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [AllowAny]
     queryset = Specialization.objects.all()
     serializer_class = SpecializationSerializer
     pagination_class = None
+    
+    def list(self, request, *args, **kwargs):
+        return catalog_response(request, 'specializations', lambda: super(SpecializationViewSet, self).list(request, *args, **kwargs).data)
+    
+    def retrieve(self, request, *args, **kwargs):
+        return catalog_response(request, f"specialization:{kwargs['pk']}", lambda: super(SpecializationViewSet, self).retrieve(request, *args, **kwargs).data)
 
 
 class DoctorViewSet(viewsets.ModelViewSet):
@@ -26,7 +152,7 @@ class DoctorViewSet(viewsets.ModelViewSet):
     queryset = Doctor.objects.all()
     
     def get_queryset(self):
-        queryset = Doctor.objects.filter(is_active=True)
+        queryset = Doctor.objects.filter(is_active=True).select_related('specialization')
         
         # Filter by specialization
         specialization = self.request.query_params.get('specialization')
@@ -38,13 +164,65 @@ class DoctorViewSet(viewsets.ModelViewSet):
         if available and available.lower() == 'true':
             queryset = queryset.filter(is_available=True)
         
-        # Filter by consultation mode
+        # Filter by consultation type (video/phone/in_person) through the indexed
+        # flags; consultation_mode also accepts an exact mode value
+        consultation_type = self.request.query_params.get('consultation_type')
         consultation_mode = self.request.query_params.get('consultation_mode')
-        if consultation_mode:
-            queryset = queryset.filter(consultation_modes__in=[consultation_mode, 'both'])
+        if consultation_mode in Doctor.TYPE_FLAGS:
+            consultation_type = consultation_mode
+        elif consultation_mode:
+            queryset = queryset.filter(consultation_modes=consultation_mode)
+        if consultation_type in Doctor.TYPE_FLAGS:
+            queryset = queryset.filter(consultation_flags__in=Doctor.flags_supporting(consultation_type))
+        elif consultation_type:
+            queryset = queryset.none()
         
         return queryset
     
+    # Reads go through the versioned catalog cache; writes invalidate it via
+    # signals. Misses render value rows through the serializer's fast path.
+    # They read from the primary (no replica_reads): an entry built from a
+    # lagging replica just after a bump would serve old rows under the new version.
+    def list(self, request, *args, **kwargs):
+        return catalog_response(request, 'doctors', lambda: doctor_reader.serialize(doctor_reader.values(self.get_queryset())))
+    
+    def retrieve(self, request, *args, **kwargs):
+        def build():
+            doctor = get_object_or_404(doctor_reader.values(self.get_queryset()), pk=kwargs['pk'])
+            return doctor_reader.serialize([doctor])[0]
+        
+        return catalog_response(request, f"doctor:{kwargs['pk']}", build)
+    
+    @action(detail=False)
+    def search(self, request):
+        """Ranked search over name, specialization and bio; words of 2+ letters also match as prefixes"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'error': 'q is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), settings.DOCTOR_SEARCH_MAX_RESULTS)
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        def build():
+            # Rank within the list filters (specialization, available, ...)
+            queryset = self.get_queryset()
+            ranked = search_doctors(query, limit, queryset)
+            rows = doctor_reader.values(queryset.filter(id__in=[doctor_id for doctor_id, _ in ranked]))
+            doctors = {doctor['id']: doctor for doctor in doctor_reader.serialize(rows)}
+            return [
+                dict(doctors[doctor_id], score=round(score, 4))
+                for doctor_id, score in ranked if doctor_id in doctors
+            ]
+        
+        return catalog_response(request, 'doctor-search', build)
+    
     def destroy(self, request, *args, **kwargs):
         """Soft delete - set is_active=False"""
         instance = self.get_object()
@@ -56,72 +234,137 @@ class DoctorViewSet(viewsets.ModelViewSet):
         )
 
 
+def parse_window_bound(value):
+    """Parse 'YYYY-MM-DD' or 'YYYY-MM-DDTHH:MM' into (naive datetime, whether it was a bare date)"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%dT%H:%M'), False
+    except ValueError:
+        return datetime.strptime(value, '%Y-%m-%d'), True
+
+
+def parse_search_params(params, now):
+    """Validate the next-slot search query string into (window start, window end, limit, doctors)
+
+    A bare end date includes that whole day. Raises ValueError with the message
+    for the client.
+    """
+    try:
+        window_start = parse_window_bound(params['start'])[0] if params.get('start') else now
+        if params.get('end'):
+            window_end, whole_day = parse_window_bound(params['end'])
+            if whole_day:
+                window_end += timedelta(days=1)
+        else:
+            window_end = max(window_start, now) + timedelta(days=14)
+    except ValueError:
+        raise ValueError('Invalid start/end. Use YYYY-MM-DD or YYYY-MM-DDTHH:MM')
+    
+    # Slots that already started cannot be booked
+    window_start = max(window_start, now)
+    if window_end <= window_start:
+        raise ValueError('end must be after start and in the future')
+    if window_end - window_start > timedelta(days=settings.AVAILABILITY_SEARCH_MAX_DAYS):
+        raise ValueError(f'Search window cannot exceed {settings.AVAILABILITY_SEARCH_MAX_DAYS} days')
+    
+    try:
+        limit = int(params.get('limit', 5))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if not 1 <= limit <= settings.AVAILABILITY_SEARCH_MAX_RESULTS:
+        raise ValueError(f'limit must be between 1 and {settings.AVAILABILITY_SEARCH_MAX_RESULTS}')
+    
+    doctors = Doctor.objects.filter(is_active=True, is_available=True).only('id', 'name', 'consultation_modes')
+    
+    specialization = params.get('specialization')
+    if specialization:
+        doctors = doctors.filter(specialization_id=specialization)
+    
+    consultation_type = params.get('consultation_type')
+    if consultation_type:
+        if consultation_type not in Doctor.TYPE_FLAGS:
+            raise ValueError(f'Unknown consultation_type {consultation_type}')
+        doctors = doctors.filter(consultation_flags__in=Doctor.flags_supporting(consultation_type))
+    
+    return window_start, window_end, limit, doctors.order_by('id')
+
+
+def parse_stats_params(params, today):
+    """Validate the booking stats query string into (start, end, group_by, counts queryset)
+
+    Raises ValueError with the message for the client.
+    """
+    try:
+        start_str = params.get('start')
+        end_str = params.get('end')
+        start_date = datetime.strptime(start_str, '%Y-%m-%d').date() if start_str else today
+        end_date = datetime.strptime(end_str, '%Y-%m-%d').date() if end_str else start_date + timedelta(days=29)
+    except ValueError:
+        raise ValueError('Invalid date format. Use YYYY-MM-DD')
+    
+    if end_date < start_date:
+        raise ValueError('end must not be before start')
+    if (end_date - start_date).days + 1 > settings.BOOKING_STATS_MAX_DAYS:
+        raise ValueError(f'Date range cannot exceed {settings.BOOKING_STATS_MAX_DAYS} days')
+    
+    group_by = params.get('group_by', 'doctor')
+    if group_by not in GROUPINGS:
+        raise ValueError(f'group_by must be one of {", ".join(GROUPINGS)}')
+    
+    counts = DailyBookingCount.objects.filter(date__range=(start_date, end_date))
+    
+    doctor_id = params.get('doctor')
+    if doctor_id:
+        counts = counts.filter(doctor_id=doctor_id)
+    
+    specialization = params.get('specialization')
+    if specialization:
+        counts = counts.filter(doctor__specialization_id=specialization)
+    
+    return start_date, end_date, group_by, counts
+
+
 class AppointmentView(APIView):
     permission_classes = [AllowAny]
+    replica_reads = True
     
     def get(self, request, appointment_id=None):
+        # Opt-in reads of appointments moved to the archive (api.archive)
+        include_archived = request.query_params.get('include_archived', '').lower() == 'true'
+        stores = [Appointment, ArchivedAppointment] if include_archived else [Appointment]
+        # Reads render value rows through the fast path; writes below use the serializer
+        querysets = [appointment_reader.values(model.objects.all()) for model in stores]
+        
         if appointment_id:
-            try:
-                appointment = Appointment.objects.get(id=appointment_id)
-                serializer = AppointmentSerializer(appointment)
-                return Response(serializer.data)
-            except Appointment.DoesNotExist:
-                return Response(
-                    {'error': 'Appointment not found'},
-                    status=status.HTTP_404_NOT_FOUND
-                )
+            for queryset in querysets:
+                appointment = queryset.filter(id=appointment_id).first()
+                if appointment is not None:
+                    return Response(appointment_reader.serialize([appointment])[0])
+            return Response(
+                {'error': 'Appointment not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
         
         # Get all appointments with filters
-        appointments = Appointment.objects.all()
-        
-        # Filter by doctor
-        doctor_id = request.query_params.get('doctor')
-        if doctor_id:
-            appointments = appointments.filter(doctor_id=doctor_id)
-        
-        # Filter by status
-        status_filter = request.query_params.get('status')
-        if status_filter:
-            appointments = appointments.filter(status=status_filter)
-        
-        # Filter by date range
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
-        if start_date:
-            appointments = appointments.filter(appointment_date__gte=start_date)
-        if end_date:
-            appointments = appointments.filter(appointment_date__lte=end_date)
-        
-        # Filter by consultation type
-        consultation_type = request.query_params.get('consultation_type')
-        if consultation_type:
-            appointments = appointments.filter(consultation_type=consultation_type)
-        
-        appointments = appointments.order_by('appointment_date', 'appointment_time')
-        serializer = AppointmentSerializer(appointments, many=True)
-        return Response(serializer.data)
+        querysets = [filter_appointments(queryset, request.query_params) for queryset in querysets]
+        
+        # Opt-in streaming export of the whole filtered range
+        if request.query_params.get('stream', '').lower() == 'true':
+            querysets = [queryset.order_by(*READ_ORDER) for queryset in querysets]
+            if not include_archived:
+                return stream_json_list(querysets[0], appointment_reader.serialize)
+            chunk_size = settings.APPOINTMENT_STREAM_CHUNK_SIZE
+            rows = merge_ordered(*(queryset.iterator(chunk_size=chunk_size) for queryset in querysets))
+            return stream_json_list(rows, appointment_reader.serialize)
+        
+        paginator = AppointmentCursorPagination()
+        page = paginator.paginate_querysets(querysets, request)
+        return paginator.get_paginated_response(appointment_reader.serialize(page))
     
     def post(self, request):
         serializer = AppointmentSerializer(data=request.data)
         
         if serializer.is_valid():
             doctor = serializer.validated_data['doctor']
-            appointment_date = serializer.validated_data['appointment_date']
-            appointment_time = serializer.validated_data['appointment_time']
-            
-            # Check for double booking
-            existing_appointment = Appointment.objects.filter(
-                doctor=doctor,
-                appointment_date=appointment_date,
-                appointment_time=appointment_time,
-                status='confirmed'
-            ).exists()
-            
-            if existing_appointment:
-                return Response(
-                    {'error': 'This time slot is already booked'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
             
             # Check if doctor is available
             if not doctor.is_available:
@@ -130,7 +373,14 @@ class AppointmentView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            appointment = serializer.save()
+            # The insert claims the slot atomically; no separate double-booking check
+            try:
+                appointment = book_slot(serializer.save)
+            except SlotUnavailable:
+                return Response(
+                    {'error': 'This time slot is already booked'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             return Response(
                 {
                     'message': 'Appointment booked successfully',
@@ -144,7 +394,7 @@ class AppointmentView(APIView):
     
     def put(self, request, appointment_id):
         try:
-            appointment = Appointment.objects.get(id=appointment_id)
+            appointment = Appointment.objects.select_related('doctor__specialization').get(id=appointment_id)
         except Appointment.DoesNotExist:
             return Response(
                 {'error': 'Appointment not found'},
@@ -154,26 +404,14 @@ class AppointmentView(APIView):
         serializer = AppointmentSerializer(appointment, data=request.data)
         
         if serializer.is_valid():
-            # Check for double booking if time is changed
-            if 'appointment_date' in request.data or 'appointment_time' in request.data:
-                doctor = serializer.validated_data.get('doctor', appointment.doctor)
-                appointment_date = serializer.validated_data.get('appointment_date', appointment.appointment_date)
-                appointment_time = serializer.validated_data.get('appointment_time', appointment.appointment_time)
-                
-                existing_appointment = Appointment.objects.filter(
-                    doctor=doctor,
-                    appointment_date=appointment_date,
-                    appointment_time=appointment_time,
-                    status='confirmed'
-                ).exclude(id=appointment_id).exists()
-                
-                if existing_appointment:
-                    return Response(
-                        {'error': 'This time slot is already booked'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            
-            serializer.save()
+            # Moving onto a confirmed slot fails at the database, not in a pre-check
+            try:
+                book_slot(serializer.save)
+            except SlotUnavailable:
+                return Response(
+                    {'error': 'This time slot is already booked'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             return Response(
                 {
                     'message': 'Appointment updated successfully',
@@ -185,9 +423,11 @@ class AppointmentView(APIView):
     
     def delete(self, request, appointment_id):
         try:
-            appointment = Appointment.objects.get(id=appointment_id)
+            appointment = Appointment.objects.select_related('doctor').get(id=appointment_id)
             appointment.status = 'cancelled'
-            appointment.save()
+            # Commit the cancellation together with its occupancy refresh
+            with transaction.atomic():
+                appointment.save()
             return Response(
                 {'message': 'Appointment cancelled successfully'},
                 status=status.HTTP_200_OK
@@ -199,12 +439,283 @@ class AppointmentView(APIView):
             )
 
 
+class BatchCancelView(APIView):
+    permission_classes = [AllowAny]
+    
+    def post(self, request):
+        try:
+            doctor_id = int(request.data.get('doctor'))
+            start_date = datetime.strptime(request.data.get('start_date', ''), '%Y-%m-%d').date()
+            end_str = request.data.get('end_date')
+            end_date = datetime.strptime(end_str, '%Y-%m-%d').date() if end_str else start_date
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'doctor and start_date are required. Use YYYY-MM-DD dates'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if end_date < start_date:
+            return Response(
+                {'error': 'end_date must not be before start_date'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if not Doctor.objects.filter(id=doctor_id).exists():
+            return Response(
+                {'error': 'Doctor not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        results = cancel_range(doctor_id, start_date, end_date)
+        return Response({
+            'message': f'Cancelled {len(results)} appointments',
+            'cancelled': len(results),
+            'results': results
+        })
+
+
+class BatchRescheduleView(APIView):
+    permission_classes = [AllowAny]
+    
+    def post(self, request):
+        appointment_ids = request.data.get('appointment_ids')
+        try:
+            appointment_ids = [int(appointment_id) for appointment_id in appointment_ids]
+            doctor_id = int(request.data.get('doctor'))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'appointment_ids (a list of ids) and doctor are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if not 1 <= len(appointment_ids) <= settings.BATCH_RESCHEDULE_MAX_APPOINTMENTS:
+            return Response(
+                {'error': f'Send between 1 and {settings.BATCH_RESCHEDULE_MAX_APPOINTMENTS} appointment_ids'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            doctor = Doctor.objects.only('id', 'consultation_modes', 'is_available').get(id=doctor_id, is_active=True)
+        except Doctor.DoesNotExist:
+            return Response(
+                {'error': 'Doctor not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        if not doctor.is_available:
+            return Response(
+                {'error': 'Doctor is not available for appointments'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        find_next = str(request.data.get('find_next', True)).lower() not in ('false', '0')
+        try:
+            results = Rescheduler(doctor, find_next=find_next).run(appointment_ids)
+        except SlotUnavailable:
+            return Response(
+                {'error': 'The doctor\'s slots kept changing during the reschedule; try again'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        rescheduled = sum(1 for result in results if result['status'] == 'rescheduled')
+        return Response({
+            'message': f'Rescheduled {rescheduled} of {len(results)} appointments',
+            'rescheduled': rescheduled,
+            'failed': len(results) - rescheduled,
+            'results': results
+        })
+
+
+def series_response(series, **extra):
+    """A series with its occurrences in date order"""
+    appointments = appointment_reader.values(series.appointments.order_by(*READ_ORDER))
+    return dict(
+        extra,
+        series=AppointmentSeriesSerializer(series).data,
+        appointments=appointment_reader.serialize(appointments)
+    )
+
+
+class AppointmentSeriesView(APIView):
+    permission_classes = [AllowAny]
+    replica_reads = True
+    
+    def get(self, request, series_id):
+        series = get_object_or_404(AppointmentSeries, id=series_id)
+        return Response(series_response(series))
+    
+    def post(self, request):
+        serializer = AppointmentSeriesSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = serializer.validated_data
+        weekday = WEEKDAYS.index(data['weekday']) if 'weekday' in data else None
+        interval_weeks = data.get('interval_weeks', 1)
+        days = occurrence_dates(data['start_date'], data['occurrences'], interval_weeks, weekday)
+        fields = {field: data[field] for field in OCCURRENCE_FIELDS + ['appointment_time']}
+        fields['interval_weeks'] = interval_weeks
+        try:
+            series, appointments, conflicts = SeriesPlanner(data['doctor']).book(
+                fields, days, skip_conflicts=data['skip_conflicts']
+            )
+        except SlotUnavailable:
+            return Response(
+                {'error': 'The doctor\'s slots kept changing while booking the series; try again'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        if series is None:
+            return Response(
+                {
+                    'error': f'{len(conflicts)} of {len(days)} occurrences are unavailable',
+                    'conflicts': conflicts
+                },
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(
+            series_response(
+                series,
+                message=f'Booked {len(appointments)} of {len(days)} occurrences',
+                skipped=conflicts
+            ),
+            status=status.HTTP_201_CREATED
+        )
+
+
+def parse_from_date(request):
+    """The optional from_date of a series change; raises ValueError when malformed"""
+    value = request.data.get('from_date')
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+class SeriesCancelView(APIView):
+    permission_classes = [AllowAny]
+    
+    def post(self, request, series_id):
+        series = get_object_or_404(AppointmentSeries, id=series_id)
+        try:
+            from_date = parse_from_date(request)
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'Use a YYYY-MM-DD from_date'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        results = cancel_series(series, from_date)
+        return Response({
+            'message': f'Cancelled {len(results)} appointments',
+            'cancelled': len(results),
+            'results': results
+        })
+
+
+class SeriesRescheduleView(APIView):
+    permission_classes = [AllowAny]
+    
+    def post(self, request, series_id):
+        series = get_object_or_404(AppointmentSeries.objects.select_related('doctor'), id=series_id)
+        try:
+            from_date = parse_from_date(request)
+            time_str = request.data.get('appointment_time')
+            slot = datetime.strptime(time_str, '%H:%M').time() if time_str else series.appointment_time
+            shift_days = int(request.data.get('shift_days', 0))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'Use an HH:MM appointment_time, a whole number of shift_days and a YYYY-MM-DD from_date'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Within a week, no occurrence can land on another one's date
+        if not -6 <= shift_days <= 6:
+            return Response(
+                {'error': 'shift_days must be between -6 and 6'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if slot == series.appointment_time and not shift_days:
+            return Response(
+                {'error': 'Send a new appointment_time or a non-zero shift_days'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            results, conflicts = SeriesPlanner(series.doctor).reschedule(series, slot, shift_days, from_date)
+        except SlotUnavailable:
+            return Response(
+                {'error': 'The doctor\'s slots kept changing during the reschedule; try again'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        if conflicts:
+            return Response(
+                {
+                    'error': f'{len(conflicts)} occurrences cannot be moved',
+                    'conflicts': conflicts
+                },
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response({
+            'message': f'Rescheduled {len(results)} appointments',
+            'rescheduled': len(results),
+            'results': results
+        })
+
+
+class AppointmentImportView(APIView):
+    permission_classes = [AllowAny]
+    parser_classes = [MultiPartParser]
+    
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'error': 'Upload a CSV or JSONL file as "file"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        file_format = request.query_params.get('file_format') or detect_format(upload.name)
+        if file_format not in FORMATS:
+            return Response(
+                {'error': f'file_format must be one of {", ".join(FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        dry_run = request.query_params.get('dry_run', '').lower() == 'true'
+        importer = AppointmentImporter(dry_run=dry_run, max_errors=settings.BULK_IMPORT_MAX_ERRORS)
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        report = importer.run(read_rows(stream, file_format))
+        
+        return Response(
+            report,
+            status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK
+        )
+
+
+class AppointmentExportView(APIView):
+    permission_classes = [AllowAny]
+    replica_reads = True
+    
+    def get(self, request):
+        # `format` is taken by DRF's renderer override, hence `file_format`
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in FORMATS:
+            return Response(
+                {'error': f'file_format must be one of {", ".join(FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return stream_export(filter_appointments(Appointment.objects.all(), request.query_params), file_format)
+
+
 class DoctorAvailabilityView(APIView):
     permission_classes = [AllowAny]
+    replica_reads = True
     
     def get(self, request, doctor_id):
         try:
-            doctor = Doctor.objects.get(id=doctor_id, is_active=True)
+            doctor = Doctor.objects.only(
+                'id', 'name', 'is_available', 'consultation_modes'
+            ).get(id=doctor_id, is_active=True)
         except Doctor.DoesNotExist:
             return Response(
                 {'error': 'Doctor not found'},
@@ -244,23 +755,8 @@ class DoctorAvailabilityView(APIView):
                 'message': 'Doctor is not available'
             })
         
-        # Generate time slots (9 AM to 5 PM)
-        time_slots = []
-        for hour in range(9, 17):
-            slot_time = f"{hour:02d}:00:00"
-            
-            # Check if slot is booked
-            is_booked = Appointment.objects.filter(
-                doctor=doctor,
-                appointment_date=target_date,
-                appointment_time=slot_time,
-                status='confirmed'
-            ).exists()
-            
-            time_slots.append({
-                'time': f"{hour:02d}:00",
-                'available': not is_booked
-            })
+        # Build the slot grid from a single query over that day's bookings
+        time_slots = build_time_slots(doctor, target_date)
         
         return Response({
             'doctor_id': doctor.id,
@@ -272,39 +768,146 @@ class DoctorAvailabilityView(APIView):
         })
 
 
-class CheckAvailabilityView(APIView):
+class DoctorAvailableDaysView(APIView):
     permission_classes = [AllowAny]
+    replica_reads = True
     
-    def post(self, request):
-        doctor_id = request.data.get('doctor_id')
-        date_str = request.data.get('date')
-        time_str = request.data.get('time')
+    def get(self, request, doctor_id):
+        try:
+            doctor = Doctor.objects.only('id', 'name', 'is_available').get(id=doctor_id, is_active=True)
+        except Doctor.DoesNotExist:
+            return Response(
+                {'error': 'Doctor not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
         
-        if not all([doctor_id, date_str, time_str]):
+        today = timezone.now().date()
+        try:
+            start_str = request.query_params.get('start')
+            start_date = datetime.strptime(start_str, '%Y-%m-%d').date() if start_str else today
+            count = int(request.query_params.get('count', 5))
+            within = int(request.query_params.get('within', settings.AVAILABILITY_SEARCH_MAX_DAYS))
+        except ValueError:
+            return Response(
+                {'error': 'Invalid parameters. Use start=YYYY-MM-DD and integer count/within'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if count < 1 or not 1 <= within <= settings.AVAILABILITY_SEARCH_MAX_DAYS:
             return Response(
-                {'error': 'doctor_id, date, and time are required'},
+                {'error': f'count must be positive and within between 1 and {settings.AVAILABILITY_SEARCH_MAX_DAYS}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Past days can never be booked, so the search starts today at the earliest
+        start_date = max(start_date, today)
+        days = find_available_days(doctor, start_date, count, within) if doctor.is_available else []
+        
+        return Response({
+            'doctor_id': doctor.id,
+            'doctor_name': doctor.name,
+            'start': start_date,
+            'days': days
+        })
+
+
+class SpecializationAvailabilityView(APIView):
+    permission_classes = [AllowAny]
+    replica_reads = True
+    
+    def get(self, request, specialization_id):
+        date_str = request.query_params.get('date')
         try:
-            appointment_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-            appointment_time = f"{time_str}:00" if ':' in time_str else f"{time_str}:00:00"
+            target_date = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else timezone.now().date()
         except ValueError:
             return Response(
-                {'error': 'Invalid date or time format'},
+                {'error': 'Invalid date format. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if target_date < timezone.now().date():
+            return Response(
+                {'error': 'Cannot check availability for past dates'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        if not Specialization.objects.filter(id=specialization_id).exists():
+            return Response(
+                {'error': 'Specialization not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        doctors = list(Doctor.objects.filter(
+            specialization_id=specialization_id, is_active=True, is_available=True
+        ).only('id').order_by('id'))
+        
+        availability = build_shared_availability(doctors, target_date)
+        availability['specialization_id'] = specialization_id
+        return Response(availability)
+
+
+class NextAvailableSlotsView(APIView):
+    permission_classes = [AllowAny]
+    replica_reads = True
+    
+    def get(self, request):
+        now = timezone.localtime().replace(tzinfo=None, second=0, microsecond=0)
         try:
-            doctor = Doctor.objects.get(id=doctor_id, is_active=True)
-        except Doctor.DoesNotExist:
+            window_start, window_end, limit, doctors = parse_search_params(request.query_params, now)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            'start': window_start,
+            'end': window_end,
+            'slots': find_earliest_slots(list(doctors), window_start, window_end, limit)
+        })
+
+
+class AvailabilityCalendarView(APIView):
+    permission_classes = [AllowAny]
+    replica_reads = True
+    
+    def get(self, request):
+        today = timezone.now().date()
+        try:
+            start_date, end_date, doctors = parse_calendar_params(request.query_params, today)
+            doctors = limit_calendar_doctors(list(doctors))
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(build_calendar(doctors, start_date, end_date, today=today))
+
+
+class CheckAvailabilityView(APIView):
+    permission_classes = [AllowAny]
+    
+    def post(self, request):
+        try:
+            doctor_id, appointment_date, appointment_time, time_str = parse_check_params(request.data)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Doctor and bookings come from the in-process slot cache, which the
+        # Appointment/Doctor signals keep coherent with writes
+        doctor = get_doctor_summary(doctor_id)
+        if doctor is None:
             return Response(
                 {'error': 'Doctor not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
         
         # Check basic availability
-        if not doctor.is_available:
+        if not doctor['is_available']:
             return Response({
                 'available': False,
                 'reason': 'Doctor is not available for appointments'
@@ -317,15 +920,16 @@ class CheckAvailabilityView(APIView):
                 'reason': 'Cannot book appointments in the past'
             })
         
-        # Check for existing appointment
-        existing_appointment = Appointment.objects.filter(
-            doctor=doctor,
-            appointment_date=appointment_date,
-            appointment_time=appointment_time,
-            status='confirmed'
-        ).exists()
+        # Only the slots of the doctor's compiled schedule for that day can be booked
+        template = get_schedule(doctor_id).template(appointment_date)
+        if not template.offers(appointment_time):
+            return Response({
+                'available': False,
+                'reason': 'Outside the doctor\'s working hours' if template else 'Doctor is not working on this date'
+            })
         
-        if existing_appointment:
+        # Check for an existing appointment in the slot's occupancy cells
+        if not template.is_free(appointment_time, get_booked_mask(doctor_id, appointment_date)):
             return Response({
                 'available': False,
                 'reason': 'Time slot is already booked'
@@ -333,8 +937,44 @@ class CheckAvailabilityView(APIView):
         
         return Response({
             'available': True,
-            'doctor': doctor.name,
+            'doctor': doctor['name'],
             'date': appointment_date,
             'time': time_str,
-            'consultation_modes': doctor.consultation_modes
-        })
\ No newline at end of file
+            'consultation_modes': doctor['consultation_modes']
+        })
+
+
+class SlotCacheStatsView(APIView):
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        # Counters are per process, so each worker reports its own cache
+        return Response({
+            'booked_slots': booked_slot_cache.stats(),
+            'doctors': doctor_cache.stats(),
+            'schedules': schedule_cache.stats()
+        })
+
+
+class BookingStatsView(APIView):
+    permission_classes = [AllowAny]
+    replica_reads = True
+    
+    def get(self, request):
+        try:
+            start_date, end_date, group_by, counts = parse_stats_params(request.query_params, timezone.now().date())
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Reads the daily summary table, never the appointments themselves
+        rows = booking_stats(counts, group_by)
+        return Response({
+            'start': start_date,
+            'end': end_date,
+            'group_by': group_by,
+            'totals': summarize_rows(rows),
+            'rows': rows
+        })
@@ -49,6 +49,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # Must be first
+    'api.middleware.RequestMetricsMiddleware',  # Early, so it times everything below it
+    'api.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Add this
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -100,6 +102,59 @@ else:
         }
     }
 
+# Connection management. By default connections persist for DB_CONN_MAX_AGE
+# seconds and are checked before a request reuses them. DB_POOL=True hands
+# connections out of an in-process psycopg pool instead (Postgres only):
+# between DB_POOL_MIN_SIZE and DB_POOL_MAX_SIZE connections per process,
+# waiting at most DB_POOL_TIMEOUT seconds for a free one.
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+DB_POOL = os.getenv('DB_POOL', 'False') == 'True'
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '2'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+# Pooled connections are replaced after this many seconds, or closed after idling this long
+DB_POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', '1800'))
+DB_POOL_MAX_IDLE = float(os.getenv('DB_POOL_MAX_IDLE', '300'))
+# Server-side cursors (used by iterator() streaming) break behind PgBouncer in
+# transaction mode, such as Neon's -pooler hosts. Unset, they are disabled for
+# each database whose host is a pooler.
+DB_DISABLE_SERVER_SIDE_CURSORS = os.getenv('DB_DISABLE_SERVER_SIDE_CURSORS')
+
+# Read replicas, as comma-separated database URLs added as replica_1,
+# replica_2, ... GET and HEAD requests to the read-only views read from a
+# random one; bookings, availability checks and every other request stay on
+# default, as does a client for REPLICA_STICKY_SECONDS after it writes.
+# Locally, two SQLite files work: migrate default, then copy it to the replica.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+for index, url in enumerate(DATABASE_REPLICA_URLS, 1):
+    DATABASES[f'replica_{index}'] = dj_database_url.parse(url)
+    # Tests create no replica databases; replicas read the test default
+    DATABASES[f'replica_{index}']['TEST'] = {'MIRROR': 'default'}
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '5'))
+REPLICA_PIN_COOKIE = 'replica_pin'
+
+for database in DATABASES.values():
+    if DB_POOL and database['ENGINE'] == 'django.db.backends.postgresql':
+        # The pool owns connection lifetime; Django returns connections to it after
+        # each request. Health checks then test connections as they leave the pool.
+        database['CONN_MAX_AGE'] = 0
+        database.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+            'max_lifetime': DB_POOL_MAX_LIFETIME,
+            'max_idle': DB_POOL_MAX_IDLE,
+        }
+    else:
+        database['CONN_MAX_AGE'] = DB_CONN_MAX_AGE
+    database['CONN_HEALTH_CHECKS'] = DB_CONN_HEALTH_CHECKS
+    database['DISABLE_SERVER_SIDE_CURSORS'] = (
+        DB_DISABLE_SERVER_SIDE_CURSORS or str('-pooler' in (database.get('HOST') or ''))
+    ) == 'True'
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -151,9 +206,113 @@ if os.environ.get('CORS_ALLOWED_ORIGINS'):
 # For development only
 CORS_ALLOW_ALL_ORIGINS = DEBUG  # Only True in development
 
+# JSON renderer for API responses, including the streamed and async ones.
+# api.renderers.FastJSONRenderer writes the stock renderer's output with
+# orjson; set rest_framework.renderers.JSONRenderer to go back to it.
+API_JSON_RENDERER = os.getenv('API_JSON_RENDERER', 'api.renderers.FastJSONRenderer')
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
-    ]
-}
\ No newline at end of file
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        API_JSON_RENDERER,
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Appointment slot settings
+APPOINTMENT_DAY_START = os.getenv('APPOINTMENT_DAY_START', '09:00')
+APPOINTMENT_DAY_END = os.getenv('APPOINTMENT_DAY_END', '17:00')
+APPOINTMENT_SLOT_MINUTES = int(os.getenv('APPOINTMENT_SLOT_MINUTES', '60'))
+
+# Limits for the bulk availability calendar endpoint
+AVAILABILITY_CALENDAR_MAX_DAYS = int(os.getenv('AVAILABILITY_CALENDAR_MAX_DAYS', '62'))
+AVAILABILITY_CALENDAR_MAX_DOCTORS = int(os.getenv('AVAILABILITY_CALENDAR_MAX_DOCTORS', '100'))
+
+# Booked-slot bitmaps (api.SlotOccupancy): one bit per cell of this many minutes
+# from midnight. Slot lengths and the day start must be multiples of it; run
+# `manage.py rebuild_occupancy` after changing it.
+OCCUPANCY_GRANULARITY_MINUTES = int(os.getenv('OCCUPANCY_GRANULARITY_MINUTES', '5'))
+# Furthest ahead the available-days and next-slot searches look
+AVAILABILITY_SEARCH_MAX_DAYS = int(os.getenv('AVAILABILITY_SEARCH_MAX_DAYS', '90'))
+AVAILABILITY_SEARCH_MAX_RESULTS = int(os.getenv('AVAILABILITY_SEARCH_MAX_RESULTS', '50'))
+# Days of bitmasks the next-slot search loads per query before widening the window
+AVAILABILITY_SEARCH_CHUNK_DAYS = int(os.getenv('AVAILABILITY_SEARCH_CHUNK_DAYS', '7'))
+
+# Appointment list pagination and streaming export
+APPOINTMENT_PAGE_SIZE = int(os.getenv('APPOINTMENT_PAGE_SIZE', '100'))
+APPOINTMENT_MAX_PAGE_SIZE = int(os.getenv('APPOINTMENT_MAX_PAGE_SIZE', '500'))
+APPOINTMENT_STREAM_CHUNK_SIZE = int(os.getenv('APPOINTMENT_STREAM_CHUNK_SIZE', '2000'))
+
+# Retries for bookings that hit transient lock errors (deadlocks, busy database):
+# for up to BOOKING_RETRY_TIMEOUT seconds, pausing BOOKING_RETRY_BACKOFF seconds
+# first and doubling up to BOOKING_RETRY_MAX_BACKOFF
+BOOKING_RETRY_TIMEOUT = float(os.getenv('BOOKING_RETRY_TIMEOUT', '3'))
+BOOKING_RETRY_BACKOFF = float(os.getenv('BOOKING_RETRY_BACKOFF', '0.01'))
+BOOKING_RETRY_MAX_BACKOFF = float(os.getenv('BOOKING_RETRY_MAX_BACKOFF', '0.1'))
+
+# Cache backend; local memory by default. Point CACHE_BACKEND at
+# django.core.cache.backends.filebased.FileBasedCache (with CACHE_LOCATION set to
+# a directory) to share invalidations between worker processes.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'mindcare'),
+    }
+}
+
+# Doctor/specialization catalog cache. It also holds the version number the
+# in-memory doctor search indexes (api.search) rebuild on; with a shared
+# backend every worker picks up another's doctor edits on its next search.
+CATALOG_CACHE_ALIAS = os.getenv('CATALOG_CACHE_ALIAS', 'default')
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', '3600'))
+
+# In-process cache of booked slots per (doctor, date) for availability checks.
+# Each read checks the day's version token in this Django cache, which every
+# write replaces; with a shared backend no worker serves a day after a write.
+SLOT_CACHE_MAX_ENTRIES = int(os.getenv('SLOT_CACHE_MAX_ENTRIES', '5000'))
+SLOT_CACHE_TTL = float(os.getenv('SLOT_CACHE_TTL', '30'))
+SLOT_VERSION_CACHE_ALIAS = os.getenv('SLOT_VERSION_CACHE_ALIAS', 'default')
+
+# In-process cache of compiled doctor schedules (api.schedule). Edits evict
+# the editing worker's entry at once; other workers pick them up within the TTL.
+SCHEDULE_CACHE_TTL = float(os.getenv('SCHEDULE_CACHE_TTL', '300'))
+
+# Largest page of ranked doctor search results (/api/doctors/search/)
+DOCTOR_SEARCH_MAX_RESULTS = int(os.getenv('DOCTOR_SEARCH_MAX_RESULTS', '50'))
+
+# Per-doctor daily booking counts (api.DailyBookingCount) behind /api/stats/bookings/
+BOOKING_STATS_MAX_DAYS = int(os.getenv('BOOKING_STATS_MAX_DAYS', '366'))
+# Doctors recounted per transaction by `manage.py reconcile_booking_counts`
+BOOKING_COUNT_RECONCILE_BATCH_SIZE = int(os.getenv('BOOKING_COUNT_RECONCILE_BATCH_SIZE', '50'))
+
+# Admin changelists: above this many rows (by the Postgres planner's estimate)
+# the appointment list shows the estimate instead of running COUNT(*)
+ADMIN_EXACT_COUNT_LIMIT = int(os.getenv('ADMIN_EXACT_COUNT_LIMIT', '100000'))
+
+# Most appointments one batch reschedule request may move
+BATCH_RESCHEDULE_MAX_APPOINTMENTS = int(os.getenv('BATCH_RESCHEDULE_MAX_APPOINTMENTS', '500'))
+
+# Most occurrences one recurring appointment series may book
+SERIES_MAX_OCCURRENCES = int(os.getenv('SERIES_MAX_OCCURRENCES', '52'))
+
+# Archiving (`manage.py archive_appointments`): completed and cancelled
+# appointments older than this many days move to api.ArchivedAppointment,
+# this many rows per transaction
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '365'))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '1000'))
+
+# Bulk appointment import
+BULK_IMPORT_BATCH_SIZE = int(os.getenv('BULK_IMPORT_BATCH_SIZE', '5000'))
+BULK_IMPORT_MAX_ERRORS = int(os.getenv('BULK_IMPORT_MAX_ERRORS', '1000'))
+
+# Request instrumentation (api.middleware.RequestMetricsMiddleware, served at /metrics)
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', '0.1'))
+METRICS_SIMILAR_QUERY_WARNING = int(os.getenv('METRICS_SIMILAR_QUERY_WARNING', '10'))
+# Bearer token /metrics requires; while it is unset the endpoint answers 403
+# unless DEBUG is on, since it exposes query counts, pool stats and timings
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+# Directory for per-request cProfile dumps triggered by an X-Profile header; empty disables
+METRICS_PROFILE_DIR = os.getenv('METRICS_PROFILE_DIR', '')
@@ -1,14 +1,18 @@
+from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from api import views
+from api.metrics import metrics_view
 
 router = DefaultRouter()
 router.register(r'doctors', views.DoctorViewSet)
 router.register(r'specializations', views.SpecializationViewSet)
 
 urlpatterns = [
+    path('admin/', admin.site.urls),
     path('', include(router.urls)),
     path('api/', include('api.urls')), 
+    path('metrics', metrics_view, name='metrics'),
     # Appointments endpoints
     path('appointments/', views.AppointmentView.as_view(), name='appointments'),
     path('appointments/<int:appointment_id>/', views.AppointmentView.as_view(), name='appointment-detail'),
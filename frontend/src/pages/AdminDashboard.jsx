@@ -3,7 +3,7 @@ import { useNavigate } from 'react-router-dom';
 import { 
   getDoctors, createDoctor, updateDoctor, deleteDoctor,
   getSpecializations, createAppointment,
-  getAppointments, updateAppointment, deleteAppointment  
+  getAllAppointments, updateAppointment, deleteAppointment  
 } from '../services/api';
 import { 
   Users, Calendar, Activity, LogOut, 
@@ -93,16 +93,9 @@ const AdminDashboard = () => {
       
 // Load appointments from Django API
 try {
-  const appointmentsResponse = await getAppointments();
-  console.log('Appointments API response:', appointmentsResponse.data);
-  
-  if (Array.isArray(appointmentsResponse.data)) {
-    setAppointments(appointmentsResponse.data);
-    console.log(`✅ Loaded ${appointmentsResponse.data.length} appointments`);
-  } else {
-    console.error('❌ Invalid appointments response:', appointmentsResponse.data);
-    setAppointments([]);
-  }
+  const appointmentsData = await getAllAppointments();
+  setAppointments(appointmentsData);
+  console.log(`✅ Loaded ${appointmentsData.length} appointments`);
 } catch (error) {
   console.error('❌ Error loading appointments:', error);
   alert(`Failed to load appointments: ${error.message}`);
@@ -20,11 +20,26 @@ export const deleteDoctor = (id) => api.delete(`/doctors/${id}/`);
 export const getDoctorAvailability = (id, date) => 
   api.get(`/doctors/${id}/availability/`, { params: { date } });
 
+// Free-slot bitmaps for many doctors over a date range in one request
+export const getAvailabilityCalendar = (doctorIds, start, end) =>
+  api.get('/availability/', { params: { doctors: doctorIds.join(','), start, end } });
+
 // Specialization APIs
 export const getSpecializations = () => api.get('/specializations/');
 
 // Appointment APIs - NOW COMPLETE!
 export const getAppointments = (params = {}) => api.get('/appointments/', { params });
+
+// The appointment list is cursor paginated; follow `next` until every page is loaded
+export const getAllAppointments = async (params = {}) => {
+  let response = await getAppointments(params);
+  const results = [...response.data.results];
+  while (response.data.next) {
+    response = await api.get(response.data.next);
+    results.push(...response.data.results);
+  }
+  return results;
+};
 export const getAppointment = (id) => api.get(`/appointments/${id}/`);
 export const createAppointment = (appointmentData) => api.post('/appointments/', appointmentData);
 export const updateAppointment = (id, appointmentData) => api.put(`/appointments/${id}/`, appointmentData);